@@ -0,0 +1,49 @@
+"""notify wallet balance changes
+
+Revision ID: 007b22ff9d9f
+Revises: 9146422e930d
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "007b22ff9d9f"
+down_revision: Union[str, Sequence[str], None] = "9146422e930d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE FUNCTION notify_wallet_balance() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'wallet_balance',
+                NEW.uuid::text || ' ' || NEW.balance::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER wallets_notify_balance
+        AFTER UPDATE OF balance ON wallets
+        FOR EACH ROW
+        WHEN (OLD.balance IS DISTINCT FROM NEW.balance)
+        EXECUTE FUNCTION notify_wallet_balance()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER wallets_notify_balance ON wallets")
+    op.execute("DROP FUNCTION notify_wallet_balance()")
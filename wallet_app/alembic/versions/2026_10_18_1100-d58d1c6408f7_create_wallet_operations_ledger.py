@@ -0,0 +1,59 @@
+"""create wallet operations ledger
+
+Revision ID: d58d1c6408f7
+Revises: 007b22ff9d9f
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d58d1c6408f7"
+down_revision: Union[str, Sequence[str], None] = "007b22ff9d9f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Текущий месяц и два следующих; дальше секции создают
+# `python cli.py partitions create` при старте контейнера
+# и PartitionMaintainer в работающем приложении.
+INITIAL_PARTITIONS = 3
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "wallet_operations",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("wallet_uuid", sa.UUID(), nullable=False),
+        sa.Column("operation_type", sa.String(length=16), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=20, scale=2), nullable=False),
+        sa.Column("balance", sa.Numeric(precision=20, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint("id", "created_at", name=op.f("pk_wallet_operations")),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    start = datetime.now(timezone.utc).date().replace(day=1)
+    for _ in range(INITIAL_PARTITIONS):
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        op.execute(
+            f"CREATE TABLE wallet_operations_p{start:%Y%m} "
+            f"PARTITION OF wallet_operations "
+            f"FOR VALUES FROM ('{start} 00:00:00+00') "
+            f"TO ('{end} 00:00:00+00')"
+        )
+        start = end
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("wallet_operations")
@@ -0,0 +1,35 @@
+"""index wallet operations history
+
+Revision ID: 3b9e1f6c2a47
+Revises: d58d1c6408f7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9e1f6c2a47"
+down_revision: Union[str, Sequence[str], None] = "d58d1c6408f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индекс на секционированной таблице создается на каждой секции,
+    # включая секции, созданные позже.
+    op.create_index(
+        "ix_wallet_operations_history",
+        "wallet_operations",
+        ["wallet_uuid", sa.text("created_at DESC"), sa.text("id DESC")],
+        postgresql_include=["operation_type", "amount", "balance"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_wallet_operations_history", table_name="wallet_operations")
@@ -0,0 +1,60 @@
+"""create idempotency keys
+
+Revision ID: 8c4d2a71e5b3
+Revises: 3b9e1f6c2a47
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c4d2a71e5b3"
+down_revision: Union[str, Sequence[str], None] = "3b9e1f6c2a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сегодня и неделя вперед; дальше секции создают
+# `python cli.py partitions create` при старте контейнера
+# и PartitionMaintainer в работающем приложении.
+INITIAL_PARTITIONS = 8
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("key", sa.String(length=255), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("wallet_uuid", sa.UUID(), nullable=False),
+        sa.Column("operation_type", sa.String(length=16), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=20, scale=2), nullable=False),
+        sa.Column("status", sa.String(length=32), nullable=False),
+        sa.Column("balance", sa.Numeric(precision=20, scale=2), nullable=True),
+        sa.PrimaryKeyConstraint("key", "created_at", name=op.f("pk_idempotency_keys")),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    start = datetime.now(timezone.utc).date()
+    for _ in range(INITIAL_PARTITIONS):
+        end = start + timedelta(days=1)
+        op.execute(
+            f"CREATE TABLE idempotency_keys_p{start:%Y%m%d} "
+            f"PARTITION OF idempotency_keys "
+            f"FOR VALUES FROM ('{start} 00:00:00+00') "
+            f"TO ('{end} 00:00:00+00')"
+        )
+        start = end
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("idempotency_keys")
@@ -0,0 +1,90 @@
+"""add wallet balance shards
+
+Revision ID: 5e7a9c3d1f20
+Revises: 8c4d2a71e5b3
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e7a9c3d1f20"
+down_revision: Union[str, Sequence[str], None] = "8c4d2a71e5b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "wallets",
+        sa.Column("shards", sa.SmallInteger(), server_default="0", nullable=False),
+    )
+    op.create_table(
+        "wallet_balance_shards",
+        sa.Column("wallet_uuid", sa.UUID(), nullable=False),
+        sa.Column("shard", sa.SmallInteger(), nullable=False),
+        sa.Column("balance", sa.Numeric(precision=20, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint(
+            "wallet_uuid", "shard", name=op.f("pk_wallet_balance_shards")
+        ),
+    )
+    # Баланс шардированного кошелька в строке wallets не хранится:
+    # вместо него отправляется только uuid, и слушатели сбрасывают кэш.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_wallet_balance()
+        RETURNS trigger AS $$
+        BEGIN
+            IF NEW.shards > 0 THEN
+                PERFORM pg_notify('wallet_balance', NEW.uuid::text);
+            ELSE
+                PERFORM pg_notify(
+                    'wallet_balance',
+                    NEW.uuid::text || ' ' || NEW.balance::text
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+    op.execute("DROP TRIGGER wallets_notify_balance ON wallets")
+    op.execute("""
+        CREATE TRIGGER wallets_notify_balance
+        AFTER UPDATE OF balance, shards ON wallets
+        FOR EACH ROW
+        WHEN (
+            OLD.balance IS DISTINCT FROM NEW.balance
+            OR OLD.shards IS DISTINCT FROM NEW.shards
+        )
+        EXECUTE FUNCTION notify_wallet_balance()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER wallets_notify_balance ON wallets")
+    op.execute("""
+        CREATE TRIGGER wallets_notify_balance
+        AFTER UPDATE OF balance ON wallets
+        FOR EACH ROW
+        WHEN (OLD.balance IS DISTINCT FROM NEW.balance)
+        EXECUTE FUNCTION notify_wallet_balance()
+        """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_wallet_balance()
+        RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'wallet_balance',
+                NEW.uuid::text || ' ' || NEW.balance::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+    op.drop_table("wallet_balance_shards")
+    op.drop_column("wallets", "shards")
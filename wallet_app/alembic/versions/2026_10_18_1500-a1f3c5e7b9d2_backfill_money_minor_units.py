@@ -0,0 +1,171 @@
+"""backfill money minor units
+
+Revision ID: a1f3c5e7b9d2
+Revises: 5e7a9c3d1f20
+Create Date: 2026-10-18 15:00:00.000000
+
+Первый, онлайн-шаг перевода сумм в BIGINT минимальных единиц (см.
+models.money). Рядом с каждой суммой появляется колонка <name>_minor,
+которую заполняет триггер на каждой записи и пакетный backfill вне
+общей транзакции: каждая пачка - отдельная короткая транзакция,
+таблицы целиком не блокируются, старые экземпляры приложения
+продолжают работать. Колонки заменяются следующей ревизией.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a1f3c5e7b9d2"
+down_revision: Union[str, Sequence[str], None] = "5e7a9c3d1f20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10_000
+
+# Таблица: (первичный ключ, суммы).
+MONEY_COLUMNS = {
+    "wallets": (("uuid",), ("balance",)),
+    "wallet_balance_shards": (("wallet_uuid", "shard"), ("balance",)),
+    "wallet_operations": (("id", "created_at"), ("amount", "balance")),
+    "idempotency_keys": (("key", "created_at"), ("amount", "balance")),
+}
+# Единственная сумма, которая может быть NULL.
+NULLABLE = {("idempotency_keys", "balance")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, (_, columns) in MONEY_COLUMNS.items():
+        for column in columns:
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column}_minor bigint"
+            )
+        assign = "\n".join(
+            f"NEW.{column}_minor := (NEW.{column} * 100)::bigint;" for column in columns
+        )
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION {table}_sync_minor_units()
+            RETURNS trigger AS $$
+            BEGIN
+                {assign}
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+            """)
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_sync_minor_units ON {table}")
+        op.execute(f"""
+            CREATE TRIGGER {table}_sync_minor_units
+            BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW
+            EXECUTE FUNCTION {table}_sync_minor_units()
+            """)
+
+    # Триггеры должны быть зафиксированы до backfill: строки, которые
+    # пишутся во время него, заполняются ими.
+    with op.get_context().autocommit_block():
+        for table, (key, columns) in MONEY_COLUMNS.items():
+            backfill(table, key, columns)
+            for column in columns:
+                if (table, column) not in NULLABLE:
+                    validate_not_null(table, f"{column}_minor")
+        create_history_index()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_wallet_operations_history_minor")
+    for table, (_, columns) in MONEY_COLUMNS.items():
+        op.execute(f"DROP TRIGGER {table}_sync_minor_units ON {table}")
+        op.execute(f"DROP FUNCTION {table}_sync_minor_units()")
+        for column in columns:
+            op.drop_column(table, f"{column}_minor")
+
+
+def backfill(table: str, key: tuple[str, ...], columns: tuple[str, ...]) -> None:
+    """
+    Заполнение <column>_minor пачками по первичному ключу.
+    Верхняя граница пачки ищется по индексу первичного ключа, затем
+    пачка обновляется отдельной транзакцией (соединение в autocommit).
+    :param table:
+    :param key: Колонки первичного ключа.
+    :param columns: Суммы.
+    """
+    conn = op.get_bind()
+    keys = ", ".join(key)
+    lower = [f"lower_{i}" for i in range(len(key))]
+    upper = [f"upper_{i}" for i in range(len(key))]
+    after_lower = f"({keys}) > ({', '.join(':' + p for p in lower)})"
+    upto_upper = f"({keys}) <= ({', '.join(':' + p for p in upper)})"
+    assign = ", ".join(
+        f"{column}_minor = ({column} * 100)::bigint" for column in columns
+    )
+    last = None
+    while True:
+        conditions, params = [], {}
+        if last is not None:
+            conditions.append(after_lower)
+            params.update(zip(lower, last))
+        where = f"WHERE {after_lower}" if last is not None else ""
+        bound = conn.execute(
+            sa.text(
+                f"SELECT {keys} FROM {table} {where} "
+                f"ORDER BY {keys} OFFSET :offset LIMIT 1"
+            ),
+            {**params, "offset": BATCH_SIZE - 1},
+        ).first()
+        if bound is not None:
+            conditions.append(upto_upper)
+            params.update(zip(upper, bound))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn.execute(sa.text(f"UPDATE {table} SET {assign} {where}"), params)
+        if bound is None:
+            return
+        last = tuple(bound)
+
+
+def validate_not_null(table: str, column: str) -> None:
+    """
+    Проверка отсутствия NULL без долгой блокировки: ограничение
+    добавляется NOT VALID и проверяется под SHARE UPDATE EXCLUSIVE,
+    которая не мешает записи. По нему SET NOT NULL в следующей ревизии
+    обходится без сканирования таблицы.
+    """
+    name = f"ck_{table}_{column}_not_null"
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+        f"CHECK ({column} IS NOT NULL) NOT VALID"
+    )
+    op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def create_history_index() -> None:
+    """
+    Копия ix_wallet_operations_history по новым колонкам. Индекс
+    создается на самой секционированной таблице без секций, затем
+    CONCURRENTLY на каждой секции и присоединяется к нему.
+    """
+    columns = "(wallet_uuid, created_at DESC, id DESC)"
+    include = "INCLUDE (operation_type, amount_minor, balance_minor)"
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_wallet_operations_history_minor "
+        f"ON ONLY wallet_operations {columns} {include}"
+    )
+    partitions = op.get_bind().scalars(
+        sa.text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = 'wallet_operations'::regclass"
+        )
+    )
+    for partition in partitions.all():
+        index = f"{partition}_history_minor_idx"
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} "
+            f"ON {partition} {columns} {include}"
+        )
+        op.execute(
+            f"ALTER INDEX ix_wallet_operations_history_minor ATTACH PARTITION {index}"
+        )
@@ -0,0 +1,127 @@
+"""switch money to minor units
+
+Revision ID: b7e2d4f6a8c1
+Revises: a1f3c5e7b9d2
+Create Date: 2026-10-18 15:10:00.000000
+
+Второй шаг перевода сумм в BIGINT: колонки <name>_minor, заполненные
+предыдущей ревизией, занимают место старых numeric. Изменения только
+в каталоге (NOT NULL доказан проверенными ограничениями, индекс уже
+построен), поэтому ACCESS EXCLUSIVE держится недолго; lock_timeout
+не дает ему встать в очередь за длинными транзакциями - при таймауте
+ревизию можно просто повторить. После нее писать в БД могут только
+экземпляры приложения, которые знают о минимальных единицах.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e2d4f6a8c1"
+down_revision: Union[str, Sequence[str], None] = "a1f3c5e7b9d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOCK_TIMEOUT = "5s"
+
+MONEY_COLUMNS = {
+    "wallets": ("balance",),
+    "wallet_balance_shards": ("balance",),
+    "wallet_operations": ("amount", "balance"),
+    "idempotency_keys": ("amount", "balance"),
+}
+NULLABLE = {("idempotency_keys", "balance")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    # WHEN триггера ссылается на balance: без него колонку не удалить.
+    op.execute("DROP TRIGGER wallets_notify_balance ON wallets")
+    for table, columns in MONEY_COLUMNS.items():
+        op.execute(f"DROP TRIGGER {table}_sync_minor_units ON {table}")
+        op.execute(f"DROP FUNCTION {table}_sync_minor_units()")
+        for column in columns:
+            if (table, column) not in NULLABLE:
+                op.alter_column(table, f"{column}_minor", nullable=False)
+                op.execute(
+                    f"ALTER TABLE {table} DROP CONSTRAINT "
+                    f"ck_{table}_{column}_minor_not_null"
+                )
+            # Старый ix_wallet_operations_history удаляется вместе
+            # с колонкой.
+            op.drop_column(table, column)
+            op.alter_column(table, f"{column}_minor", new_column_name=column)
+    op.execute(
+        "ALTER INDEX ix_wallet_operations_history_minor "
+        "RENAME TO ix_wallet_operations_history"
+    )
+    # Функция та же: NEW.balance::text теперь в минимальных единицах.
+    create_notify_trigger()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Обратный путь блокирующий: numeric заполняется одним UPDATE.
+    op.execute("DROP TRIGGER wallets_notify_balance ON wallets")
+    op.execute(
+        "ALTER INDEX ix_wallet_operations_history "
+        "RENAME TO ix_wallet_operations_history_minor"
+    )
+    for table, columns in MONEY_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column, new_column_name=f"{column}_minor")
+            op.add_column(table, sa.Column(column, sa.Numeric(precision=20, scale=2)))
+        op.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{column} = {column}_minor / 100.0" for column in columns)
+        )
+        for column in columns:
+            if (table, column) not in NULLABLE:
+                op.alter_column(table, column, nullable=False)
+                op.alter_column(table, f"{column}_minor", nullable=True)
+                op.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT "
+                    f"ck_{table}_{column}_minor_not_null "
+                    f"CHECK ({column}_minor IS NOT NULL)"
+                )
+        assign = "\n".join(
+            f"NEW.{column}_minor := (NEW.{column} * 100)::bigint;" for column in columns
+        )
+        op.execute(f"""
+            CREATE FUNCTION {table}_sync_minor_units()
+            RETURNS trigger AS $$
+            BEGIN
+                {assign}
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+            """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_sync_minor_units
+            BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW
+            EXECUTE FUNCTION {table}_sync_minor_units()
+            """)
+    op.create_index(
+        "ix_wallet_operations_history",
+        "wallet_operations",
+        ["wallet_uuid", sa.text("created_at DESC"), sa.text("id DESC")],
+        postgresql_include=["operation_type", "amount", "balance"],
+    )
+    create_notify_trigger()
+
+
+def create_notify_trigger() -> None:
+    op.execute("""
+        CREATE TRIGGER wallets_notify_balance
+        AFTER UPDATE OF balance, shards ON wallets
+        FOR EACH ROW
+        WHEN (
+            OLD.balance IS DISTINCT FROM NEW.balance
+            OR OLD.shards IS DISTINCT FROM NEW.shards
+        )
+        EXECUTE FUNCTION notify_wallet_balance()
+        """)
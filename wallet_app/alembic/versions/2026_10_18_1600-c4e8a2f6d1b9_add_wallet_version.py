@@ -0,0 +1,62 @@
+"""add wallet version
+
+Revision ID: c4e8a2f6d1b9
+Revises: b7e2d4f6a8c1
+Create Date: 2026-10-18 16:00:00.000000
+
+Версия кошелька для условных операций (ETag / If-Match). Колонка
+с постоянным DEFAULT добавляется только в каталоге, без перезаписи
+таблицы, поэтому ACCESS EXCLUSIVE держится недолго; lock_timeout
+не дает ему встать в очередь за длинными транзакциями.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4e8a2f6d1b9"
+down_revision: Union[str, Sequence[str], None] = "b7e2d4f6a8c1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOCK_TIMEOUT = "5s"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    op.add_column(
+        "wallets",
+        sa.Column("version", sa.BigInteger(), server_default="1", nullable=False),
+    )
+    # Версия в уведомлении нужна, чтобы кэш отдавал ETag вместе
+    # с балансом. Старые слушатели берут из него только баланс.
+    create_notify_function(with_version=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    create_notify_function(with_version=False)
+    op.drop_column("wallets", "version")
+
+
+def create_notify_function(with_version: bool) -> None:
+    payload = "NEW.uuid::text || ' ' || NEW.balance::text"
+    if with_version:
+        payload += " || ' ' || NEW.version::text"
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_wallet_balance()
+        RETURNS trigger AS $$
+        BEGIN
+            IF NEW.shards > 0 THEN
+                PERFORM pg_notify('wallet_balance', NEW.uuid::text);
+            ELSE
+                PERFORM pg_notify('wallet_balance', {payload});
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
@@ -0,0 +1,97 @@
+"""create wallet events outbox
+
+Revision ID: d9b3f1a7c5e2
+Revises: c4e8a2f6d1b9
+Create Date: 2026-10-18 17:00:00.000000
+
+Outbox событий изменения балансов для потока SSE. Строку пишет
+триггер на журнале wallet_operations, поэтому событие фиксируется
+в той же транзакции, что и изменение баланса, при любом пути записи.
+txid - номер транзакции: ретранслятор читает события только
+транзакций, завершенных до начала всех идущих (ниже xmin снимка),
+и не пропускает строки, зафиксированные не в порядке их id.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d9b3f1a7c5e2"
+down_revision: Union[str, Sequence[str], None] = "c4e8a2f6d1b9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сегодня и неделя вперед; дальше секции создают
+# `python cli.py partitions create` при старте контейнера
+# и PartitionMaintainer в работающем приложении.
+INITIAL_PARTITIONS = 8
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "wallet_events",
+        sa.Column("id", sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column(
+            "txid",
+            sa.BigInteger(),
+            server_default=sa.text("pg_current_xact_id()::text::bigint"),
+            nullable=False,
+        ),
+        sa.Column("operation_id", sa.BigInteger(), nullable=False),
+        sa.Column("wallet_uuid", sa.UUID(), nullable=False),
+        sa.Column("operation_type", sa.String(length=16), nullable=False),
+        sa.Column("amount", sa.BigInteger(), nullable=False),
+        sa.Column("balance", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id", "created_at", name=op.f("pk_wallet_events")),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.create_index("ix_wallet_events_position", "wallet_events", ["txid", "id"])
+    start = datetime.now(timezone.utc).date()
+    for _ in range(INITIAL_PARTITIONS):
+        end = start + timedelta(days=1)
+        op.execute(
+            f"CREATE TABLE wallet_events_p{start:%Y%m%d} "
+            f"PARTITION OF wallet_events "
+            f"FOR VALUES FROM ('{start} 00:00:00+00') "
+            f"TO ('{end} 00:00:00+00')"
+        )
+        start = end
+    # Триггер на выражение, а не на строку: пакет операций пишет
+    # события одним INSERT ... SELECT в порядке журнала.
+    op.execute("""
+        CREATE FUNCTION write_wallet_events() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO wallet_events (
+                operation_id, wallet_uuid, operation_type, amount, balance
+            )
+            SELECT id, wallet_uuid, operation_type, amount, balance
+            FROM new_operations
+            ORDER BY id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """)
+    op.execute("""
+        CREATE TRIGGER wallet_operations_outbox
+        AFTER INSERT ON wallet_operations
+        REFERENCING NEW TABLE AS new_operations
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION write_wallet_events()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER wallet_operations_outbox ON wallet_operations")
+    op.execute("DROP FUNCTION write_wallet_events()")
+    op.drop_table("wallet_events")
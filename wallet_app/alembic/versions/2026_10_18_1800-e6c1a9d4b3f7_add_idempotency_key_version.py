@@ -0,0 +1,37 @@
+"""add idempotency key version
+
+Revision ID: e6c1a9d4b3f7
+Revises: d9b3f1a7c5e2
+Create Date: 2026-10-18 18:00:00.000000
+
+Версия кошелька в результате, сохраненном по ключу идемпотентности:
+повтор запроса отдает тот же ETag, что и первый ответ. Колонка без
+DEFAULT добавляется только в каталоге, без перезаписи секций.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e6c1a9d4b3f7"
+down_revision: Union[str, Sequence[str], None] = "d9b3f1a7c5e2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOCK_TIMEOUT = "5s"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    op.add_column(
+        "idempotency_keys", sa.Column("version", sa.BigInteger(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    op.drop_column("idempotency_keys", "version")
@@ -0,0 +1,46 @@
+"""drop wallet balance notify trigger
+
+Revision ID: a3d5f7b9c1e2
+Revises: e6c1a9d4b3f7
+Create Date: 2026-10-18 18:10:00.000000
+
+NOTIFY в транзакции берет при фиксации глобальную блокировку очереди
+уведомлений, то есть выстраивает в очередь фиксации всех пишущих
+транзакций базы. Поэтому триггер wallets_notify_balance по умолчанию
+не стоит: его ставит `python cli.py notify enable` там, где кэш
+слушает изменения балансов (models/triggers.py). Функция
+notify_wallet_balance остается в схеме.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3d5f7b9c1e2"
+down_revision: Union[str, Sequence[str], None] = "e6c1a9d4b3f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOCK_TIMEOUT = "5s"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    op.execute("DROP TRIGGER IF EXISTS wallets_notify_balance ON wallets")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    op.execute("""
+        CREATE OR REPLACE TRIGGER wallets_notify_balance
+        AFTER UPDATE OF balance, shards ON wallets
+        FOR EACH ROW
+        WHEN (
+            OLD.balance IS DISTINCT FROM NEW.balance
+            OR OLD.shards IS DISTINCT FROM NEW.shards
+        )
+        EXECUTE FUNCTION notify_wallet_balance()
+        """)
@@ -0,0 +1,130 @@
+"""
+Допуск операций к выполнению (admission control).
+
+Когда PostgreSQL замедляется, операции копятся в event loop в ожидании
+соединения пула, и задержка растет, пока клиенты не отвалятся по
+таймауту. Контроллер ограничивает число одновременных операций процесса
+и операций над одним кошельком, а лишним дает подождать в короткой
+очереди. Если очередь переполнена или ожидание истекло, операция сразу
+получает отказ: лучше быстро отказать части запросов, чем замедлить все.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from uuid import UUID
+
+from exceptions import Overloaded
+from metrics import ADMISSION_QUEUED, ADMISSION_REJECTED
+
+QUEUE_FULL = "queue_full"
+TIMEOUT = "timeout"
+
+
+class AdmissionController:
+    """
+    Ограничение одновременных операций: не больше max_concurrency
+    всего и не больше wallet_concurrency над одним кошельком
+    (0 - без ограничения на кошелек). Сверх этого ждут не больше
+    max_queue операций и не дольше queue_timeout секунд.
+
+    Сначала берется место кошелька, потом общее, поэтому очередь
+    к "горячему" кошельку не занимает общие места.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        wallet_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+    ):
+        self.max_concurrency = max_concurrency
+        self.wallet_concurrency = wallet_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._global = asyncio.Semaphore(max_concurrency)
+        # uuid -> [семафор кошелька, сколько операций его держат или ждут]
+        self._wallets: dict[UUID, list] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {QUEUE_FULL: 0, TIMEOUT: 0}
+
+    @asynccontextmanager
+    async def admit(self, wallet_uuid: UUID) -> AsyncIterator[None]:
+        """
+        Выполнить блок, когда операция над кошельком допущена.
+        :param wallet_uuid:
+        :return:
+        :raises Overloaded: Очередь переполнена или ожидание истекло.
+        """
+        semaphores = [self._global]
+        if self.wallet_concurrency > 0:
+            entry = self._wallets.get(wallet_uuid)
+            if entry is None:
+                entry = self._wallets[wallet_uuid] = [
+                    asyncio.Semaphore(self.wallet_concurrency),
+                    0,
+                ]
+            entry[1] += 1
+            semaphores.insert(0, entry[0])
+        try:
+            try:
+                await self._acquire(semaphores)
+            except Overloaded as e:
+                self.rejected[e.reason] += 1
+                ADMISSION_REJECTED.labels(e.reason).inc()
+                raise
+            self.admitted += 1
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                for semaphore in semaphores:
+                    semaphore.release()
+        finally:
+            if self.wallet_concurrency > 0:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._wallets[wallet_uuid]
+
+    async def _acquire(self, semaphores: list[asyncio.Semaphore]) -> None:
+        acquired = []
+        deadline = None
+        try:
+            for semaphore in semaphores:
+                if semaphore.locked():
+                    if self.queued >= self.max_queue:
+                        raise Overloaded(QUEUE_FULL)
+                    if deadline is None:
+                        deadline = (
+                            asyncio.get_running_loop().time() + self.queue_timeout
+                        )
+                    self.queued += 1
+                    ADMISSION_QUEUED.inc()
+                    try:
+                        async with asyncio.timeout_at(deadline):
+                            await semaphore.acquire()
+                    except TimeoutError:
+                        raise Overloaded(TIMEOUT)
+                    finally:
+                        self.queued -= 1
+                        ADMISSION_QUEUED.dec()
+                else:
+                    await semaphore.acquire()
+                acquired.append(semaphore)
+        except BaseException:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected[QUEUE_FULL],
+            "rejected_timeout": self.rejected[TIMEOUT],
+        }
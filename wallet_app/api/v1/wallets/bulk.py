@@ -0,0 +1,104 @@
+import csv
+from collections.abc import AsyncIterable, AsyncIterator, Iterator
+from enum import Enum
+from tempfile import SpooledTemporaryFile
+
+from pydantic import ValidationError
+from schemas.wallet import WalletCreateSchema
+
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+class BulkFormat(str, Enum):
+    """
+    Форматы потоковой загрузки кошельков.
+    NDJSON - по объекту {"balance": "..."} на строку,
+    CSV - таблица с заголовком, содержащим колонку balance.
+    """
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class BulkRowError(ValueError):
+    """
+    Невалидная строка загрузки. line_no считается от нуля.
+    """
+
+    def __init__(self, line_no: int, error: ValidationError | str):
+        super().__init__(f"Line {line_no}: {error}")
+        self.line_no = line_no
+        self.error = error
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """
+    Разбивает поток байтов на строки, держа в памяти не больше одной
+    незавершенной строки.
+    :param chunks: Поток байтов, например request.stream().
+    :return: Строки без перевода строки.
+    """
+    tail = b""
+    async for chunk in chunks:
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r")
+    if tail:
+        yield tail.rstrip(b"\r")
+
+
+async def parse_wallet_rows(
+    lines: AsyncIterable[bytes],
+    fmt: BulkFormat,
+) -> AsyncIterator[WalletCreateSchema]:
+    """
+    Потоковый разбор загружаемых кошельков.
+    Пустые строки пропускаются.
+    :param lines: Строки NDJSON или CSV.
+    :param fmt: Формат строк.
+    :return: Провалидированные кошельки в порядке загрузки.
+    """
+    balance_column = None
+    async for line_no, line in _enumerate(lines):
+        if not line.strip():
+            continue
+        if fmt == BulkFormat.NDJSON:
+            try:
+                wallet = WalletCreateSchema.model_validate_json(line)
+            except ValidationError as e:
+                raise BulkRowError(line_no, e)
+            yield wallet
+            continue
+
+        row = next(csv.reader([line.decode()]))
+        if balance_column is None:
+            if "balance" not in row:
+                raise BulkRowError(line_no, "CSV header must contain 'balance'")
+            balance_column = row.index("balance")
+            continue
+        if balance_column >= len(row):
+            raise BulkRowError(line_no, "missing 'balance' value")
+        try:
+            wallet = WalletCreateSchema(balance=row[balance_column])
+        except ValidationError as e:
+            raise BulkRowError(line_no, e)
+        yield wallet
+
+
+async def _enumerate(lines: AsyncIterable[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    line_no = 0
+    async for line in lines:
+        yield line_no, line
+        line_no += 1
+
+
+def iter_spooled(file: SpooledTemporaryFile) -> Iterator[bytes]:
+    """
+    Отдает накопленный результат с начала файла и закрывает его.
+    :param file:
+    :return: Строки файла.
+    """
+    with file:
+        file.seek(0)
+        yield from file
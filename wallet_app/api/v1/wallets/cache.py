@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from uuid import UUID
+
+MISSING = object()
+
+
+class BalanceCache:
+    """
+    Ограниченный по размеру LRU-кэш балансов с TTL.
+    Значение None означает, что кошелька нет (отрицательная запись,
+    живет negative_ttl секунд).
+
+    Кэш сквозной записи: WalletCRUD кладет в него баланс, полученный
+    после фиксации транзакции. Изменения из других процессов он не видит,
+    поэтому устаревание ограничено ttl.
+
+    Вместе с балансом хранится версия кошелька, если она известна:
+    по ней отдается ETag, а баланс более старой версии (запоздавшее
+    чтение или уведомление) не затирает запись.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[UUID, tuple[Decimal | None, float, int | None]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, wallet_uuid: UUID) -> Decimal | None | object:
+        """
+        Баланс кошелька из кэша.
+        :param wallet_uuid:
+        :return: Баланс, None для несуществующего кошелька
+        или MISSING, если записи нет либо она устарела.
+        """
+        entry = self._entries.get(wallet_uuid)
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return MISSING
+        self._entries.move_to_end(wallet_uuid)
+        self.hits += 1
+        return entry[0]
+
+    def version(self, wallet_uuid: UUID) -> int | None:
+        """
+        Версия кошелька из записи, которую только что вернул get.
+        :param wallet_uuid:
+        :return: Версия или None, если она неизвестна.
+        """
+        entry = self._entries.get(wallet_uuid)
+        return entry[2] if entry is not None else None
+
+    def set(
+        self,
+        wallet_uuid: UUID,
+        balance: Decimal | None,
+        version: int | None = None,
+    ) -> None:
+        """
+        Записать баланс кошелька. None - кошелька нет.
+        Запись с более новой версией не меняется: чтение, начатое
+        до фиксации операции, может закончиться после того, как ее
+        баланс попал в кэш. Кошельки не удаляются, поэтому "кошелька нет"
+        старше любой известной версии.
+        :param wallet_uuid:
+        :param balance:
+        :param version: Версия строки с этим балансом, если известна.
+        :return:
+        """
+        entry = self._entries.get(wallet_uuid)
+        if entry is not None and entry[2] is not None:
+            if balance is None or (version is not None and version < entry[2]):
+                return
+        ttl = self.ttl if balance is not None else self.negative_ttl
+        self._entries[wallet_uuid] = (balance, time.monotonic() + ttl, version)
+        self._entries.move_to_end(wallet_uuid)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def refresh(
+        self,
+        wallet_uuid: UUID,
+        balance: Decimal,
+        version: int | None = None,
+    ) -> None:
+        """
+        Обновить баланс, только если кошелек уже есть в кэше.
+        Используется для изменений из других процессов, чтобы не заполнять
+        кэш кошельками, которые этот процесс не читает.
+        Запись с более новой версией не меняется (см. set).
+        :param wallet_uuid:
+        :param balance:
+        :param version:
+        :return:
+        """
+        if wallet_uuid in self._entries:
+            self.set(wallet_uuid, balance, version)
+
+    def discard(self, wallet_uuid: UUID) -> None:
+        self._entries.pop(wallet_uuid, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
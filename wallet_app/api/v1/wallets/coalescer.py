@@ -0,0 +1,224 @@
+import asyncio
+from dataclasses import dataclass
+from decimal import Decimal
+from uuid import UUID
+
+from exceptions import WalletNotFound
+from models import Wallet
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.v1.wallets import statements
+from api.v1.wallets.cache import BalanceCache
+from api.v1.wallets.crud import WalletCRUD
+from api.v1.wallets.folding import (
+    delta_params,
+    replay_operations,
+    set_balances_params,
+)
+from api.v1.wallets.shards import apply_sharded
+
+
+@dataclass(slots=True)
+class PendingOperation:
+    op_type: OperationTypeSchema
+    amount: Decimal
+    future: asyncio.Future
+    shards: int = 0
+    # Версия кошелька есть только у последней примененной операции
+    # пачки: ее баланс - зафиксированный баланс кошелька.
+    version: int | None = None
+
+    def resolve(self, result: Decimal | Exception) -> None:
+        # Запрос мог быть отменен, пока пачка писалась в БД.
+        if self.future.done():
+            return
+        if isinstance(result, Exception):
+            self.future.set_exception(result)
+        else:
+            self.future.set_result(result)
+
+
+class OperationCoalescer:
+    """
+    Объединяет операции над одним кошельком, пришедшие в течение окна,
+    в одну запись в БД. Для "горячих" кошельков N ожиданий блокировки
+    строки превращаются в одно.
+
+    Операции применяются в порядке поступления: каждое списание проверяется
+    по текущему промежуточному балансу, и каждый ожидающий запрос получает
+    свой собственный результат.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, window: float):
+        self.session_factory = session_factory
+        self.window = window
+        self._pending: dict[UUID, list[PendingOperation]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        wallet_uuid: UUID,
+        op_type: OperationTypeSchema,
+        amount: Decimal,
+    ) -> Wallet:
+        """
+        Поставить операцию в очередь кошелька и дождаться ее результата.
+        :param wallet_uuid:
+        :param op_type:
+        :param amount:
+        :return: Кошелек с балансом сразу после этой операции и версией,
+        если операция последняя примененная в пачке.
+        """
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.get(wallet_uuid)
+        if batch is None:
+            batch = self._pending[wallet_uuid] = []
+            task = asyncio.create_task(self._flush_after_window(wallet_uuid))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        pending = PendingOperation(op_type, amount, future)
+        batch.append(pending)
+        balance = await future
+        return Wallet(
+            uuid=wallet_uuid,
+            balance=balance,
+            shards=pending.shards,
+            version=pending.version,
+        )
+
+    async def _flush_after_window(self, wallet_uuid: UUID) -> None:
+        await asyncio.sleep(self.window)
+        batch = self._pending.pop(wallet_uuid)
+        try:
+            async with self.session_factory() as session:
+                await self._apply(session, wallet_uuid, batch)
+        except Exception as e:
+            for op in batch:
+                op.resolve(e)
+
+    async def _apply(
+        self,
+        session: AsyncSession,
+        wallet_uuid: UUID,
+        batch: list[PendingOperation],
+    ) -> None:
+        """
+        Сначала пробует один UPDATE на чистую сумму пачки при условии, что
+        баланс нигде не уходит в минус. Если условие не выполнено, строка
+        блокируется и операции проверяются по одной. Пачка шардированного
+        кошелька применяется через shards.apply_sharded.
+        """
+        valid = []
+        for op in batch:
+            if op.op_type in (
+                OperationTypeSchema.DEPOSIT,
+                OperationTypeSchema.WITHDRAW,
+            ):
+                valid.append(op)
+            else:
+                op.resolve(ValueError(f"Unknown operation type: {op.op_type}"))
+        if not valid:
+            return
+
+        ops = [(op.op_type, op.amount) for op in valid]
+        params, folded = delta_params({wallet_uuid: ops})
+        applied = (
+            await session.execute(statements.apply_deltas_stmt(), params)
+        ).one_or_none()
+        if applied is not None:
+            await session.commit()
+            net, _, offsets = folded[wallet_uuid]
+            start = applied.balance - net
+            valid[-1].version = applied.version
+            for op, offset in zip(valid, offsets):
+                op.resolve(start + offset)
+            return
+
+        wallet = (
+            await session.execute(
+                select(Wallet.balance, Wallet.shards)
+                .where(Wallet.uuid == wallet_uuid)
+                .with_for_update()
+            )
+        ).one_or_none()
+        if wallet is None:
+            await session.rollback()
+            for op in valid:
+                op.resolve(WalletNotFound(wallet_uuid))
+            return
+        if wallet.shards:
+            results = await apply_sharded(session, wallet_uuid, wallet.shards, ops)
+            await session.commit()
+            for op, result in zip(valid, results):
+                op.shards = wallet.shards
+                op.resolve(result)
+            return
+
+        balance, results = replay_operations(wallet_uuid, wallet.balance, ops)
+        applied_ops = [
+            (op, (wallet_uuid, op_type, amount, result))
+            for op, (op_type, amount), result in zip(valid, ops, results)
+            if not isinstance(result, Exception)
+        ]
+        if applied_ops:
+            updated = (
+                await session.execute(
+                    statements.set_balances_stmt(),
+                    set_balances_params(
+                        {wallet_uuid: balance}, [entry for _, entry in applied_ops]
+                    ),
+                )
+            ).one()
+            await session.commit()
+            applied_ops[-1][0].version = updated.version
+        else:
+            # Все операции отклонены: кошелек и его версия не меняются.
+            await session.rollback()
+        for op, result in zip(valid, results):
+            op.resolve(result)
+
+
+class CoalescingWalletCRUD(WalletCRUD):
+    """
+    WalletCRUD, у которого операции проходят через OperationCoalescer.
+    Операции с ключом идемпотентности выполняются напрямую: ключ
+    должен фиксироваться в одной транзакции с изменением баланса.
+    Условные операции (If-Match) тоже: пачка меняет версию один раз
+    на все свои операции, поэтому версию (и ETag) получает только
+    последняя примененная операция пачки, и только она пишет в кэш.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        coalescer: OperationCoalescer,
+        cache: BalanceCache | None = None,
+    ):
+        super().__init__(session, cache)
+        self.coalescer = coalescer
+
+    async def operation(
+        self,
+        wallet_uuid: UUID,
+        op_type: OperationTypeSchema,
+        amount: Decimal,
+        idempotency_key: str | None = None,
+        if_match: list[int] | None = None,
+    ) -> Wallet:
+        if idempotency_key is not None or if_match is not None:
+            return await super().operation(
+                wallet_uuid, op_type, amount, idempotency_key, if_match
+            )
+        try:
+            wallet = await self.coalescer.submit(wallet_uuid, op_type, amount)
+        except WalletNotFound:
+            self._remember(wallet_uuid, None)
+            raise
+        if wallet.shards:
+            if self.cache is not None:
+                self.cache.discard(wallet_uuid)
+        elif wallet.version is not None:
+            self._remember(wallet_uuid, wallet.balance, wallet.version)
+        return wallet
@@ -1,16 +1,68 @@
+from collections.abc import AsyncIterable, AsyncIterator
+from datetime import datetime
 from decimal import Decimal
-from uuid import UUID
+from functools import partial
+from uuid import UUID, uuid4
 
-from exceptions import NotEnoughBalanceError, WalletNotFound
-from models import Wallet
-from schemas.operation import OperationTypeSchema
+from config import settings
+from exceptions import (
+    IdempotencyKeyReused,
+    NotEnoughBalanceError,
+    WalletNotFound,
+    WalletVersionMismatch,
+)
+from models import IdempotencyKey, Wallet, WalletBalanceShard, WalletOperation
+from models.money import to_minor
+from schemas.operation import (
+    OperationResultSchema,
+    OperationSchema,
+    OperationStatusSchema,
+    OperationTypeSchema,
+)
 from schemas.wallet import WalletCreateSchema
+from sqlalchemy import any_, bindparam, case, func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from api.v1.wallets import statements
+from api.v1.wallets.cache import MISSING, BalanceCache
+from api.v1.wallets.folding import (
+    delta_params,
+    operation_status,
+    replay_operations,
+    set_balances_params,
+)
+from api.v1.wallets.pagination import Cursor
+from api.v1.wallets.shards import apply_sharded, known_shards, sharded_balance
+from api.v1.wallets.singleflight import SingleFlight
+
+SWITCH_RETRIES = 3
+
 
 class WalletCRUD:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache: BalanceCache | None = None,
+        single_flight: SingleFlight | None = None,
+    ):
         self.session = session
+        self.cache = cache
+        self.single_flight = single_flight
+
+    def _remember(
+        self,
+        wallet_uuid: UUID,
+        balance: Decimal | None,
+        version: int | None = None,
+    ) -> None:
+        """
+        Сквозная запись в кэш балансов, если он включен.
+        Вызывается только с данными, уже зафиксированными в БД.
+        """
+        if self.cache is not None:
+            self.cache.set(wallet_uuid, balance, version)
 
     async def create(self, wallet: WalletCreateSchema) -> Wallet:
         """
@@ -18,44 +70,664 @@ class WalletCRUD:
         :param wallet:
         :return:
         """
-        wallet = Wallet(balance=wallet.balance)
-        self.session.add(wallet)
+        wallet = Wallet(uuid=uuid4(), balance=wallet.balance, version=1)
+        await self.session.execute(statements.create_stmt(wallet.uuid, wallet.balance))
         await self.session.commit()
+        self._remember(wallet.uuid, wallet.balance, wallet.version)
         return wallet
 
+    async def bulk_create(
+        self,
+        wallets: AsyncIterable[WalletCreateSchema],
+        chunk_size: int = 10_000,
+    ) -> AsyncIterator[UUID]:
+        """
+        Асинхронный метод массового создания кошельков.
+        Кошельки загружаются через COPY пачками по chunk_size, поэтому
+        память не зависит от размера входных данных. Все пачки идут в одной
+        транзакции, которая фиксируется, когда поток uuid дочитан до конца.
+        :param wallets: Поток создаваемых кошельков.
+        :param chunk_size: Размер пачки COPY.
+        :return: Поток uuid созданных кошельков в порядке входных данных.
+        """
+        conn = await self.session.connection()
+        raw = (await conn.get_raw_connection()).driver_connection
+        records = []
+        async for wallet in wallets:
+            records.append((uuid4(), wallet.balance))
+            if len(records) >= chunk_size:
+                await self._copy_wallets(raw, records)
+                for wallet_uuid, _ in records:
+                    yield wallet_uuid
+                records = []
+        if records:
+            await self._copy_wallets(raw, records)
+            for wallet_uuid, _ in records:
+                yield wallet_uuid
+        await self.session.commit()
+
+    @staticmethod
+    async def _copy_wallets(raw, records: list[tuple[UUID, Decimal]]) -> None:
+        # COPY идет мимо типов SQLAlchemy: суммы переводятся здесь.
+        records = [(wallet_uuid, to_minor(balance)) for wallet_uuid, balance in records]
+        await raw.copy_records_to_table(
+            Wallet.__tablename__,
+            records=records,
+            columns=("uuid", "balance"),
+        )
+        await raw.copy_records_to_table(
+            WalletOperation.__tablename__,
+            records=[
+                (wallet_uuid, OperationTypeSchema.DEPOSIT.value, balance, balance)
+                for wallet_uuid, balance in records
+                if balance
+            ],
+            columns=statements.LEDGER_COLUMNS,
+        )
+
     async def get_by_uuid(self, wallet_uuid: UUID) -> Wallet | None:
         """
         Асинхронный метод получения кошелька.
+        При включенном кэше балансов БД запрашивается только на промах.
+        Сессия может быть открыта на реплике (см. get_read_session).
+        С single_flight одновременные чтения одного кошелька из одного
+        источника (primary или реплики) ждут один запрос к БД.
+        :param wallet_uuid:
+        :return:
+        """
+        cached = self._cached(wallet_uuid)
+        if cached is not MISSING:
+            return cached
+        if self.single_flight is None:
+            return await self._read_wallet(wallet_uuid)
+        return await self.single_flight.do(
+            (bool(self.session.info.get("replica")), wallet_uuid),
+            partial(self._read_wallet, wallet_uuid),
+        )
+
+    async def _read_wallet(self, wallet_uuid: UUID) -> Wallet | None:
+        """
+        Кошелек из БД, для шардированного - с суммой шардов.
         :param wallet_uuid:
         :return:
         """
-        return await self.session.get(Wallet, wallet_uuid)
+        wallet = await self.session.get(Wallet, wallet_uuid)
+        if wallet is not None and wallet.shards:
+            # Баланс шардированного кошелька не кэшируется: он меняется
+            # без UPDATE строки wallets и без NOTIFY.
+            balance = await sharded_balance(self.session, wallet_uuid)
+            return Wallet(
+                uuid=wallet_uuid,
+                balance=wallet.balance + balance,
+                shards=wallet.shards,
+            )
+        self._remember_read(wallet_uuid, wallet)
+        return wallet
+
+    async def get_many(self, wallet_uuids: list[UUID]) -> dict[UUID, Wallet]:
+        """
+        Асинхронный метод получения нескольких кошельков одним запросом
+        WHERE uuid = ANY(...). При включенном кэше балансов БД
+        запрашивается только для промахов.
+        :param wallet_uuids: uuid без повторов.
+        :return: Найденные кошельки по uuid; отсутствующих в словаре нет.
+        """
+        found, pending = {}, []
+        for wallet_uuid in wallet_uuids:
+            cached = self._cached(wallet_uuid)
+            if cached is MISSING:
+                pending.append(wallet_uuid)
+            elif cached is not None:
+                found[wallet_uuid] = cached
+        if pending:
+            for wallet in await self._fetch_many(pending):
+                found[wallet.uuid] = wallet
+                if not wallet.shards:
+                    self._remember_read(wallet.uuid, wallet)
+            for wallet_uuid in pending:
+                if wallet_uuid not in found:
+                    self._remember_read(wallet_uuid, None)
+        return found
+
+    async def _fetch_many(self, wallet_uuids: list[UUID]) -> list[Wallet]:
+        """
+        Кошельки из БД, для шардированных - с суммой шардов.
+        :param wallet_uuids:
+        :return: Найденные кошельки в произвольном порядке.
+        """
+        shard_sum = (
+            select(func.coalesce(func.sum(WalletBalanceShard.balance), 0))
+            .where(WalletBalanceShard.wallet_uuid == Wallet.uuid)
+            .scalar_subquery()
+        )
+        rows = await self.session.execute(
+            select(
+                Wallet.uuid,
+                Wallet.balance + case((Wallet.shards > 0, shard_sum), else_=0),
+                Wallet.shards,
+                Wallet.version,
+            ).where(
+                Wallet.uuid
+                == any_(
+                    bindparam(
+                        "uuids",
+                        wallet_uuids,
+                        type_=ARRAY(PG_UUID(as_uuid=True)),
+                    )
+                )
+            )
+        )
+        return [
+            Wallet(
+                uuid=wallet_uuid,
+                balance=balance,
+                shards=shards,
+                version=None if shards else version,
+            )
+            for wallet_uuid, balance, shards, version in rows
+        ]
+
+    def _cached(self, wallet_uuid: UUID) -> Wallet | None | object:
+        """
+        Кошелек из кэша балансов.
+        :param wallet_uuid:
+        :return: Кошелек, None - кошелька нет, MISSING - записи нет
+        или кэш выключен.
+        """
+        if self.cache is None:
+            return MISSING
+        balance = self.cache.get(wallet_uuid)
+        if balance is MISSING or balance is None:
+            return balance
+        return Wallet(
+            uuid=wallet_uuid,
+            balance=balance,
+            version=self.cache.version(wallet_uuid),
+        )
+
+    def _remember_read(self, wallet_uuid: UUID, wallet: Wallet | None) -> None:
+        if not self.session.info.get("replica"):
+            # Реплика может отставать от primary: ее данные в кэш не идут.
+            if wallet is None:
+                self._remember(wallet_uuid, None)
+            else:
+                self._remember(wallet_uuid, wallet.balance, wallet.version)
+
+    async def export_balances(
+        self,
+        chunk_size: int = 10_000,
+    ) -> AsyncIterator[list[tuple[UUID, Decimal]]]:
+        """
+        Асинхронный метод выгрузки балансов всех кошельков в порядке uuid.
+        Строки читаются серверным курсором пачками по chunk_size, поэтому
+        память не зависит от числа кошельков. Выгрузка идет в одной
+        транзакции REPEATABLE READ READ ONLY: все пачки видят один снимок,
+        и сумма выгруженных балансов сходится. Сессия должна быть новой.
+        :param chunk_size: Размер пачки.
+        :return: Поток пачек (uuid, баланс), для шардированного кошелька -
+        с суммой шардов.
+        """
+        await self.session.connection(
+            execution_options={
+                "isolation_level": "REPEATABLE READ",
+                "postgresql_readonly": True,
+            }
+        )
+        shards = (
+            select(
+                WalletBalanceShard.wallet_uuid,
+                func.sum(WalletBalanceShard.balance).label("balance"),
+            )
+            .group_by(WalletBalanceShard.wallet_uuid)
+            .subquery()
+        )
+        stmt = (
+            select(Wallet.uuid, Wallet.balance + func.coalesce(shards.c.balance, 0))
+            .outerjoin(shards, shards.c.wallet_uuid == Wallet.uuid)
+            .order_by(Wallet.uuid)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.session.stream(stmt)
+        async for rows in result.partitions():
+            yield [tuple(row) for row in rows]
+        await self.session.commit()
+
+    async def history(
+        self,
+        wallet_uuid: UUID,
+        limit: int,
+        after: Cursor | None = None,
+        operation_type: OperationTypeSchema | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ) -> tuple[list[WalletOperation], Cursor | None]:
+        """
+        Асинхронный метод чтения истории операций кошелька, от новых
+        к старым. Keyset-пагинация по (created_at, id): страница читается
+        из индекса ix_wallet_operations_history без сортировки и OFFSET,
+        а границы по времени отсекают лишние секции журнала.
+        :param wallet_uuid:
+        :param limit: Размер страницы.
+        :param after: Ключ последней записи предыдущей страницы.
+        :param operation_type: Только операции этого типа.
+        :param since: Не раньше этого момента (включительно).
+        :param until: Раньше этого момента (не включительно).
+        :return: Записи страницы и ключ для следующей страницы
+        (None на последней).
+        """
+        stmt = (
+            select(WalletOperation)
+            .where(WalletOperation.wallet_uuid == wallet_uuid)
+            .order_by(WalletOperation.created_at.desc(), WalletOperation.id.desc())
+            .limit(limit + 1)
+        )
+        if after is not None:
+            stmt = stmt.where(
+                tuple_(WalletOperation.created_at, WalletOperation.id) < tuple_(*after)
+            )
+        if operation_type is not None:
+            stmt = stmt.where(WalletOperation.operation_type == operation_type)
+        if since is not None:
+            stmt = stmt.where(WalletOperation.created_at >= since)
+        if until is not None:
+            stmt = stmt.where(WalletOperation.created_at < until)
+        items = list(await self.session.scalars(stmt))
+        if not items and after is None:
+            exists = await self.session.scalar(
+                select(Wallet.uuid).where(Wallet.uuid == wallet_uuid)
+            )
+            if exists is None:
+                raise WalletNotFound(wallet_uuid)
+        if len(items) <= limit:
+            return items, None
+        items = items[:limit]
+        return items, (items[-1].created_at, items[-1].id)
 
     async def operation(
         self,
         wallet_uuid: UUID,
         op_type: OperationTypeSchema,
         amount: Decimal,
+        idempotency_key: str | None = None,
+        if_match: list[int] | None = None,
     ) -> Wallet:
         """
         Асинхронный метод выполнения определенной операции.
+        Баланс меняется одним условным UPDATE ... RETURNING на стороне БД,
+        поэтому параллельные операции над одним кошельком не теряют
+        обновлений; запись в журнал операций идет в том же выражении.
+        Второй запрос выполняется только при неудаче, чтобы отличить
+        отсутствующий кошелек от нехватки средств и от шардированного.
+        С ключом идемпотентности результат (в том числе отказ) сохраняется
+        в той же транзакции, а повтор с тем же ключом в пределах TTL
+        возвращает сохраненный результат, не трогая кошелек.
+        С if_match операция применяется, только если версия кошелька
+        из списка: условие проверяет тот же UPDATE.
         :param wallet_uuid:
         :param op_type:
         :param amount:
-        :return:
+        :param idempotency_key: Значение заголовка Idempotency-Key.
+        :param if_match: Версии из заголовка If-Match.
+        :return: Кошелек с балансом и версией после операции.
+        :raises WalletVersionMismatch: Версия кошелька не из if_match
+        или кошелек шардирован (у него нет версии баланса).
         """
-        wallet = await self.get_by_uuid(wallet_uuid)
-        if not wallet:
-            raise WalletNotFound(wallet_uuid)
-        if op_type == OperationTypeSchema.DEPOSIT:
-            wallet.balance += amount
-        elif op_type == OperationTypeSchema.WITHDRAW:
-            if wallet.balance < amount:
-                raise NotEnoughBalanceError(
-                    f"На кошельке {wallet_uuid} недостаточно средств."
-                )
-            wallet.balance -= amount
+        if idempotency_key is not None:
+            stored = await self._claim_idempotency_key(idempotency_key)
+            if stored is not None:
+                await self.session.commit()
+                return self._replay(stored, wallet_uuid, op_type, amount)
+
+        result, sharded, version = await self._apply_operation(
+            wallet_uuid, op_type, amount, if_match
+        )
+        if isinstance(result, WalletVersionMismatch):
+            # Кошелек не изменен, и ключ идемпотентности не сохраняется:
+            # повтор с актуальной версией должен выполниться.
+            await self.session.rollback()
+            raise result
+        status = operation_status(result)
+        if idempotency_key is not None:
+            await self._store_idempotency_key(
+                idempotency_key,
+                wallet_uuid,
+                op_type,
+                amount,
+                status,
+                None if isinstance(result, Exception) else result,
+                version,
+            )
+            await self.session.commit()
+        elif status == OperationStatusSchema.OK:
+            await self.session.commit()
         else:
-            raise ValueError(f"Unknown operation type: {op_type}")
+            await self.session.rollback()
+
+        if sharded:
+            if self.cache is not None:
+                self.cache.discard(wallet_uuid)
+        elif status == OperationStatusSchema.WALLET_NOT_FOUND:
+            self._remember(wallet_uuid, None)
+        elif status == OperationStatusSchema.OK:
+            self._remember(wallet_uuid, result, version)
+        if isinstance(result, Exception):
+            raise result
+        return Wallet(uuid=wallet_uuid, balance=result, version=version)
+
+    async def _apply_operation(
+        self,
+        wallet_uuid: UUID,
+        op_type: OperationTypeSchema,
+        amount: Decimal,
+        if_match: list[int] | None = None,
+    ) -> tuple[Decimal | Exception, bool, int | None]:
+        """
+        Одна операция в текущей транзакции, без фиксации.
+        Шардированные кошельки условный UPDATE не трогает: они
+        распознаются вторым запросом и идут через shards.apply_sharded,
+        а дальше процесс помнит их и сразу идет к шардам.
+        Повтор нужен, только если шардирование переключили между
+        запросами.
+        :return: Баланс после операции либо исключение отказа, признак
+        шардированного кошелька и версия кошелька после операции
+        (None для шардированного).
+        """
+        shards = known_shards.get(wallet_uuid)
+        if shards is not None:
+            if if_match is not None:
+                return WalletVersionMismatch(wallet_uuid), False, None
+            results = await apply_sharded(
+                self.session, wallet_uuid, shards, [(op_type, amount)]
+            )
+            if results is not None:
+                return results[0], True, None
+            known_shards.pop(wallet_uuid, None)
+
+        for _ in range(SWITCH_RETRIES):
+            applied = (
+                await self.session.execute(
+                    statements.operation_stmt(wallet_uuid, op_type, amount, if_match)
+                )
+            ).one_or_none()
+            if applied is not None:
+                return applied.balance, False, applied.version
+            wallet = (
+                await self.session.execute(
+                    select(Wallet.shards, Wallet.version).where(
+                        Wallet.uuid == wallet_uuid
+                    )
+                )
+            ).one_or_none()
+            if wallet is None:
+                return WalletNotFound(wallet_uuid), False, None
+            if if_match is not None and (
+                wallet.shards or wallet.version not in if_match
+            ):
+                return WalletVersionMismatch(wallet_uuid), False, None
+            if not wallet.shards:
+                return (
+                    NotEnoughBalanceError(
+                        f"На кошельке {wallet_uuid} недостаточно средств."
+                    ),
+                    False,
+                    None,
+                )
+            results = await apply_sharded(
+                self.session, wallet_uuid, wallet.shards, [(op_type, amount)]
+            )
+            if results is not None:
+                known_shards[wallet_uuid] = wallet.shards
+                return results[0], True, None
+        raise RuntimeError(f"Sharding of wallet {wallet_uuid} keeps changing")
+
+    async def transfer(
+        self,
+        source_uuid: UUID,
+        target_uuid: UUID,
+        amount: Decimal,
+    ) -> tuple[Wallet, Wallet]:
+        """
+        Асинхронный метод перевода между кошельками в одной транзакции.
+        Обычно перевод - одно выражение statements.transfer_stmt. Если оно
+        ничего не изменило, строки обоих кошельков уже заблокированы
+        в порядке uuid, и списание с пополнением выполняются отдельными
+        операциями: так различаются отказы и поддерживаются шардированные
+        кошельки.
+        :param source_uuid: Кошелек, с которого списываются средства.
+        :param target_uuid: Кошелек, который пополняется.
+        :param amount:
+        :return: Кошельки-источник и получатель с балансами и версиями
+        после перевода.
+        """
+        applied = await self.session.execute(
+            statements.transfer_stmt(),
+            {"source_uuid": source_uuid, "target_uuid": target_uuid, "amount": amount},
+        )
+        wallets = {
+            wallet_uuid: Wallet(uuid=wallet_uuid, balance=balance, version=version)
+            for wallet_uuid, balance, version in applied.all()
+        }
+        sharded = set()
+        if not wallets:
+            for wallet_uuid, op_type in (
+                (source_uuid, OperationTypeSchema.WITHDRAW),
+                (target_uuid, OperationTypeSchema.DEPOSIT),
+            ):
+                result, is_sharded, version = await self._apply_operation(
+                    wallet_uuid, op_type, amount
+                )
+                if isinstance(result, Exception):
+                    await self.session.rollback()
+                    raise result
+                wallets[wallet_uuid] = Wallet(
+                    uuid=wallet_uuid, balance=result, version=version
+                )
+                if is_sharded:
+                    sharded.add(wallet_uuid)
         await self.session.commit()
-        return wallet
+
+        for wallet_uuid, wallet in wallets.items():
+            if wallet_uuid in sharded:
+                if self.cache is not None:
+                    self.cache.discard(wallet_uuid)
+            else:
+                self._remember(wallet_uuid, wallet.balance, wallet.version)
+        return wallets[source_uuid], wallets[target_uuid]
+
+    async def _claim_idempotency_key(self, key: str) -> IdempotencyKey | None:
+        """
+        Блокирует ключ до конца транзакции и ищет его сохраненный
+        результат. Уникальный индекс по одному key на секционированной
+        таблице невозможен, поэтому параллельные запросы с одним ключом
+        сериализуются advisory-блокировкой: второй дождется фиксации
+        первого и увидит его результат.
+        :param key:
+        :return: Сохраненная запись или None, если ключ новый.
+        """
+        await self.session.execute(
+            select(func.pg_advisory_xact_lock(func.hashtextextended(key, 0)))
+        )
+        return await self.session.scalar(
+            select(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.created_at >= func.now() - settings.idempotency.ttl,
+            )
+        )
+
+    async def _store_idempotency_key(
+        self,
+        key: str,
+        wallet_uuid: UUID,
+        op_type: OperationTypeSchema,
+        amount: Decimal,
+        status: OperationStatusSchema,
+        balance: Decimal | None = None,
+        version: int | None = None,
+    ) -> None:
+        await self.session.execute(
+            insert(IdempotencyKey).values(
+                key=key,
+                wallet_uuid=wallet_uuid,
+                operation_type=op_type,
+                amount=amount,
+                status=status,
+                balance=balance,
+                version=version,
+            )
+        )
+
+    @staticmethod
+    def _replay(
+        stored: IdempotencyKey,
+        wallet_uuid: UUID,
+        op_type: OperationTypeSchema,
+        amount: Decimal,
+    ) -> Wallet:
+        """
+        Результат повторного запроса по сохраненному ключу.
+        :raises IdempotencyKeyReused: Ключ уже использован для другой
+        операции.
+        """
+        if (stored.wallet_uuid, stored.operation_type, stored.amount) != (
+            wallet_uuid,
+            op_type,
+            amount,
+        ):
+            raise IdempotencyKeyReused(stored.key)
+        if stored.status == OperationStatusSchema.WALLET_NOT_FOUND:
+            raise WalletNotFound(wallet_uuid)
+        if stored.status == OperationStatusSchema.NOT_ENOUGH_BALANCE:
+            raise NotEnoughBalanceError(
+                f"На кошельке {wallet_uuid} недостаточно средств."
+            )
+        return Wallet(uuid=wallet_uuid, balance=stored.balance, version=stored.version)
+
+    async def batch_operation(
+        self,
+        operations: list[OperationSchema],
+        atomic: bool = True,
+    ) -> list[OperationResultSchema]:
+        """
+        Асинхронный метод выполнения пакета операций в одной транзакции.
+        Операции сворачиваются по кошелькам и применяются одним UPDATE
+        по массивам unnest. Кошельки, где какое-то списание не проходит,
+        разбираются по операциям в порядке пакета.
+        :param operations: Операции в порядке применения.
+        :param atomic: True - "все или ничего": при любой отклоненной
+        операции транзакция откатывается. False - применяются все операции,
+        которые проходят.
+        :return: Результаты в порядке операций.
+        """
+        if not operations:
+            return []
+        by_wallet: dict[UUID, list[int]] = {}
+        for i, op in enumerate(operations):
+            by_wallet.setdefault(op.wallet_uuid, []).append(i)
+        ops = {
+            wallet_uuid: [
+                (operations[i].operation_type, operations[i].amount) for i in indexes
+            ]
+            for wallet_uuid, indexes in by_wallet.items()
+        }
+        results: list[OperationResultSchema | None] = [None] * len(operations)
+
+        def _set_results(wallet_uuid: UUID, balances: list) -> None:
+            for i, result in zip(by_wallet[wallet_uuid], balances):
+                status = operation_status(result)
+                results[i] = OperationResultSchema(
+                    wallet_uuid=wallet_uuid,
+                    status=status,
+                    balance=result if status == OperationStatusSchema.OK else None,
+                )
+
+        # Итоговые баланс и версия измененных кошельков для кэша.
+        committed: dict[UUID, tuple[Decimal, int]] = {}
+        params, folded = delta_params(ops)
+        applied = await self.session.execute(statements.apply_deltas_stmt(), params)
+        for wallet_uuid, balance, version in applied.all():
+            net, _, offsets = folded[wallet_uuid]
+            _set_results(wallet_uuid, [balance - net + offset for offset in offsets])
+            committed[wallet_uuid] = (balance, version)
+
+        failed = [
+            wallet_uuid
+            for wallet_uuid in sorted(ops)
+            if results[by_wallet[wallet_uuid][0]] is None
+        ]
+        sharded = set()
+        if failed:
+            # Строки уже заблокированы первым выражением.
+            current = {
+                row.uuid: row
+                for row in await self.session.execute(
+                    select(Wallet.uuid, Wallet.balance, Wallet.shards).where(
+                        Wallet.uuid
+                        == any_(
+                            bindparam(
+                                "uuids",
+                                failed,
+                                type_=ARRAY(PG_UUID(as_uuid=True)),
+                            )
+                        )
+                    )
+                )
+            }
+            final, ledger = {}, []
+            for wallet_uuid in failed:
+                if wallet_uuid not in current:
+                    _set_results(
+                        wallet_uuid,
+                        [WalletNotFound(wallet_uuid)] * len(ops[wallet_uuid]),
+                    )
+                    continue
+                if current[wallet_uuid].shards:
+                    # Строка wallets заблокирована, поэтому шардирование
+                    # не переключится до конца транзакции.
+                    sharded.add(wallet_uuid)
+                    _set_results(
+                        wallet_uuid,
+                        await apply_sharded(
+                            self.session,
+                            wallet_uuid,
+                            current[wallet_uuid].shards,
+                            ops[wallet_uuid],
+                        ),
+                    )
+                    continue
+                final_balance, balances = replay_operations(
+                    wallet_uuid, current[wallet_uuid].balance, ops[wallet_uuid]
+                )
+                _set_results(wallet_uuid, balances)
+                applied_ops = [
+                    (wallet_uuid, op_type, amount, balance)
+                    for (op_type, amount), balance in zip(ops[wallet_uuid], balances)
+                    if not isinstance(balance, Exception)
+                ]
+                if applied_ops:
+                    final[wallet_uuid] = final_balance
+                    ledger.extend(applied_ops)
+            if not atomic and final:
+                updated = await self.session.execute(
+                    statements.set_balances_stmt(),
+                    set_balances_params(final, ledger),
+                )
+                for wallet_uuid, version in updated.all():
+                    committed[wallet_uuid] = (final[wallet_uuid], version)
+
+        rejected = any(result.status != OperationStatusSchema.OK for result in results)
+        if atomic and rejected:
+            await self.session.rollback()
+            for i, result in enumerate(results):
+                if result.status == OperationStatusSchema.OK:
+                    results[i] = OperationResultSchema(
+                        wallet_uuid=result.wallet_uuid,
+                        status=OperationStatusSchema.ROLLED_BACK,
+                    )
+        else:
+            await self.session.commit()
+            if self.cache is not None:
+                for wallet_uuid in sharded:
+                    self.cache.discard(wallet_uuid)
+            for wallet_uuid, (balance, version) in committed.items():
+                self._remember(wallet_uuid, balance, version)
+        return results
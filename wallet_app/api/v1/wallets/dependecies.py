@@ -1,10 +1,81 @@
 from typing import Annotated, AsyncGenerator
 
-from fastapi import Depends
-from models.db import session_factory
+from config import settings
+from fastapi import Depends, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from models.db import replica_router, session_factory
+from pydantic import TypeAdapter, ValidationError
+from schemas.operation import OperationSchema
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .admission import AdmissionController
+from .cache import BalanceCache
+from .coalescer import CoalescingWalletCRUD, OperationCoalescer
 from .crud import WalletCRUD
+from .events import EventRelay
+from .raw import RawWalletCRUD
+from .singleflight import SingleFlight
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+
+REPOSITORIES: dict[str, type[WalletCRUD]] = {
+    "sqlalchemy": WalletCRUD,
+    "asyncpg": RawWalletCRUD,
+}
+
+operation_coalescer = OperationCoalescer(
+    session_factory,
+    window=settings.coalescing.window,
+)
+
+balance_cache = (
+    BalanceCache(
+        max_size=settings.cache.max_size,
+        ttl=settings.cache.ttl,
+        negative_ttl=settings.cache.negative_ttl,
+    )
+    if settings.cache.enabled
+    else None
+)
+
+balance_reads = SingleFlight() if settings.single_flight else None
+
+operation_admission = (
+    AdmissionController(
+        max_concurrency=(
+            settings.admission.max_concurrency
+            if settings.admission.max_concurrency is not None
+            else settings.db.pool_size + settings.db.max_overflow
+        ),
+        wallet_concurrency=settings.admission.wallet_concurrency,
+        max_queue=settings.admission.max_queue,
+        queue_timeout=settings.admission.queue_timeout,
+    )
+    if settings.admission.enabled
+    else None
+)
+
+event_relay = (
+    EventRelay(
+        session_factory,
+        poll_interval=settings.events.poll_interval,
+        batch_size=settings.events.batch_size,
+        queue_size=settings.events.queue_size,
+    )
+    if settings.events.enabled
+    else None
+)
+
+
+async def get_event_relay() -> EventRelay:
+    """
+    Ретранслятор событий процесса для потоков SSE.
+    :return:
+    :raises HTTPException: 404, если поток событий выключен.
+    """
+    if event_relay is None:
+        raise HTTPException(status_code=404, detail="Event stream is disabled")
+    return event_relay
 
 
 async def get_session() -> AsyncGenerator[AsyncSession]:
@@ -16,6 +87,25 @@ async def get_session() -> AsyncGenerator[AsyncSession]:
         yield session
 
 
+async def get_read_session(
+    read_your_writes: Annotated[bool, Header()] = False,
+) -> AsyncGenerator[AsyncSession]:
+    """
+    Генератор асинхронной сессии только для чтения: на реплике по кругу,
+    на primary, если реплик нет или ни одна не доступна.
+    :param read_your_writes: Заголовок Read-Your-Writes: true - читать
+    с primary, чтобы увидеть только что выполненную запись, которую
+    реплика могла еще не получить.
+    :return:
+    """
+    if read_your_writes:
+        async with session_factory() as session:
+            yield session
+        return
+    async with replica_router.session() as session:
+        yield session
+
+
 async def wallet_crud(
     session: Annotated[
         AsyncSession,
@@ -27,5 +117,68 @@ async def wallet_crud(
     :param session: Async session from sqlalchemy,
     полученная путем связи с генератором сессий.
     :return: Объект класса WalletCRUD уже с имеющейся сессией.
+    Если включено объединение операций, операции идут через общий
+    для процесса OperationCoalescer. Если включен кэш балансов,
+    CRUD читает и пишет общий для процесса BalanceCache.
+    Иначе реализация выбирается настройкой repository.
     """
-    return WalletCRUD(session)
+    if settings.coalescing.enabled:
+        return CoalescingWalletCRUD(session, operation_coalescer, balance_cache)
+    return REPOSITORIES[settings.repository](session, balance_cache)
+
+
+async def read_wallet_crud(
+    session: Annotated[
+        AsyncSession,
+        Depends(get_read_session),
+    ],
+    read_your_writes: Annotated[bool, Header()] = False,
+) -> WalletCRUD:
+    """
+    CRUD для чтения балансов поверх сессии get_read_session.
+    Кэш балансов читается как обычно, но прочитанное с реплики
+    в него не записывается. Одновременные чтения одного кошелька
+    объединяются в один запрос, кроме чтений с Read-Your-Writes: true -
+    уже выполняющийся запрос мог начаться до записи клиента.
+    :param session:
+    :param read_your_writes:
+    :return:
+    """
+    return REPOSITORIES[settings.repository](
+        session,
+        balance_cache,
+        None if read_your_writes else balance_reads,
+    )
+
+
+_operations_adapter = TypeAdapter(list[OperationSchema])
+
+
+async def batch_operations_body(request: Request) -> list[OperationSchema]:
+    """
+    Тело пакетного запроса операций: JSON-массив либо NDJSON
+    (по одной операции на строку) при Content-Type application/x-ndjson.
+    :param request:
+    :return: Провалидированные операции в порядке запроса.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in NDJSON_CONTENT_TYPES:
+        try:
+            return _operations_adapter.validate_json(body)
+        except ValidationError as e:
+            raise RequestValidationError(_with_body_loc(e.errors(), ()))
+
+    operations = []
+    for line_no, line in enumerate(body.splitlines()):
+        if not line.strip():
+            continue
+        try:
+            operations.append(OperationSchema.model_validate_json(line))
+        except ValidationError as e:
+            raise RequestValidationError(_with_body_loc(e.errors(), (line_no,)))
+    return operations
+
+
+def _with_body_loc(errors: list[dict], prefix: tuple) -> list[dict]:
+    return [{**error, "loc": ("body", *prefix, *error["loc"])} for error in errors]
@@ -0,0 +1,42 @@
+"""
+ETag кошелька и разбор заголовка If-Match.
+
+ETag - версия строки wallets в кавычках ("42"). Он сильный: версия
+меняется при каждом изменении баланса. If-Match сравнивается строго
+(RFC 9110): слабые теги (W/"42") и теги не этого формата не совпадают
+ни с одной версией.
+"""
+
+# Версия - BIGINT: более длинное число не совпадет ни с одной.
+MAX_VERSION_DIGITS = 18
+
+
+def format_etag(version: int) -> str:
+    """
+    :param version: Версия кошелька.
+    :return: Значение заголовка ETag.
+    """
+    return f'"{version}"'
+
+
+def parse_if_match(value: str) -> list[int] | None:
+    """
+    :param value: Значение заголовка If-Match.
+    :return: Версии из заголовка (пустой список - ни одна не подходит)
+    или None для "*" - подходит любая версия существующего кошелька.
+    """
+    versions = []
+    for tag in value.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return None
+        digits = tag[1:-1]
+        if (
+            len(tag) > 2
+            and tag[0] == tag[-1] == '"'
+            and digits.isascii()
+            and digits.isdigit()
+            and len(digits) <= MAX_VERSION_DIGITS
+        ):
+            versions.append(int(digits))
+    return versions
@@ -0,0 +1,325 @@
+"""
+Поток изменений балансов (Server-Sent Events) из outbox wallet_events.
+
+Каждая запись журнала операций в той же транзакции добавляет событие
+в wallet_events (триггер wallet_operations_outbox), поэтому событие есть
+у каждой зафиксированной операции и нет у отмененной. EventRelay один
+на процесс: он читает новые события пачками и раскладывает их
+по очередям подписчиков, так что число запросов к БД не зависит от
+числа подключенных клиентов.
+
+Позиция события в потоке - (txid, id), id события SSE - "<txid>-<id>".
+Ретранслятор читает только события транзакций с txid ниже xmin снимка,
+то есть завершенных вместе со всеми более ранними: транзакция,
+получившая id раньше, но зафиксированная позже, не будет пропущена.
+Поэтому долгая транзакция задерживает поток, пока не завершится.
+Порядок событий разных транзакций одного кошелька в потоке может
+не совпадать с порядком фиксации; порядок изменений кошелька задает
+operation_id - id записи журнала, он растет в порядке фиксаций.
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass, field
+from uuid import UUID
+
+import orjson
+from models import WalletEvent
+from sqlalchemy import Row, Select, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+log = logging.getLogger(__name__)
+
+EVENT_NAME = "operation"
+HEARTBEAT = b": keepalive\n\n"
+
+# txid транзакций, завершенных вместе со всеми более ранними.
+HORIZON = literal_column("pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+
+Position = tuple[int, int]
+
+
+def format_event_id(position: Position) -> str:
+    return "%d-%d" % position
+
+
+def parse_event_id(value: str) -> Position | None:
+    """
+    Позиция из заголовка Last-Event-ID.
+    :param value:
+    :return: (txid, id) или None, если значение не id события.
+    """
+    txid, sep, event_id = value.strip().partition("-")
+    if not sep or not txid.isdigit() or not event_id.isdigit():
+        return None
+    return int(txid), int(event_id)
+
+
+def events_stmt(
+    after: Position,
+    limit: int,
+    until: Position | None = None,
+    wallet_uuid: UUID | None = None,
+) -> Select:
+    """
+    События после позиции after в порядке потока.
+    :param after:
+    :param limit:
+    :param until: Последняя позиция включительно; без нее -
+    до горизонта завершенных транзакций.
+    :param wallet_uuid: Только события кошелька.
+    :return:
+    """
+    position = tuple_(WalletEvent.txid, WalletEvent.id)
+    stmt = (
+        select(
+            WalletEvent.txid,
+            WalletEvent.id,
+            WalletEvent.wallet_uuid,
+            WalletEvent.operation_id,
+            WalletEvent.operation_type,
+            WalletEvent.amount,
+            WalletEvent.balance,
+            WalletEvent.created_at,
+        )
+        .where(position > tuple_(*after))
+        .order_by(WalletEvent.txid, WalletEvent.id)
+        .limit(limit)
+    )
+    if until is None:
+        stmt = stmt.where(WalletEvent.txid < HORIZON)
+    else:
+        stmt = stmt.where(position <= tuple_(*until))
+    if wallet_uuid is not None:
+        stmt = stmt.where(WalletEvent.wallet_uuid == wallet_uuid)
+    return stmt
+
+
+def encode_event(row: Row) -> bytes:
+    """
+    Событие SSE: id, имя и JSON в одной строке data.
+    Суммы - строками, как в остальных ответах API; uuid - тоже строкой:
+    asyncpg отдает свой подкласс UUID, который orjson не кодирует.
+    :param row: Строка events_stmt.
+    :return:
+    """
+    data = orjson.dumps(
+        {
+            "wallet_uuid": str(row.wallet_uuid),
+            "operation_id": row.operation_id,
+            "operation_type": row.operation_type,
+            "amount": str(row.amount),
+            "balance": str(row.balance),
+            "created_at": row.created_at,
+        }
+    )
+    return b"id: %d-%d\nevent: %s\ndata: %s\n\n" % (
+        row.txid,
+        row.id,
+        EVENT_NAME.encode(),
+        data,
+    )
+
+
+@dataclass(eq=False)
+class Subscription:
+    """
+    Очередь событий одного клиента: (позиция, событие SSE).
+    closed - ретранслятор больше не пишет в очередь: клиент не успевал
+    забирать события или ретранслятор остановлен.
+    """
+
+    wallet_uuid: UUID | None
+    queue: asyncio.Queue
+    closed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class EventRelay:
+    """
+    Чтение новых событий outbox и раздача их подписчикам процесса.
+    Пока пачка полная, следующая читается сразу, иначе - через
+    poll_interval секунд. Подписчик, в очереди которого уже queue_size
+    событий, отключается, чтобы не копить память: он переподключится
+    с Last-Event-ID и получит пропущенное из БД.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        poll_interval: float,
+        batch_size: int,
+        queue_size: int,
+    ):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.position: Position | None = None
+        self._subscriptions: set[Subscription] = set()
+        self._task: asyncio.Task | None = None
+        self.published = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        """
+        Начать с текущего горизонта: события, зафиксированные раньше,
+        отдаются только продолжающим с Last-Event-ID.
+        :return:
+        """
+        async with self.session_factory() as session:
+            horizon = await session.scalar(select(HORIZON))
+        self.position = (horizon, 0)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        for subscription in self._subscriptions:
+            subscription.closed.set()
+        self._subscriptions.clear()
+
+    def subscribe(self, wallet_uuid: UUID | None = None) -> Subscription:
+        """
+        Подписка на события кошелька или всех кошельков (None).
+        Получает события после текущей position.
+        :param wallet_uuid:
+        :return:
+        """
+        subscription = Subscription(wallet_uuid, asyncio.Queue(self.queue_size))
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                fetched = await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Event relay poll failed")
+                fetched = 0
+            if fetched < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def poll(self) -> int:
+        """
+        Прочитать и раздать одну пачку событий.
+        :return: Сколько событий прочитано.
+        """
+        async with self.session_factory() as session:
+            rows = (
+                await session.execute(events_stmt(self.position, self.batch_size))
+            ).all()
+        self.publish(rows)
+        return len(rows)
+
+    def publish(self, rows: Sequence[Row]) -> None:
+        """
+        Раздать события подписчикам и сдвинуть position.
+        Событие кодируется один раз для всех подписчиков.
+        :param rows: Строки events_stmt в порядке потока.
+        :return:
+        """
+        for row in rows:
+            position = (row.txid, row.id)
+            event = encode_event(row)
+            for subscription in list(self._subscriptions):
+                if (
+                    subscription.wallet_uuid is not None
+                    and subscription.wallet_uuid != row.wallet_uuid
+                ):
+                    continue
+                try:
+                    subscription.queue.put_nowait((position, event))
+                except asyncio.QueueFull:
+                    self._subscriptions.discard(subscription)
+                    subscription.closed.set()
+                    self.dropped += 1
+            self.position = position
+            self.published += 1
+
+    def stats(self) -> dict[str, int | str | None]:
+        return {
+            "position": (
+                format_event_id(self.position) if self.position is not None else None
+            ),
+            "subscribers": len(self._subscriptions),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+async def stream_events(
+    relay: EventRelay,
+    wallet_uuid: UUID | None,
+    last_event_id: Position | None,
+    heartbeat: float,
+) -> AsyncIterator[bytes]:
+    """
+    Поток SSE одного клиента. Подписка оформляется до чтения
+    пропущенного, поэтому события между ними не теряются: из БД
+    отдается все после last_event_id до позиции ретранслятора
+    на момент подписки, дальше - очередь подписки.
+    Поток заканчивается, когда ретранслятор закрыл подписку,
+    предварительно отдав то, что в ней уже было.
+    :param relay:
+    :param wallet_uuid: Кошелек или None - все кошельки.
+    :param last_event_id: Позиция из Last-Event-ID.
+    :param heartbeat: Через сколько секунд простоя отправлять комментарий.
+    :return: Куски ответа text/event-stream.
+    """
+    subscription = relay.subscribe(wallet_uuid)
+    try:
+        until = relay.position
+        # Позиция клиента может быть дальше позиции ретранслятора
+        # этого процесса: тогда уже полученное пропускается в очереди.
+        sent = until if last_event_id is None else last_event_id
+        while sent < until:
+            async with relay.session_factory() as session:
+                rows = (
+                    await session.execute(
+                        events_stmt(sent, relay.batch_size, until, wallet_uuid)
+                    )
+                ).all()
+            if not rows:
+                break
+            yield b"".join(encode_event(row) for row in rows)
+            sent = (rows[-1].txid, rows[-1].id)
+        # Сразу отправленный комментарий отдает клиенту заголовки ответа.
+        yield HEARTBEAT
+        closed = asyncio.ensure_future(subscription.closed.wait())
+        try:
+            while True:
+                if subscription.queue.empty():
+                    if closed.done():
+                        return
+                    getter = asyncio.ensure_future(subscription.queue.get())
+                    done, _ = await asyncio.wait(
+                        (getter, closed),
+                        timeout=heartbeat,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if getter not in done:
+                        getter.cancel()
+                        if not done:
+                            yield HEARTBEAT
+                        continue
+                    position, event = getter.result()
+                else:
+                    position, event = subscription.queue.get_nowait()
+                if position > sent:
+                    yield event
+        finally:
+            closed.cancel()
+    finally:
+        relay.unsubscribe(subscription)
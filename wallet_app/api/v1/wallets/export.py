@@ -0,0 +1,73 @@
+import zlib
+from collections.abc import AsyncIterator
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.v1.wallets.crud import WalletCRUD
+
+EXPORT_CHUNK_SIZE = 10_000
+
+
+class ExportFormat(str, Enum):
+    """
+    Форматы выгрузки балансов.
+    NDJSON - по объекту {"uuid": "...", "balance": "..."} на строку,
+    CSV - таблица с заголовком uuid,balance.
+    """
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+def encode_rows(rows: list[tuple[UUID, Decimal]], fmt: ExportFormat) -> bytes:
+    """
+    Пачка выгрузки одним куском байтов.
+    uuid и баланс не содержат запятых и кавычек, поэтому строки CSV
+    собираются без экранирования.
+    :param rows: Пачка (uuid, баланс).
+    :param fmt:
+    :return:
+    """
+    if fmt == ExportFormat.NDJSON:
+        template = '{"uuid": "%s", "balance": "%s"}\n'
+    else:
+        template = "%s,%s\n"
+    return "".join(template % row for row in rows).encode()
+
+
+async def stream_export(
+    session_factory: async_sessionmaker,
+    fmt: ExportFormat,
+    compress: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Потоковая выгрузка балансов всех кошельков из одного снимка БД.
+    Сессия открывается самим потоком: ответ отдается уже после выхода
+    из обработчика, когда сессии его зависимостей закрыты.
+    В памяти одновременно не больше одной пачки.
+    :param session_factory:
+    :param fmt:
+    :param compress: Сжимать поток gzip.
+    :param chunk_size: Размер пачки серверного курсора.
+    :return: Куски выгрузки.
+    """
+    gzip = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+
+    def _output(data: bytes) -> bytes:
+        return gzip.compress(data) if gzip is not None else data
+
+    if fmt == ExportFormat.CSV:
+        header = _output(b"uuid,balance\n")
+        if header:
+            yield header
+    async with session_factory() as session:
+        async for rows in WalletCRUD(session).export_balances(chunk_size):
+            chunk = _output(encode_rows(rows, fmt))
+            if chunk:
+                yield chunk
+    if gzip is not None:
+        yield gzip.flush()
@@ -0,0 +1,135 @@
+"""
+Свертка и пошаговое применение операций над балансами в Python,
+общие для пакетных операций, объединения операций и шардированных
+кошельков.
+"""
+
+from collections.abc import Iterable
+from decimal import Decimal
+from uuid import UUID
+
+from exceptions import NotEnoughBalanceError, WalletNotFound
+from schemas.operation import OperationStatusSchema, OperationTypeSchema
+
+Operations = list[tuple[OperationTypeSchema, Decimal]]
+
+
+def fold_operations(
+    operations: Iterable[tuple[OperationTypeSchema, Decimal]],
+) -> tuple[Decimal, Decimal, list[Decimal]]:
+    """
+    Сворачивает последовательность операций над одним кошельком.
+    :param operations: Пары (тип операции, сумма) в порядке применения.
+    :return: Чистое изменение баланса, самая низкая точка промежуточного
+    баланса относительно начального (не выше нуля) и смещение после
+    каждой операции. Все операции проходят, если баланс >= -lowest.
+    """
+    net, lowest, offsets = Decimal("0"), Decimal("0"), []
+    for op_type, amount in operations:
+        if op_type == OperationTypeSchema.DEPOSIT:
+            net += amount
+        else:
+            net -= amount
+        # Не только после списаний: сумма, которая уменьшает баланс,
+        # не должна обходить проверку lowest.
+        lowest = min(lowest, net)
+        offsets.append(net)
+    return net, lowest, offsets
+
+
+def replay_operations(
+    wallet_uuid: UUID,
+    balance: Decimal,
+    operations: Iterable[tuple[OperationTypeSchema, Decimal]],
+) -> tuple[Decimal, list[Decimal | Exception]]:
+    """
+    Применяет операции по одной, проверяя каждое списание по текущему
+    промежуточному балансу.
+    :param wallet_uuid:
+    :param balance: Начальный баланс.
+    :param operations: Пары (тип операции, сумма) в порядке применения.
+    :return: Итоговый баланс и для каждой операции баланс после нее
+    либо исключение, если она отклонена.
+    """
+    results: list[Decimal | Exception] = []
+    for op_type, amount in operations:
+        if op_type == OperationTypeSchema.DEPOSIT:
+            balance += amount
+        elif balance < amount:
+            results.append(
+                NotEnoughBalanceError(
+                    f"На кошельке {wallet_uuid} недостаточно средств."
+                )
+            )
+            continue
+        else:
+            balance -= amount
+        results.append(balance)
+    return balance, results
+
+
+def delta_params(operations: dict[UUID, Operations]) -> tuple[dict, dict]:
+    """
+    Параметры statements.apply_deltas_stmt для операций по кошелькам.
+    :param operations: Операции каждого кошелька в порядке применения.
+    :return: Параметры выражения и результат fold_operations по кошелькам.
+    """
+    folded = {}
+    params = {
+        key: []
+        for key in (
+            "deltas_uuid",
+            "deltas_net",
+            "deltas_lowest",
+            "items_uuid",
+            "items_type",
+            "items_amount",
+            "items_rel",
+        )
+    }
+    for wallet_uuid in sorted(operations):
+        net, lowest, offsets = folded[wallet_uuid] = fold_operations(
+            operations[wallet_uuid]
+        )
+        params["deltas_uuid"].append(wallet_uuid)
+        params["deltas_net"].append(net)
+        params["deltas_lowest"].append(lowest)
+        for (op_type, amount), offset in zip(operations[wallet_uuid], offsets):
+            params["items_uuid"].append(wallet_uuid)
+            params["items_type"].append(op_type.value)
+            params["items_amount"].append(amount)
+            params["items_rel"].append(offset - net)
+    return params, folded
+
+
+def set_balances_params(
+    balances: dict[UUID, Decimal],
+    ledger: list[tuple[UUID, OperationTypeSchema, Decimal, Decimal]],
+) -> dict:
+    """
+    Параметры statements.set_balances_stmt.
+    :param balances: Итоговые балансы кошельков.
+    :param ledger: Примененные операции (uuid, тип, сумма, баланс после).
+    :return:
+    """
+    return {
+        "balances_uuid": list(balances),
+        "balances_balance": list(balances.values()),
+        "ledger_uuid": [row[0] for row in ledger],
+        "ledger_type": [row[1].value for row in ledger],
+        "ledger_amount": [row[2] for row in ledger],
+        "ledger_balance": [row[3] for row in ledger],
+    }
+
+
+def operation_status(result: Decimal | Exception) -> OperationStatusSchema:
+    """
+    Статус операции по результату replay_operations.
+    :param result: Баланс после операции или исключение отказа.
+    :return:
+    """
+    if isinstance(result, WalletNotFound):
+        return OperationStatusSchema.WALLET_NOT_FOUND
+    if isinstance(result, NotEnoughBalanceError):
+        return OperationStatusSchema.NOT_ENOUGH_BALANCE
+    return OperationStatusSchema.OK
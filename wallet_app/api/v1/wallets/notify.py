@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from uuid import UUID
+
+import asyncpg
+from models.money import from_minor
+
+from api.v1.wallets.cache import BalanceCache
+
+log = logging.getLogger(__name__)
+
+BALANCE_CHANNEL = "wallet_balance"
+
+
+class BalanceListener:
+    """
+    Выделенное соединение asyncpg, которое слушает канал wallet_balance.
+
+    Триггер на таблице wallets отправляет NOTIFY "<uuid> <balance> <version>"
+    (баланс в минимальных единицах) при каждом изменении баланса,
+    и уведомления приходят после фиксации
+    транзакции в порядке фиксаций. По ним обновляются записи локального
+    BalanceCache, поэтому несколько процессов могут отдавать балансы
+    из памяти, не теряя свежести.
+
+    Триггер по умолчанию не стоит (NOTIFY выстраивает в очередь фиксации
+    всех пишущих транзакций базы) и ставится командой
+    `python cli.py notify enable`.
+
+    Пока соединения нет, уведомления теряются, поэтому при каждом
+    (пере)подключении кэш очищается.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        cache: BalanceCache,
+        reconnect_delay: float = 1.0,
+    ):
+        self.dsn = dsn
+        self.cache = cache
+        self.reconnect_delay = reconnect_delay
+        self._connected = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, timeout: float = 10.0) -> None:
+        """
+        Запустить прослушивание и дождаться первого подключения.
+        :param timeout: Сколько ждать подключения, секунд.
+        :return:
+        """
+        self._task = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Balance listener connection failed")
+            self._connected.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self) -> None:
+        conn = await asyncpg.connect(self.dsn)
+        closed = asyncio.Event()
+        try:
+            conn.add_termination_listener(lambda _: closed.set())
+            await conn.add_listener(BALANCE_CHANNEL, self._on_notify)
+            self.cache.clear()
+            self._connected.set()
+            await closed.wait()
+            log.warning("Balance listener connection closed, reconnecting")
+        finally:
+            if not conn.is_closed():
+                await conn.close()
+
+    def _on_notify(self, conn, pid: int, channel: str, payload: str) -> None:
+        # "<uuid>" без баланса приходит для шардированных кошельков:
+        # их баланс не кэшируется.
+        # Версии нет в уведомлениях, отправленных до ее появления.
+        try:
+            wallet_uuid, _, rest = payload.partition(" ")
+            balance, _, version = rest.partition(" ")
+            wallet_uuid = UUID(wallet_uuid)
+            balance = from_minor(int(balance)) if balance else None
+            version = int(version) if version else None
+        except ValueError:
+            log.warning("Malformed %s payload: %r", channel, payload)
+            return
+        if balance is None:
+            self.cache.discard(wallet_uuid)
+        else:
+            self.cache.refresh(wallet_uuid, balance, version)
@@ -0,0 +1,41 @@
+"""
+Курсоры keyset-пагинации истории операций.
+
+Курсор - непрозрачная для клиента строка с ключом (created_at, id)
+последней отданной записи. Следующая страница начинается строго после
+этого ключа, поэтому стоимость запроса не зависит от номера страницы,
+в отличие от OFFSET.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import datetime
+
+Cursor = tuple[datetime, int]
+
+
+def encode_cursor(created_at: datetime, operation_id: int) -> str:
+    """
+    :param created_at:
+    :param operation_id:
+    :return: Курсор, указывающий на запись (created_at, id).
+    """
+    raw = f"{created_at.isoformat()}|{operation_id}".encode()
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    :param cursor: Значение next_cursor предыдущей страницы.
+    :return: Ключ (created_at, id).
+    :raises ValueError: Курсор поврежден.
+    """
+    try:
+        raw = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, operation_id = raw.split("|")
+        key = datetime.fromisoformat(created_at), int(operation_id)
+    except (BinasciiError, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if key[0].tzinfo is None:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return key
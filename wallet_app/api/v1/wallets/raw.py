@@ -0,0 +1,199 @@
+"""
+Репозиторий кошельков на asyncpg без ORM для горячих запросов.
+
+RawWalletCRUD повторяет интерфейс WalletCRUD. Чтение баланса (одного
+и нескольких кошельков), создание кошелька и одиночная операция
+выполняются фиксированными
+SQL-выражениями прямо на asyncpg-соединении из пула сессии, без identity
+map, flush и компиляции выражений SQLAlchemy; asyncpg подготавливает
+каждое выражение один раз на соединение (statement_cache_size).
+Выражение одно, поэтому вне начатой транзакции сессии оно фиксируется
+само, без отдельных BEGIN и COMMIT. События engine эти выражения
+не видят, поэтому время в БД для метрик записывается здесь.
+
+Остальное - пакеты, история, ключи идемпотентности, шардированные
+кошельки и отказы операций - выполняет WalletCRUD.
+"""
+
+import time
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+from metrics import record_db_time
+from models import Wallet
+from models.money import from_minor, to_minor
+from schemas.operation import OperationTypeSchema
+from schemas.wallet import WalletCreateSchema
+
+from api.v1.wallets.crud import WalletCRUD
+from api.v1.wallets.shards import known_shards
+
+GET_WALLET_SQL = """
+SELECT
+    CASE WHEN w.shards > 0 THEN coalesce(
+        (SELECT sum(s.balance) FROM wallet_balance_shards s
+         WHERE s.wallet_uuid = w.uuid), 0
+    ) ELSE 0 END + w.balance AS balance,
+    w.shards,
+    w.version
+FROM wallets w
+WHERE w.uuid = $1
+"""
+
+LOOKUP_SQL = """
+SELECT
+    w.uuid,
+    CASE WHEN w.shards > 0 THEN coalesce(
+        (SELECT sum(s.balance) FROM wallet_balance_shards s
+         WHERE s.wallet_uuid = w.uuid), 0
+    ) ELSE 0 END + w.balance AS balance,
+    w.shards,
+    w.version
+FROM wallets w
+WHERE w.uuid = ANY($1::uuid[])
+"""
+
+CREATE_SQL = """
+WITH created AS (
+    INSERT INTO wallets (uuid, balance) VALUES ($1, $2)
+    RETURNING uuid, balance
+)
+INSERT INTO wallet_operations (wallet_uuid, operation_type, amount, balance)
+SELECT uuid, 'DEPOSIT', balance, balance FROM created WHERE balance <> 0
+"""
+
+# Как statements.operation_stmt: ни одной строки, если кошелька нет,
+# не хватает средств или он шардирован.
+OPERATION_SQL = {
+    OperationTypeSchema.DEPOSIT: """
+WITH upd AS (
+    UPDATE wallets SET balance = balance + $2, version = version + 1
+    WHERE uuid = $1 AND shards = 0
+    RETURNING uuid, balance, version
+), journal AS (
+    INSERT INTO wallet_operations (wallet_uuid, operation_type, amount, balance)
+    SELECT uuid, 'DEPOSIT', $2, balance FROM upd
+)
+SELECT balance, version FROM upd
+""",
+    OperationTypeSchema.WITHDRAW: """
+WITH upd AS (
+    UPDATE wallets SET balance = balance - $2, version = version + 1
+    WHERE uuid = $1 AND shards = 0 AND balance >= $2
+    RETURNING uuid, balance, version
+), journal AS (
+    INSERT INTO wallet_operations (wallet_uuid, operation_type, amount, balance)
+    SELECT uuid, 'WITHDRAW', $2, balance FROM upd
+)
+SELECT balance, version FROM upd
+""",
+}
+
+
+class RawWalletCRUD(WalletCRUD):
+    async def _driver_connection(self):
+        conn = await self.session.connection()
+        return (await conn.get_raw_connection()).driver_connection
+
+    async def create(self, wallet: WalletCreateSchema) -> Wallet:
+        """
+        Создание кошелька одним подготовленным выражением.
+        :param wallet:
+        :return:
+        """
+        wallet = Wallet(uuid=uuid4(), balance=wallet.balance, version=1)
+        raw = await self._driver_connection()
+        started = time.perf_counter()
+        await raw.execute(CREATE_SQL, wallet.uuid, to_minor(wallet.balance))
+        record_db_time(started)
+        await self.session.commit()
+        self._remember(wallet.uuid, wallet.balance, wallet.version)
+        return wallet
+
+    async def _read_wallet(self, wallet_uuid: UUID) -> Wallet | None:
+        """
+        Кошелек с балансом (для шардированного - с суммой шардов)
+        одним подготовленным выражением.
+        :param wallet_uuid:
+        :return:
+        """
+        raw = await self._driver_connection()
+        started = time.perf_counter()
+        row = await raw.fetchrow(GET_WALLET_SQL, wallet_uuid)
+        record_db_time(started)
+        if row is None:
+            self._remember_read(wallet_uuid, None)
+            return None
+        wallet = Wallet(
+            uuid=wallet_uuid,
+            balance=from_minor(row["balance"]),
+            shards=row["shards"],
+        )
+        if not wallet.shards:
+            wallet.version = row["version"]
+            self._remember_read(wallet_uuid, wallet)
+        return wallet
+
+    async def _fetch_many(self, wallet_uuids: list[UUID]) -> list[Wallet]:
+        """
+        Кошельки одним подготовленным выражением с массивом uuid.
+        :param wallet_uuids:
+        :return:
+        """
+        raw = await self._driver_connection()
+        started = time.perf_counter()
+        rows = await raw.fetch(LOOKUP_SQL, wallet_uuids)
+        record_db_time(started)
+        return [
+            Wallet(
+                uuid=row["uuid"],
+                balance=from_minor(row["balance"]),
+                shards=row["shards"],
+                version=None if row["shards"] else row["version"],
+            )
+            for row in rows
+        ]
+
+    async def operation(
+        self,
+        wallet_uuid: UUID,
+        op_type: OperationTypeSchema,
+        amount: Decimal,
+        idempotency_key: str | None = None,
+        if_match: list[int] | None = None,
+    ) -> Wallet:
+        """
+        Одиночная операция одним подготовленным выражением; отказ,
+        ключ идемпотентности, условная операция и шардированный
+        кошелек - через WalletCRUD.
+        :param wallet_uuid:
+        :param op_type:
+        :param amount:
+        :param idempotency_key:
+        :param if_match:
+        :return:
+        """
+        if (
+            idempotency_key is None
+            and if_match is None
+            and op_type in OPERATION_SQL
+            and wallet_uuid not in known_shards
+        ):
+            raw = await self._driver_connection()
+            started = time.perf_counter()
+            row = await raw.fetchrow(
+                OPERATION_SQL[op_type], wallet_uuid, to_minor(amount)
+            )
+            record_db_time(started)
+            if row is not None:
+                await self.session.commit()
+                balance = from_minor(row["balance"])
+                self._remember(wallet_uuid, balance, row["version"])
+                return Wallet(uuid=wallet_uuid, balance=balance, version=row["version"])
+        return await super().operation(
+            wallet_uuid,
+            op_type,
+            amount,
+            idempotency_key=idempotency_key,
+            if_match=if_match,
+        )
@@ -0,0 +1,71 @@
+"""
+Быстрый путь JSON-ответов кошельков.
+
+Обработчик, который возвращает готовый Response, FastAPI отдает как
+есть: response_model остается только схемой OpenAPI, а ORM-объект
+Wallet не проверяется заново через pydantic. Значения, которые отдает
+WalletCRUD, уже проверены: uuid - UUID из БД, баланс - Decimal
+с двумя знаками (см. models.money). Поэтому тело ответа собирается
+словарем и кодируется orjson.
+
+Ответ с балансом одного кошелька несет ETag версии, если она известна
+(см. api.v1.wallets.etags).
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from models import Wallet
+
+from api.v1.wallets.etags import format_etag
+
+
+def _default(value: Any) -> str:
+    # Decimal строкой, как у pydantic: "12.50", без потерь float.
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class WalletJSONResponse(JSONResponse):
+    """
+    JSON-ответ через orjson: UUID кодируется самим orjson,
+    Decimal - точной строкой. Наследник JSONResponse, чтобы OpenAPI
+    по-прежнему описывал ответ схемой response_model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+
+def wallet_body(wallet: Wallet) -> dict[str, Any]:
+    """
+    Тело WalletReadSchema.
+    :param wallet:
+    :return:
+    """
+    return {"uuid": wallet.uuid, "balance": wallet.balance}
+
+
+def wallet_response(wallet: Wallet) -> WalletJSONResponse:
+    """
+    Ответ WalletReadSchema без повторной проверки.
+    :param wallet:
+    :return:
+    """
+    return WalletJSONResponse(wallet_body(wallet))
+
+
+def balance_response(wallet: Wallet) -> WalletJSONResponse:
+    """
+    Ответ WalletReadBalanceSchema без повторной проверки, с ETag,
+    если версия кошелька известна.
+    :param wallet:
+    :return:
+    """
+    headers = None
+    if wallet.version is not None:
+        headers = {"ETag": format_etag(wallet.version)}
+    return WalletJSONResponse({"balance": wallet.balance}, headers=headers)
@@ -0,0 +1,220 @@
+"""
+Шардированные балансы "горячих" кошельков.
+
+Одна строка wallets ограничивает пропускную способность кошелька
+скоростью, с которой транзакции передают друг другу ее блокировку.
+У шардированного кошелька (wallets.shards > 0) баланс разнесен по
+строкам wallet_balance_shards, а wallets.balance равен нулю:
+
+- пополнения идут в любой свободный шард (SKIP LOCKED), а если все
+  заняты - в случайный, с ожиданием блокировки;
+- списание берет любой свободный шард, на котором хватает средств,
+  а если такого нет - блокирует все шарды по порядку, проверяет
+  операцию по их сумме и поровну распределяет остаток между шардами;
+- баланс кошелька - сумма шардов.
+
+Включается и выключается для отдельного кошелька командой
+`python cli.py shards enable|disable`.
+"""
+
+import random
+from decimal import ROUND_DOWN, Decimal
+from uuid import UUID
+
+from exceptions import WalletNotFound
+from models import Wallet, WalletBalanceShard
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.v1.wallets import statements
+from api.v1.wallets.folding import (
+    Operations,
+    fold_operations,
+    replay_operations,
+)
+
+MAX_SHARDS = 256
+CENT = Decimal("0.01")
+
+# Шардированные кошельки, уже встреченные процессом, и число их шардов.
+# Операции над ними сразу идут к шардам, минуя UPDATE строки wallets;
+# устаревшая запись безопасна: apply_sharded вернет None, если шардов
+# больше нет, и запись будет удалена.
+known_shards: dict[UUID, int] = {}
+
+
+async def sharded_balance(session: AsyncSession, wallet_uuid: UUID) -> Decimal:
+    """
+    Баланс шардированного кошелька - сумма его шардов.
+    :param session:
+    :param wallet_uuid:
+    :return:
+    """
+    return await session.scalar(
+        select(func.coalesce(func.sum(WalletBalanceShard.balance), 0)).where(
+            WalletBalanceShard.wallet_uuid == wallet_uuid
+        )
+    )
+
+
+async def apply_sharded(
+    session: AsyncSession,
+    wallet_uuid: UUID,
+    shards: int,
+    ops: Operations,
+) -> list[Decimal | Exception] | None:
+    """
+    Операции над шардированным кошельком в текущей транзакции.
+    Если сумма пачки нигде не уходит в минус, она целиком ложится в один
+    шард; иначе пробуется свободный шард с достаточным балансом,
+    а затем сведение всех шардов с равным распределением остатка.
+    :param session:
+    :param wallet_uuid:
+    :param shards: Число шардов кошелька.
+    :param ops: Операции в порядке применения.
+    :return: Для каждой операции баланс кошелька после нее либо
+    исключение, если она отклонена. None - шардов у кошелька уже нет
+    (шардирование выключено параллельно), операции не применены.
+    """
+    net, lowest, offsets = fold_operations(ops)
+    params = {
+        "target_uuid": wallet_uuid,
+        "net": net,
+        "lowest": lowest,
+        "items_type": [op_type.value for op_type, _ in ops],
+        "items_amount": [amount for _, amount in ops],
+        "items_rel": [offset - net for offset in offsets],
+    }
+    if lowest == 0:
+        balance = await session.scalar(statements.shard_delta_stmt(pick=True), params)
+    else:
+        # Шард, который списание заблокировало, но который после
+        # перепроверки SKIP LOCKED уже не проходит по балансу, остается
+        # заблокированным; сведение с такой блокировкой дает
+        # взаимоблокировки, поэтому промах откатывается до точки сохранения.
+        savepoint = await session.begin_nested()
+        balance = await session.scalar(statements.shard_delta_stmt(pick=True), params)
+        if balance is None:
+            await savepoint.rollback()
+        else:
+            await savepoint.commit()
+    if balance is None and lowest == 0:
+        params["target_shard"] = random.randrange(shards)
+        balance = await session.scalar(statements.shard_delta_stmt(pick=False), params)
+    if balance is not None:
+        return [balance - net + offset for offset in offsets]
+    return await _consolidate(session, wallet_uuid, ops)
+
+
+def split_evenly(balance: Decimal, parts: int) -> list[Decimal]:
+    """
+    Деление баланса на parts частей с точностью до копейки; остаток
+    от деления достается первой части.
+    :param balance:
+    :param parts:
+    :return:
+    """
+    share = (balance / parts).quantize(CENT, rounding=ROUND_DOWN)
+    return [balance - share * (parts - 1)] + [share] * (parts - 1)
+
+
+async def _consolidate(
+    session: AsyncSession,
+    wallet_uuid: UUID,
+    ops: Operations,
+) -> list[Decimal | Exception] | None:
+    locked = (
+        await session.execute(
+            select(WalletBalanceShard.shard, WalletBalanceShard.balance)
+            .where(WalletBalanceShard.wallet_uuid == wallet_uuid)
+            .order_by(WalletBalanceShard.shard)
+            .with_for_update()
+        )
+    ).all()
+    if not locked:
+        return None
+    final, results = replay_operations(
+        wallet_uuid, sum(balance for _, balance in locked), ops
+    )
+    ledger = [
+        (wallet_uuid, op_type, amount, result)
+        for (op_type, amount), result in zip(ops, results)
+        if not isinstance(result, Exception)
+    ]
+    if ledger:
+        await session.execute(
+            statements.rebalance_shards_stmt(),
+            {
+                "target_uuid": wallet_uuid,
+                "shards_shard": [shard for shard, _ in locked],
+                "shards_balance": split_evenly(final, len(locked)),
+                "ledger_uuid": [row[0] for row in ledger],
+                "ledger_type": [row[1].value for row in ledger],
+                "ledger_amount": [row[2] for row in ledger],
+                "ledger_balance": [row[3] for row in ledger],
+            },
+        )
+    return results
+
+
+async def set_shards(session: AsyncSession, wallet_uuid: UUID, shards: int) -> Decimal:
+    """
+    Включение (shards > 0), изменение числа шардов или выключение
+    (shards = 0) шардирования кошелька. Весь баланс переносится
+    в шард 0 либо обратно в wallets.balance; баланс кошелька
+    не меняется, поэтому в журнал ничего не пишется.
+    Кошелек и его шарды блокируются, так что параллельные операции
+    дождутся переключения.
+    :param session:
+    :param wallet_uuid:
+    :param shards: Новое число шардов, 0 - выключить.
+    :return: Баланс кошелька.
+    """
+    if not 0 <= shards <= MAX_SHARDS:
+        raise ValueError(f"shards must be between 0 and {MAX_SHARDS}")
+    wallet = (
+        await session.execute(
+            select(Wallet.balance, Wallet.shards)
+            .where(Wallet.uuid == wallet_uuid)
+            .with_for_update()
+        )
+    ).one_or_none()
+    if wallet is None:
+        raise WalletNotFound(wallet_uuid)
+    balance = wallet.balance
+    if wallet.shards:
+        locked = await session.scalars(
+            select(WalletBalanceShard.balance)
+            .where(WalletBalanceShard.wallet_uuid == wallet_uuid)
+            .order_by(WalletBalanceShard.shard)
+            .with_for_update()
+        )
+        balance += sum(locked)
+        await session.execute(
+            delete(WalletBalanceShard).where(
+                WalletBalanceShard.wallet_uuid == wallet_uuid
+            )
+        )
+    if shards:
+        await session.execute(
+            insert(WalletBalanceShard),
+            [
+                {
+                    "wallet_uuid": wallet_uuid,
+                    "shard": shard,
+                    "balance": balance if shard == 0 else Decimal("0.00"),
+                }
+                for shard in range(shards)
+            ],
+        )
+    await session.execute(
+        update(Wallet)
+        .where(Wallet.uuid == wallet_uuid)
+        .values(
+            balance=0 if shards else balance,
+            shards=shards,
+            version=Wallet.version + 1,
+        )
+    )
+    await session.commit()
+    return balance
@@ -0,0 +1,72 @@
+"""
+Объединение одновременных одинаковых чтений (single-flight).
+
+Во время всплеска трафика одинаковые GET /wallets/{uuid} приходят
+в одну миллисекунду, и каждый выполняет тот же SELECT. SingleFlight
+дает запросам с одним ключом, пришедшим, пока первый еще выполняется,
+дождаться его результата вместо своего запроса в БД. Ключ удаляется,
+как только запрос выполнен, поэтому следующее чтение снова идет в БД:
+результаты не кэшируются.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+
+class SingleFlight:
+    """
+    Не больше одного выполняющегося вызова на ключ в процессе.
+    calls - сколько вызовов выполнено, shared - сколько запросов
+    получили результат чужого вызова.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Результат fn(): своего вызова либо уже выполняющегося по ключу.
+        Ошибка вызова достается всем, кто его ждал. Если запрос, который
+        выполнял вызов, отменен (клиент отключился), ожидающие
+        не получают его отмену, а повторяют вызов сами.
+        :param key:
+        :param fn: Вызов без аргументов, например partial(...).
+        :return:
+        """
+        while (flight := self._flights.get(key)) is not None:
+            try:
+                result = await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if flight.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+            self.shared += 1
+            return result
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        self.calls += 1
+        try:
+            result = await fn()
+        except Exception as e:
+            flight.set_exception(e)
+            # Ожидающих может не быть: ошибку уже получил вызвавший.
+            flight.exception()
+            raise
+        except BaseException:
+            flight.cancel()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
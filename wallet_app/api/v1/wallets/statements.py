@@ -0,0 +1,451 @@
+"""
+SQL-выражения, меняющие балансы кошельков.
+
+Каждое изменение баланса пишется в журнал wallet_operations тем же
+выражением (через CTE), без отдельного обращения к БД. Выражения с
+массивами принимают параметры <name>_<column> для unnest.
+Выражения над wallets не трогают шардированные кошельки (shards > 0),
+для них есть отдельные выражения над wallet_balance_shards.
+Каждое изменение строки wallets увеличивает ее version на единицу.
+"""
+
+from collections.abc import Sequence
+from decimal import Decimal
+from functools import cache
+from uuid import UUID
+
+from models import Wallet, WalletBalanceShard, WalletOperation
+from models.money import MinorUnits
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import (
+    Insert,
+    Select,
+    SmallInteger,
+    String,
+    any_,
+    bindparam,
+    case,
+    column,
+    func,
+    insert,
+    literal,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.sql.selectable import TableValuedAlias
+from sqlalchemy.types import TypeEngine
+
+wallets = Wallet.__table__
+wallet_operations = WalletOperation.__table__
+balance_shards = WalletBalanceShard.__table__
+
+LEDGER_COLUMNS = ["wallet_uuid", "operation_type", "amount", "balance"]
+
+
+def unnest_params(name: str, **columns: TypeEngine) -> TableValuedAlias:
+    """
+    unnest(:<name>_<column>, ...) WITH ORDINALITY AS <name>(<column>, ..., ord)
+    :param name: Имя производной таблицы и префикс параметров.
+    :param columns: Колонки и типы их элементов.
+    :return:
+    """
+    return (
+        func.unnest(
+            *(
+                bindparam(f"{name}_{key}", type_=ARRAY(type_))
+                for key, type_ in columns.items()
+            )
+        )
+        .table_valued(
+            *(column(key, type_) for key, type_ in columns.items()),
+            with_ordinality="ord",
+        )
+        .render_derived(name=name, with_types=False)
+    )
+
+
+def operation_stmt(
+    wallet_uuid: UUID,
+    op_type: OperationTypeSchema,
+    amount: Decimal,
+    if_match: Sequence[int] | None = None,
+) -> Select:
+    """
+    Одна операция: условный UPDATE и запись в журнал.
+    :param if_match: Допустимые версии кошелька (If-Match); проверяются
+    тем же UPDATE, без блокировки строки между чтением и записью.
+    :return: Выражение, возвращающее новые баланс и версию или ни одной
+    строки, если кошелька нет, на нем недостаточно средств, он
+    шардирован или его версия не из if_match.
+    """
+    stmt = (
+        update(wallets)
+        .where(wallets.c.uuid == wallet_uuid, wallets.c.shards == 0)
+        .values(version=wallets.c.version + 1)
+    )
+    if if_match is not None:
+        stmt = stmt.where(wallets.c.version.in_(if_match))
+    if op_type == OperationTypeSchema.DEPOSIT:
+        stmt = stmt.values(balance=wallets.c.balance + amount)
+    elif op_type == OperationTypeSchema.WITHDRAW:
+        stmt = stmt.where(wallets.c.balance >= amount).values(
+            balance=wallets.c.balance - amount
+        )
+    else:
+        raise ValueError(f"Unknown operation type: {op_type}")
+    upd = stmt.returning(wallets.c.uuid, wallets.c.balance, wallets.c.version).cte(
+        "upd"
+    )
+    journal = (
+        insert(wallet_operations)
+        .from_select(
+            LEDGER_COLUMNS,
+            select(
+                upd.c.uuid,
+                literal(op_type, wallet_operations.c.operation_type.type),
+                literal(amount, MinorUnits()),
+                upd.c.balance,
+            ),
+        )
+        .cte("journal")
+    )
+    return select(upd.c.balance, upd.c.version).add_cte(journal)
+
+
+def create_stmt(wallet_uuid: UUID, balance: Decimal) -> Insert:
+    """
+    Создание кошелька. Ненулевой начальный баланс записывается в журнал
+    как DEPOSIT, чтобы баланс можно было восстановить по журналу.
+    """
+    created = (
+        insert(wallets)
+        .values(uuid=wallet_uuid, balance=balance)
+        .returning(wallets.c.uuid, wallets.c.balance)
+        .cte("created")
+    )
+    return insert(wallet_operations).from_select(
+        LEDGER_COLUMNS,
+        select(
+            created.c.uuid,
+            literal(
+                OperationTypeSchema.DEPOSIT, wallet_operations.c.operation_type.type
+            ),
+            created.c.balance,
+            created.c.balance,
+        ).where(created.c.balance != 0),
+    )
+
+
+def apply_deltas_stmt() -> Select:
+    """
+    Свернутые операции над несколькими кошельками одним выражением.
+    Баланс каждого кошелька меняется на net, если при этом ни одна
+    промежуточная точка не уходит в минус (balance >= -lowest).
+    Строки блокируются в порядке uuid, чтобы встречные пакеты
+    не давали deadlock. Операции журналируются только для обновленных
+    кошельков, с балансом после каждой операции = итог + rel.
+
+    Параметры: deltas_uuid/net/lowest - по кошелькам,
+    items_uuid/type/amount/rel - по операциям в порядке применения.
+    :return: Выражение, возвращающее (uuid, balance, version)
+    обновленных кошельков.
+    """
+    deltas = unnest_params(
+        "deltas",
+        uuid=PG_UUID(as_uuid=True),
+        net=MinorUnits(),
+        lowest=MinorUnits(),
+    )
+    items = unnest_params(
+        "items",
+        uuid=PG_UUID(as_uuid=True),
+        type=String(),
+        amount=MinorUnits(),
+        rel=MinorUnits(),
+    )
+    locked = (
+        select(wallets.c.uuid)
+        .where(wallets.c.uuid == any_(bindparam("deltas_uuid", type_=ARRAY(PG_UUID()))))
+        .order_by(wallets.c.uuid)
+        .with_for_update()
+        .cte("locked")
+        .prefix_with("MATERIALIZED")
+    )
+    upd = (
+        update(wallets)
+        .where(
+            wallets.c.uuid == deltas.c.uuid,
+            wallets.c.uuid == locked.c.uuid,
+            wallets.c.shards == 0,
+            wallets.c.balance >= -deltas.c.lowest,
+        )
+        .values(
+            balance=wallets.c.balance + deltas.c.net,
+            version=wallets.c.version + 1,
+        )
+        .returning(wallets.c.uuid, wallets.c.balance, wallets.c.version)
+        .cte("upd")
+    )
+    journal = (
+        insert(wallet_operations)
+        .from_select(
+            LEDGER_COLUMNS,
+            select(
+                items.c.uuid,
+                items.c.type,
+                items.c.amount,
+                upd.c.balance + items.c.rel,
+            )
+            .join_from(items, upd, upd.c.uuid == items.c.uuid)
+            .order_by(items.c.ord),
+        )
+        .cte("journal")
+    )
+    return select(upd.c.uuid, upd.c.balance, upd.c.version).add_cte(journal)
+
+
+@cache
+def transfer_stmt() -> Select:
+    """
+    Перевод :amount с кошелька :source_uuid на :target_uuid одним
+    выражением: списание и пополнение применяются оба или ни одно.
+    Строки обоих кошельков блокируются в порядке uuid, чтобы встречные
+    переводы не давали deadlock; условие проверяется по заблокированным
+    строкам, то есть по последним зафиксированным балансам.
+    :return: Выражение, возвращающее (uuid, balance, version) обоих
+    кошельков или ни одной строки, если кошелька нет, на источнике недостаточно
+    средств или один из кошельков шардирован.
+    """
+    source = bindparam("source_uuid", type_=PG_UUID(as_uuid=True))
+    target = bindparam("target_uuid", type_=PG_UUID(as_uuid=True))
+    amount = bindparam("amount", type_=MinorUnits())
+    op_type = wallet_operations.c.operation_type.type
+    locked = (
+        select(wallets.c.uuid, wallets.c.balance, wallets.c.shards)
+        .where(wallets.c.uuid.in_([source, target]))
+        .order_by(wallets.c.uuid)
+        .with_for_update()
+        .cte("locked")
+        .prefix_with("MATERIALIZED")
+    )
+    allowed = (
+        select(func.count())
+        .select_from(locked)
+        .where(
+            locked.c.shards == 0,
+            (locked.c.uuid == target) | (locked.c.balance >= amount),
+        )
+        .scalar_subquery()
+    )
+    upd = (
+        update(wallets)
+        .where(wallets.c.uuid == locked.c.uuid, allowed == 2)
+        .values(
+            balance=wallets.c.balance
+            + case((wallets.c.uuid == target, amount), else_=-amount),
+            version=wallets.c.version + 1,
+        )
+        .returning(wallets.c.uuid, wallets.c.balance, wallets.c.version)
+        .cte("upd")
+    )
+    journal = (
+        insert(wallet_operations)
+        .from_select(
+            LEDGER_COLUMNS,
+            select(
+                upd.c.uuid,
+                case(
+                    (
+                        upd.c.uuid == target,
+                        literal(OperationTypeSchema.DEPOSIT, op_type),
+                    ),
+                    else_=literal(OperationTypeSchema.WITHDRAW, op_type),
+                ),
+                amount,
+                upd.c.balance,
+            ).order_by(upd.c.uuid == target),
+        )
+        .cte("journal")
+    )
+    return select(upd.c.uuid, upd.c.balance, upd.c.version).add_cte(journal)
+
+
+def set_balances_stmt() -> Select:
+    """
+    Запись уже посчитанных балансов и журнала операций одним выражением.
+    Строки кошельков должны быть заблокированы заранее.
+
+    Параметры: balances_uuid/balance - итоговые балансы,
+    ledger_uuid/type/amount/balance - примененные операции по порядку.
+    :return: Выражение, возвращающее (uuid, version) обновленных кошельков.
+    """
+    balances = unnest_params(
+        "balances",
+        uuid=PG_UUID(as_uuid=True),
+        balance=MinorUnits(),
+    )
+    ledger = unnest_params(
+        "ledger",
+        uuid=PG_UUID(as_uuid=True),
+        type=String(),
+        amount=MinorUnits(),
+        balance=MinorUnits(),
+    )
+    upd = (
+        update(wallets)
+        .where(wallets.c.uuid == balances.c.uuid)
+        .values(balance=balances.c.balance, version=wallets.c.version + 1)
+        .returning(wallets.c.uuid, wallets.c.version)
+        .cte("upd")
+    )
+    journal = (
+        insert(wallet_operations)
+        .from_select(
+            LEDGER_COLUMNS,
+            select(
+                ledger.c.uuid,
+                ledger.c.type,
+                ledger.c.amount,
+                ledger.c.balance,
+            ).order_by(ledger.c.ord),
+        )
+        .cte("journal")
+    )
+    return select(upd.c.uuid, upd.c.version).add_cte(journal)
+
+
+@cache
+def shard_delta_stmt(pick: bool) -> Select:
+    """
+    Свернутые операции над одним шардированным кошельком, примененные
+    к одному шарду. Шард должен выдержать все промежуточные точки
+    (balance >= -lowest). Баланс кошелька после операций - новый баланс
+    шарда плюс остальные шарды на момент начала выражения, поэтому
+    при параллельных операциях по разным шардам балансы в журнале
+    не образуют строгой последовательности (суммы - образуют).
+
+    Параметры: target_uuid, net, lowest, target_shard (при pick=False),
+    items_type/amount/rel - операции в порядке применения.
+    :param pick: True - взять любой незаблокированный шард, на котором
+    хватает средств (FOR UPDATE SKIP LOCKED), False - шард :target_shard,
+    дожидаясь его блокировки.
+    :return: Выражение, возвращающее баланс кошелька после операций,
+    или ни одной строки, если подходящего шарда нет.
+    """
+    items = unnest_params(
+        "items",
+        type=String(),
+        amount=MinorUnits(),
+        rel=MinorUnits(),
+    )
+    wallet_uuid = bindparam("target_uuid", type_=PG_UUID(as_uuid=True))
+    lowest = bindparam("lowest", type_=MinorUnits())
+    if pick:
+        # CTE, а не подзапрос в WHERE: перепроверка UPDATE после
+        # параллельного изменения строки заново выполнила бы подзапрос
+        # и заблокировала бы еще один шард.
+        shard = (
+            select(balance_shards.c.shard)
+            .where(
+                balance_shards.c.wallet_uuid == wallet_uuid,
+                balance_shards.c.balance >= -lowest,
+            )
+            .order_by(func.random())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .cte("picked")
+            .c.shard
+        )
+    else:
+        shard = bindparam("target_shard")
+    upd = (
+        update(balance_shards)
+        .where(
+            balance_shards.c.wallet_uuid == wallet_uuid,
+            balance_shards.c.shard == shard,
+            balance_shards.c.balance >= -lowest,
+        )
+        .values(balance=balance_shards.c.balance + bindparam("net", type_=MinorUnits()))
+        .returning(
+            balance_shards.c.wallet_uuid,
+            balance_shards.c.shard,
+            balance_shards.c.balance,
+        )
+        .cte("upd")
+    )
+    others = (
+        select(func.coalesce(func.sum(balance_shards.c.balance), 0))
+        .where(
+            balance_shards.c.wallet_uuid == upd.c.wallet_uuid,
+            balance_shards.c.shard != upd.c.shard,
+        )
+        .scalar_subquery()
+    )
+    total = select(
+        upd.c.wallet_uuid,
+        (upd.c.balance + others).label("balance"),
+    ).cte("total")
+    journal = (
+        insert(wallet_operations)
+        .from_select(
+            LEDGER_COLUMNS,
+            select(
+                total.c.wallet_uuid,
+                items.c.type,
+                items.c.amount,
+                total.c.balance + items.c.rel,
+            )
+            .join_from(items, total, true())
+            .order_by(items.c.ord),
+        )
+        .cte("journal")
+    )
+    return select(total.c.balance).add_cte(journal)
+
+
+@cache
+def rebalance_shards_stmt() -> Insert:
+    """
+    Запись новых балансов шардов одного кошелька и журнала операций.
+    Шарды должны быть заблокированы заранее.
+
+    Параметры: target_uuid, shards_shard/balance - новые балансы шардов,
+    ledger_uuid/type/amount/balance - примененные операции по порядку.
+    """
+    shards = unnest_params(
+        "shards",
+        shard=SmallInteger(),
+        balance=MinorUnits(),
+    )
+    ledger = unnest_params(
+        "ledger",
+        uuid=PG_UUID(as_uuid=True),
+        type=String(),
+        amount=MinorUnits(),
+        balance=MinorUnits(),
+    )
+    upd = (
+        update(balance_shards)
+        .where(
+            balance_shards.c.wallet_uuid == bindparam("target_uuid"),
+            balance_shards.c.shard == shards.c.shard,
+        )
+        .values(balance=shards.c.balance)
+        .cte("upd")
+    )
+    return (
+        insert(wallet_operations)
+        .from_select(
+            LEDGER_COLUMNS,
+            select(
+                ledger.c.uuid,
+                ledger.c.type,
+                ledger.c.amount,
+                ledger.c.balance,
+            ).order_by(ledger.c.ord),
+        )
+        .add_cte(upd)
+    )
@@ -1,21 +1,179 @@
+from contextlib import nullcontext
+from datetime import datetime
 from decimal import Decimal
+from tempfile import SpooledTemporaryFile
 from typing import Annotated
 from uuid import UUID
 
-from exceptions import NotEnoughBalanceError, WalletNotFound
-from fastapi import APIRouter, Depends, HTTPException
-from models import Wallet
-from schemas.operation import OperationTypeSchema
+from config import settings
+from exceptions import (
+    IdempotencyKeyReused,
+    NotEnoughBalanceError,
+    Overloaded,
+    WalletNotFound,
+    WalletVersionMismatch,
+)
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from metrics import NOT_ENOUGH_BALANCE, WALLET_NOT_FOUND
+from models.db import engines, session_factory
+from schemas.admission import AdmissionStatsSchema
+from schemas.cache import CacheStatsSchema
+from schemas.events import EventRelayStatsSchema
+from schemas.operation import (
+    OperationHistoryItemSchema,
+    OperationHistoryPageSchema,
+    OperationResultSchema,
+    OperationSchema,
+    OperationStatusSchema,
+    OperationTypeSchema,
+    TransferResultSchema,
+    TransferSchema,
+)
+from schemas.pool import PoolStatsSchema
 from schemas.wallet import (
+    MONEY_DECIMAL_PLACES,
+    MONEY_MAX_DIGITS,
     WalletCreateSchema,
+    WalletLookupResultSchema,
+    WalletLookupSchema,
     WalletReadBalanceSchema,
     WalletReadSchema,
 )
 
+from api.v1.wallets.bulk import (
+    SPOOL_MAX_MEMORY,
+    BulkFormat,
+    BulkRowError,
+    iter_lines,
+    iter_spooled,
+    parse_wallet_rows,
+)
 from api.v1.wallets.crud import WalletCRUD
-from api.v1.wallets.dependecies import wallet_crud
+from api.v1.wallets.dependecies import (
+    balance_cache,
+    batch_operations_body,
+    event_relay,
+    get_event_relay,
+    operation_admission,
+    read_wallet_crud,
+    wallet_crud,
+)
+from api.v1.wallets.etags import parse_if_match
+from api.v1.wallets.events import EventRelay, parse_event_id, stream_events
+from api.v1.wallets.export import EXPORT_CHUNK_SIZE, ExportFormat, stream_export
+from api.v1.wallets.pagination import decode_cursor, encode_cursor
+from api.v1.wallets.responses import (
+    WalletJSONResponse,
+    balance_response,
+    wallet_body,
+    wallet_response,
+)
+
+router = APIRouter(
+    prefix="/wallets",
+    tags=["wallets"],
+    default_response_class=WalletJSONResponse,
+)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+
+@router.get(":cache", response_model=CacheStatsSchema)
+async def cache_stats() -> CacheStatsSchema:
+    if balance_cache is None:
+        return CacheStatsSchema(enabled=False)
+    return CacheStatsSchema(enabled=True, **balance_cache.stats())
+
+
+@router.get(":admission", response_model=AdmissionStatsSchema)
+async def admission_stats() -> AdmissionStatsSchema:
+    """
+    Допуск операций текущего процесса: сколько выполняется, сколько
+    ждет в очереди и сколько отклонено с 503.
+    """
+    if operation_admission is None:
+        return AdmissionStatsSchema(enabled=False)
+    return AdmissionStatsSchema(enabled=True, **operation_admission.stats())
+
+
+@router.get(":relay", response_model=EventRelayStatsSchema)
+async def relay_stats() -> EventRelayStatsSchema:
+    """
+    Ретранслятор событий текущего процесса: позиция в потоке,
+    число подписчиков и сколько из них отключено за отставание.
+    """
+    if event_relay is None:
+        return EventRelayStatsSchema(enabled=False)
+    return EventRelayStatsSchema(enabled=True, **event_relay.stats())
+
+
+@router.get(
+    ":events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {EVENT_STREAM_MEDIA_TYPE: {}}}},
+)
+async def wallet_events(
+    relay: Annotated[EventRelay, Depends(get_event_relay)],
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """
+    Поток Server-Sent Events об операциях над всеми кошельками.
+    Событие operation: id "<txid>-<id>", в data - wallet_uuid,
+    operation_id, operation_type, amount, balance и created_at.
+    С заголовком Last-Event-ID поток продолжается после этого события,
+    пока оно не старше срока хранения событий.
+    """
+    return _event_stream_response(relay, None, last_event_id)
+
+
+@router.get(":pool", response_model=list[PoolStatsSchema])
+async def pool_stats() -> list[PoolStatsSchema]:
+    """
+    Пулы соединений текущего процесса (primary и реплики): сколько
+    соединений выдано, сколько открыто сверх pool_size, сколько запросы
+    ждали соединение и сколько из них не дождались.
+    """
+    return [
+        PoolStatsSchema(name=name, **engine.pool.stats())
+        for name, engine in engines().items()
+    ]
 
-router = APIRouter(prefix="/wallets", tags=["wallets"])
+
+@router.get(
+    ":export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {
+                NDJSON_MEDIA_TYPE: {},
+                "text/csv": {},
+                "application/gzip": {},
+            }
+        }
+    },
+)
+async def export_balances(
+    format: ExportFormat = ExportFormat.NDJSON,
+    gzip: bool = False,
+    chunk_size: Annotated[int, Query(ge=1, le=100_000)] = EXPORT_CHUNK_SIZE,
+) -> StreamingResponse:
+    """
+    Выгрузка балансов всех кошельков в порядке uuid потоком NDJSON
+    или CSV, с gzip=true - сжатым. Все строки из одного снимка БД,
+    память не растет с числом кошельков.
+    """
+    filename = f"balances.{format.value}"
+    media_type = NDJSON_MEDIA_TYPE if format == ExportFormat.NDJSON else "text/csv"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream_export(session_factory, format, compress=gzip, chunk_size=chunk_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.get("/{wallet_uuid}", response_model=WalletReadBalanceSchema)
@@ -23,13 +181,127 @@ async def get_balance(
     wallet_uuid: UUID,
     crud: Annotated[
         WalletCRUD,
-        Depends(wallet_crud),
+        Depends(read_wallet_crud),
     ],
-) -> Wallet:
+) -> WalletJSONResponse:
+    """
+    Баланс кошелька. Читается с реплики, если они настроены;
+    с заголовком Read-Your-Writes: true - с primary.
+    ETag - версия кошелька для If-Match операции; у шардированного
+    кошелька его нет.
+    """
     wallet = await crud.get_by_uuid(wallet_uuid)
     if not wallet:
+        WALLET_NOT_FOUND.inc()
         raise HTTPException(status_code=404, detail="Wallet not found")
-    return wallet
+    return balance_response(wallet)
+
+
+@router.post(":lookup", response_model=WalletLookupResultSchema)
+async def lookup_balances(
+    lookup: WalletLookupSchema,
+    crud: Annotated[
+        WalletCRUD,
+        Depends(read_wallet_crud),
+    ],
+) -> WalletJSONResponse:
+    """
+    Балансы нескольких кошельков одним запросом к БД. Несуществующие
+    кошельки перечисляются в missing, а не дают 404. Как и баланс
+    одного кошелька, читается с реплики, если они настроены.
+    """
+    wallet_uuids = list(dict.fromkeys(lookup.uuids))
+    found = await crud.get_many(wallet_uuids)
+    return WalletJSONResponse(
+        {
+            "wallets": [
+                wallet_body(found[wallet_uuid])
+                for wallet_uuid in wallet_uuids
+                if wallet_uuid in found
+            ],
+            "missing": [
+                wallet_uuid for wallet_uuid in wallet_uuids if wallet_uuid not in found
+            ],
+        }
+    )
+
+
+@router.get(
+    "/{wallet_uuid}/operations",
+    response_model=OperationHistoryPageSchema,
+)
+async def operation_history(
+    wallet_uuid: UUID,
+    crud: Annotated[
+        WalletCRUD,
+        Depends(wallet_crud),
+    ],
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    cursor: str | None = None,
+    operation_type: OperationTypeSchema | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> OperationHistoryPageSchema:
+    """
+    История операций кошелька от новых к старым.
+    Следующая страница запрашивается с cursor=next_cursor и теми же
+    фильтрами; since включительно, until не включительно.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        items, next_key = await crud.history(
+            wallet_uuid,
+            limit,
+            after=after,
+            operation_type=operation_type,
+            since=since,
+            until=until,
+        )
+    except WalletNotFound:
+        WALLET_NOT_FOUND.inc()
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    return OperationHistoryPageSchema(
+        items=[OperationHistoryItemSchema.model_validate(item) for item in items],
+        next_cursor=encode_cursor(*next_key) if next_key else None,
+    )
+
+
+@router.get(
+    "/{wallet_uuid}/events",
+    response_class=StreamingResponse,
+    responses={200: {"content": {EVENT_STREAM_MEDIA_TYPE: {}}}},
+)
+async def wallet_events_by_uuid(
+    wallet_uuid: UUID,
+    relay: Annotated[EventRelay, Depends(get_event_relay)],
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """
+    Поток Server-Sent Events об операциях над одним кошельком,
+    в том же формате, что и /wallets:events.
+    """
+    return _event_stream_response(relay, wallet_uuid, last_event_id)
+
+
+def _event_stream_response(
+    relay: EventRelay,
+    wallet_uuid: UUID | None,
+    last_event_id: str | None,
+) -> StreamingResponse:
+    after = None
+    if last_event_id is not None:
+        after = parse_event_id(last_event_id)
+        if after is None:
+            raise HTTPException(status_code=422, detail="Invalid Last-Event-ID")
+    return StreamingResponse(
+        stream_events(relay, wallet_uuid, after, settings.events.heartbeat),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        # Без буферизации в nginx события уходят клиенту сразу.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/", response_model=WalletReadSchema)
@@ -39,8 +311,8 @@ async def create_wallet(
         WalletCRUD,
         Depends(wallet_crud),
     ],
-) -> Wallet:
-    return await crud.create(wallet)
+) -> WalletJSONResponse:
+    return wallet_response(await crud.create(wallet))
 
 
 @router.post(
@@ -50,15 +322,174 @@ async def create_wallet(
 async def wallet_operation(
     wallet_uuid: UUID,
     operation_type: OperationTypeSchema,
-    amount: Decimal,
+    amount: Annotated[
+        Decimal,
+        Query(
+            gt=0,
+            max_digits=MONEY_MAX_DIGITS,
+            decimal_places=MONEY_DECIMAL_PLACES,
+        ),
+    ],
+    crud: Annotated[
+        WalletCRUD,
+        Depends(wallet_crud),
+    ],
+    idempotency_key: Annotated[
+        str | None,
+        Header(min_length=1, max_length=255),
+    ] = None,
+    if_match: Annotated[str | None, Header()] = None,
+) -> WalletJSONResponse:
+    """
+    Пополнение или списание. С заголовком Idempotency-Key повтор запроса
+    (например, после таймаута) возвращает результат первого выполнения
+    и не применяет операцию второй раз.
+    С заголовком If-Match (ETag из баланса или прошлой операции)
+    операция применяется, только если кошелек с тех пор не менялся,
+    иначе - 412; блокировка между чтением и записью не держится.
+    Если включен допуск операций, при перегрузке операция сразу
+    отклоняется с 503 и Retry-After, а не ждет соединение пула.
+    """
+    admission = (
+        operation_admission.admit(wallet_uuid)
+        if operation_admission is not None
+        else nullcontext()
+    )
+    try:
+        async with admission:
+            wallet = await crud.operation(
+                wallet_uuid,
+                operation_type,
+                amount,
+                idempotency_key=idempotency_key,
+                if_match=parse_if_match(if_match) if if_match is not None else None,
+            )
+    except Overloaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many operations, retry later",
+            headers={"Retry-After": str(settings.admission.retry_after)},
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was used for a different operation",
+        )
+    except WalletVersionMismatch:
+        raise HTTPException(
+            status_code=412,
+            detail="Wallet version does not match If-Match",
+        )
+    except WalletNotFound:
+        WALLET_NOT_FOUND.inc()
+        raise HTTPException(status_code=404, detail="Wallet not found")
+    except NotEnoughBalanceError:
+        NOT_ENOUGH_BALANCE.inc()
+        raise HTTPException(status_code=404, detail="Not enough balance")
+    return balance_response(wallet)
+
+
+@router.post("/transfer", response_model=TransferResultSchema)
+async def transfer(
+    transfer: TransferSchema,
     crud: Annotated[
         WalletCRUD,
         Depends(wallet_crud),
     ],
-) -> Wallet:
+) -> WalletJSONResponse:
+    """
+    Перевод между кошельками в одной транзакции: средства либо
+    списываются и зачисляются целиком, либо перевод отклоняется.
+    """
     try:
-        return await crud.operation(wallet_uuid, operation_type, amount)
+        source, target = await crud.transfer(
+            transfer.from_wallet_uuid,
+            transfer.to_wallet_uuid,
+            transfer.amount,
+        )
     except WalletNotFound:
+        WALLET_NOT_FOUND.inc()
         raise HTTPException(status_code=404, detail="Wallet not found")
     except NotEnoughBalanceError:
+        NOT_ENOUGH_BALANCE.inc()
         raise HTTPException(status_code=404, detail="Not enough balance")
+    return WalletJSONResponse(
+        {"from_wallet": wallet_body(source), "to_wallet": wallet_body(target)}
+    )
+
+
+@router.post(
+    "/operations:batch",
+    response_model=list[OperationResultSchema],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"type": "object"}},
+                },
+                "application/x-ndjson": {
+                    "schema": {"type": "string"},
+                },
+            },
+        }
+    },
+)
+async def batch_operation(
+    operations: Annotated[
+        list[OperationSchema],
+        Depends(batch_operations_body),
+    ],
+    crud: Annotated[
+        WalletCRUD,
+        Depends(wallet_crud),
+    ],
+    atomic: bool = True,
+) -> list[OperationResultSchema]:
+    results = await crud.batch_operation(operations, atomic=atomic)
+    for result in results:
+        if result.status == OperationStatusSchema.WALLET_NOT_FOUND:
+            WALLET_NOT_FOUND.inc()
+        elif result.status == OperationStatusSchema.NOT_ENOUGH_BALANCE:
+            NOT_ENOUGH_BALANCE.inc()
+    return results
+
+
+@router.post(
+    ":bulk",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk_create_wallets(
+    request: Request,
+    crud: Annotated[
+        WalletCRUD,
+        Depends(wallet_crud),
+    ],
+) -> StreamingResponse:
+    """
+    Массовое создание кошельков из потока NDJSON или CSV (text/csv).
+    Загрузка идет одной транзакцией; uuid созданных кошельков копятся
+    во временном файле и отдаются NDJSON-потоком после фиксации,
+    поэтому память не растет с размером загрузки.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = BulkFormat.CSV if content_type == "text/csv" else BulkFormat.NDJSON
+    wallets = parse_wallet_rows(iter_lines(request.stream()), fmt)
+    created = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        async for wallet_uuid in crud.bulk_create(wallets):
+            created.write(b'{"uuid": "%s"}\n' % str(wallet_uuid).encode())
+    except BulkRowError as e:
+        created.close()
+        raise HTTPException(status_code=422, detail=str(e))
+    return StreamingResponse(iter_spooled(created), media_type=NDJSON_MEDIA_TYPE)
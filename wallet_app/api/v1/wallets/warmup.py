@@ -0,0 +1,61 @@
+"""
+Прогрев пула соединений до приема запросов.
+
+Первые запросы нового процесса иначе платят за подключение
+к PostgreSQL, инициализацию диалекта SQLAlchemy и подготовку выражений
+asyncpg на каждом новом соединении. Прогрев открывает соединения пула
+одновременно и выполняет на каждом горячие запросы выбранного
+репозитория для несуществующего кошелька: выражения попадают в кэши
+подготовленных выражений, а данные не меняются - операции над
+несуществующим кошельком откатываются.
+"""
+
+import asyncio
+from contextlib import suppress
+from decimal import Decimal
+from uuid import UUID
+
+from exceptions import WalletNotFound
+from schemas.operation import OperationTypeSchema
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.v1.wallets.crud import WalletCRUD
+
+# uuid4 никогда не равен нулевому uuid, поэтому такого кошелька нет.
+NIL_UUID = UUID(int=0)
+WARMUP_AMOUNT = Decimal("0.01")
+
+
+async def warm_up_pool(
+    session_factory: async_sessionmaker,
+    connections: int,
+    repository: type[WalletCRUD] = WalletCRUD,
+    operations: bool = True,
+) -> None:
+    """
+    Прогрев connections соединений пула фабрики сессий.
+    Сессии сначала все вместе берут соединение, поэтому пул открывает
+    их одновременно, а не отдает одно и то же по очереди.
+    :param session_factory:
+    :param connections: Сколько соединений открыть, не больше pool_size.
+    :param repository: Реализация WalletCRUD, выражения которой готовить.
+    :param operations: Готовить и выражения операций (не для реплик).
+    """
+    if connections <= 0:
+        return
+    barrier = asyncio.Barrier(connections)
+
+    async def warm_up_connection() -> None:
+        async with session_factory() as session:
+            await session.connection()
+            await barrier.wait()
+            crud = repository(session)
+            await crud.get_by_uuid(NIL_UUID)
+            await crud.get_many([NIL_UUID])
+            if not operations:
+                return
+            for op_type in OperationTypeSchema:
+                with suppress(WalletNotFound):
+                    await crud.operation(NIL_UUID, op_type, WARMUP_AMOUNT)
+
+    await asyncio.gather(*(warm_up_connection() for _ in range(connections)))
@@ -0,0 +1,74 @@
+"""
+Пропускная способность операций над одним кошельком в зависимости
+от окна OperationCoalescer.
+
+Каждый из --clients конкурентных клиентов последовательно отправляет
+операции, как это делали бы HTTP-запросы к одному кошельку мерчанта.
+Окно 0 означает работу без объединения (обычный WalletCRUD.operation).
+"""
+
+import argparse
+import asyncio
+from decimal import Decimal
+
+from api.v1.wallets.coalescer import OperationCoalescer
+from api.v1.wallets.crud import WalletCRUD
+from schemas.operation import OperationTypeSchema
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import Timer, bench_session_factory, temporary_wallet
+
+AMOUNT = Decimal("1.00")
+
+
+async def run_window(
+    session_factory: async_sessionmaker,
+    window_ms: float,
+    clients: int,
+    operations: int,
+) -> float:
+    coalescer = OperationCoalescer(session_factory, window=window_ms / 1000)
+    async with temporary_wallet(session_factory, Decimal("1000000.00")) as wallet:
+
+        async def operation(op_type: OperationTypeSchema) -> None:
+            if window_ms:
+                await coalescer.submit(wallet.uuid, op_type, AMOUNT)
+                return
+            async with session_factory() as session:
+                await WalletCRUD(session).operation(wallet.uuid, op_type, AMOUNT)
+
+        async def client(n: int) -> None:
+            for i in range(operations // clients):
+                await operation(
+                    OperationTypeSchema.DEPOSIT
+                    if (n + i) % 2
+                    else OperationTypeSchema.WITHDRAW
+                )
+
+        with Timer() as t:
+            await asyncio.gather(*(client(n) for n in range(clients)))
+    return operations / t.elapsed
+
+
+async def run(windows: list[float], clients: int, operations: int) -> None:
+    async with bench_session_factory() as session_factory:
+        print(f"{'window, ms':>10} | {'ops/sec':>8}")
+        for window_ms in windows:
+            ops_per_sec = await run_window(
+                session_factory, window_ms, clients, operations
+            )
+            print(f"{window_ms:>10} | {ops_per_sec:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--windows",
+        type=float,
+        nargs="+",
+        default=[0, 0.25, 0.5, 1, 2, 5],
+    )
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--operations", type=int, default=10000)
+    args = parser.parse_args()
+    asyncio.run(run(args.windows, args.clients, args.operations))
@@ -0,0 +1,85 @@
+"""
+Общие помощники для бенчмарков.
+
+Бенчмарки запускаются из каталога wallet_app против реальной PostgreSQL
+с примененными миграциями, например:
+
+    python -m benchmarks.operation_throughput
+"""
+
+import time
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from typing import AsyncIterator
+
+from config import settings
+from models import Wallet, WalletBalanceShard, WalletOperation
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+
+@asynccontextmanager
+async def bench_session_factory(
+    pool_size: int = 20,
+) -> AsyncIterator[async_sessionmaker]:
+    """
+    Отдельный engine для бенчмарка, чтобы не зависеть от пула приложения.
+    :param pool_size: Размер пула соединений.
+    :return: Фабрика сессий.
+    """
+    engine = create_async_engine(
+        url=settings.db.url,
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    try:
+        yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+@asynccontextmanager
+async def temporary_wallet(
+    session_factory: async_sessionmaker,
+    balance: Decimal = Decimal("0.00"),
+) -> AsyncIterator[Wallet]:
+    """
+    Кошелек, который удаляется после замера вместе с журналом и шардами.
+    :param session_factory:
+    :param balance: Начальный баланс.
+    :return: Созданный кошелек.
+    """
+    async with session_factory() as session:
+        wallet = Wallet(balance=balance)
+        session.add(wallet)
+        await session.commit()
+    try:
+        yield wallet
+    finally:
+        async with session_factory() as session:
+            await session.execute(delete(Wallet).where(Wallet.uuid == wallet.uuid))
+            await session.execute(
+                delete(WalletOperation).where(
+                    WalletOperation.wallet_uuid == wallet.uuid
+                )
+            )
+            await session.execute(
+                delete(WalletBalanceShard).where(
+                    WalletBalanceShard.wallet_uuid == wallet.uuid
+                )
+            )
+            await session.commit()
+
+
+class Timer:
+    """
+    Замер времени блока кода: with Timer() as t: ...; t.elapsed.
+    """
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.started
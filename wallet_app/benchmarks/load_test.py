@@ -0,0 +1,612 @@
+"""
+Воспроизводимый нагрузочный тест HTTP API.
+
+Приложение из main.py запускается через uvicorn против одноразовой
+PostgreSQL, миграции и партиции применяются как в entrypoint.sh,
+сценарии выполняются по HTTP, результат - JSON, который можно
+сравнивать между коммитами:
+
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --output after.json --compare before.json
+
+Одноразовая база (--postgres):
+- initdb - временный кластер на свободном порту (initdb и pg_ctl из PATH
+  или --pg-bin), удаляется после прогона;
+- docker - контейнер postgres:17.5, как в docker-compose.yaml;
+- settings - база из настроек приложения (.env, WALLET__APP__DB__*);
+  созданные кошельки в ней остаются.
+
+Остальные настройки приложения берутся из окружения, например
+WALLET__APP__REPOSITORY=asyncpg; они попадают в отчет.
+
+Сценарии, по порядку:
+- create_burst - создание --wallets кошельков;
+- uniform_reads - баланс случайного из них;
+- hot_wallet - пополнения и списания одного кошелька вперемешку;
+- mixed_95_5 - 95% чтений баланса и 5% пополнений случайных кошельков.
+
+Проверка потерянных обновлений: после hot_wallet и mixed_95_5 балансы
+(и журнал горячего кошелька) сверяются с числом успешных операций.
+Модуль не импортирует приложение: настройки нужны только серверу.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from statistics import quantiles
+
+import aiohttp
+
+APP_DIR = Path(__file__).resolve().parent.parent
+WALLETS = "/api/v1/wallets"
+DB_USER = "app"
+DB_PASSWORD = "app"
+DB_NAME = "wallet"
+DOCKER_IMAGE = "postgres:17.5"
+INITIAL_BALANCE = Decimal("1000000.00")
+AMOUNT = Decimal("1.00")
+MIXED_WRITE_SHARE = 0.05
+STARTUP_TIMEOUT = 60.0
+# Свежие данные с primary, даже если в окружении настроены реплики.
+FRESH = {"Read-Your-Writes": "true"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _db_env(port: int, password: str) -> dict[str, str]:
+    return {
+        "WALLET__APP__DB__HOST": "127.0.0.1",
+        "WALLET__APP__DB__PORT": str(port),
+        "WALLET__APP__DB__USER": DB_USER,
+        "WALLET__APP__DB__PASSWORD": password,
+        "WALLET__APP__DB__DATABASE": DB_NAME,
+        "WALLET__APP__DB__REPLICAS": "[]",
+    }
+
+
+@contextmanager
+def initdb_postgres(pg_bin: Path | None) -> Iterator[dict[str, str]]:
+    """
+    Временный кластер PostgreSQL; initdb не запускается от root.
+    :param pg_bin: Каталог с initdb и pg_ctl; None - искать в PATH.
+    :return: Переменные окружения приложения для подключения.
+    """
+
+    def tool(name: str) -> str:
+        return str(pg_bin / name) if pg_bin else name
+
+    port = _free_port()
+    with tempfile.TemporaryDirectory(prefix="wallet-load-") as tmp:
+        data = Path(tmp) / "data"
+        subprocess.run(
+            [
+                tool("initdb"),
+                "-D",
+                str(data),
+                "-U",
+                DB_USER,
+                "--auth=trust",
+                "-E",
+                "UTF8",
+                "--locale=C",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        subprocess.run(
+            [
+                tool("pg_ctl"),
+                "-D",
+                str(data),
+                "-l",
+                str(Path(tmp) / "postgres.log"),
+                "-o",
+                f"-p {port} -k {tmp} -c listen_addresses=127.0.0.1"
+                " -c max_connections=200",
+                "-w",
+                "start",
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            subprocess.run(
+                [tool("createdb"), "-h", tmp, "-p", str(port), "-U", DB_USER, DB_NAME],
+                check=True,
+            )
+            yield _db_env(port, password="")
+        finally:
+            subprocess.run(
+                [tool("pg_ctl"), "-D", str(data), "-m", "fast", "-w", "stop"],
+                stdout=subprocess.DEVNULL,
+            )
+
+
+@contextmanager
+def docker_postgres() -> Iterator[dict[str, str]]:
+    """
+    Контейнер PostgreSQL, удаляется после остановки.
+    :return: Переменные окружения приложения для подключения.
+    """
+    port = _free_port()
+    name = f"wallet-load-{port}"
+    subprocess.run(
+        [
+            "docker",
+            "run",
+            "-d",
+            "--rm",
+            "--name",
+            name,
+            "-e",
+            f"POSTGRES_USER={DB_USER}",
+            "-e",
+            f"POSTGRES_PASSWORD={DB_PASSWORD}",
+            "-e",
+            f"POSTGRES_DB={DB_NAME}",
+            "-p",
+            f"127.0.0.1:{port}:5432",
+            DOCKER_IMAGE,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        # Во время инициализации сервер слушает только unix-сокет,
+        # поэтому готовность проверяется по TCP.
+        while (
+            subprocess.run(
+                ["docker", "exec", name, "pg_isready", "-h", "127.0.0.1"],
+                stdout=subprocess.DEVNULL,
+            ).returncode
+            != 0
+        ):
+            if time.monotonic() > deadline:
+                raise TimeoutError("PostgreSQL container did not start")
+            time.sleep(0.5)
+        yield _db_env(port, password=DB_PASSWORD)
+    finally:
+        subprocess.run(["docker", "stop", name], stdout=subprocess.DEVNULL)
+
+
+@contextmanager
+def throwaway_postgres(mode: str, pg_bin: Path | None) -> Iterator[dict[str, str]]:
+    if mode == "initdb":
+        with initdb_postgres(pg_bin) as env:
+            yield env
+    elif mode == "docker":
+        with docker_postgres() as env:
+            yield env
+    else:
+        yield {}
+
+
+@contextmanager
+def app_server(env: dict[str, str], workers: int) -> Iterator[str]:
+    """
+    Миграции, партиции и uvicorn с main:app на свободном порту.
+    :param env: Окружение процессов приложения.
+    :param workers: Число воркеров uvicorn.
+    :return: Базовый URL приложения.
+    """
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=APP_DIR,
+        env=env,
+        check=True,
+    )
+    subprocess.run(
+        [sys.executable, "cli.py", "partitions", "create"],
+        cwd=APP_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=APP_DIR,
+        env=env,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("uvicorn did not start")
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+class Scenario:
+    """
+    Запросы сценария: задержки, коды ответов и ошибки клиента
+    (таймауты, разрывы соединения).
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.latencies: list[float] = []
+        self.statuses: Counter[int] = Counter()
+        self.errors = 0
+        self.elapsed = 0.0
+        self.checks: dict = {}
+
+    async def run(
+        self, requests: int, request: Callable[[int], Awaitable[int]]
+    ) -> None:
+        """
+        Выполнить requests запросов, не больше concurrency одновременно.
+        :param requests: Число запросов.
+        :param request: Запрос по номеру; возвращает код ответа.
+        :return:
+        """
+        numbers = iter(range(requests))
+
+        async def _worker() -> None:
+            for number in numbers:
+                started = time.perf_counter()
+                try:
+                    status = await request(number)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    self.errors += 1
+                    continue
+                self.latencies.append(time.perf_counter() - started)
+                self.statuses[status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(_worker() for _ in range(self.concurrency)))
+        self.elapsed += time.perf_counter() - started
+
+    def report(self) -> dict:
+        completed = len(self.latencies)
+        latency_ms = {}
+        if completed > 1:
+            percentiles = quantiles(self.latencies, n=100, method="inclusive")
+            latency_ms = {
+                "p50": round(percentiles[49] * 1000, 3),
+                "p95": round(percentiles[94] * 1000, 3),
+                "p99": round(percentiles[98] * 1000, 3),
+                "max": round(max(self.latencies) * 1000, 3),
+            }
+        return {
+            "requests": completed + self.errors,
+            "concurrency": self.concurrency,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "throughput_rps": round(completed / self.elapsed, 1)
+            if self.elapsed
+            else 0.0,
+            "latency_ms": latency_ms,
+            "statuses": {str(code): n for code, n in sorted(self.statuses.items())},
+            "client_errors": self.errors,
+            "checks": self.checks,
+        }
+
+
+async def _balance(http: aiohttp.ClientSession, wallet_uuid: str) -> Decimal:
+    async with http.get(f"{WALLETS}/{wallet_uuid}", headers=FRESH) as response:
+        response.raise_for_status()
+        return Decimal((await response.json())["balance"])
+
+
+async def _create_wallet(http: aiohttp.ClientSession, balance: Decimal) -> str:
+    async with http.post(f"{WALLETS}/", json={"balance": str(balance)}) as response:
+        response.raise_for_status()
+        return (await response.json())["uuid"]
+
+
+async def _operation(
+    http: aiohttp.ClientSession, wallet_uuid: str, operation_type: str
+) -> int:
+    async with http.post(
+        f"{WALLETS}/{wallet_uuid}/operation",
+        params={"operation_type": operation_type, "amount": str(AMOUNT)},
+    ) as response:
+        await response.read()
+        return response.status
+
+
+async def _ledger_size(http: aiohttp.ClientSession, wallet_uuid: str) -> int:
+    size = 0
+    params = {"limit": "500"}
+    while True:
+        async with http.get(
+            f"{WALLETS}/{wallet_uuid}/operations", params=params
+        ) as response:
+            response.raise_for_status()
+            page = await response.json()
+        size += len(page["items"])
+        if page["next_cursor"] is None:
+            return size
+        params["cursor"] = page["next_cursor"]
+
+
+async def create_burst(
+    http: aiohttp.ClientSession, args: argparse.Namespace, wallets: list[str]
+) -> Scenario:
+    scenario = Scenario(args.concurrency)
+
+    async def _request(number: int) -> int:
+        async with http.post(
+            f"{WALLETS}/", json={"balance": str(INITIAL_BALANCE)}
+        ) as response:
+            if response.status == 200:
+                wallets.append((await response.json())["uuid"])
+            else:
+                await response.read()
+            return response.status
+
+    await scenario.run(args.wallets, _request)
+    scenario.checks = {
+        "created": len(wallets),
+        "duplicate_uuids": len(wallets) - len(set(wallets)),
+    }
+    return scenario
+
+
+async def uniform_reads(
+    http: aiohttp.ClientSession, args: argparse.Namespace, wallets: list[str]
+) -> Scenario:
+    scenario = Scenario(args.concurrency)
+
+    async def _request(number: int) -> int:
+        async with http.get(f"{WALLETS}/{random.choice(wallets)}") as response:
+            await response.read()
+            return response.status
+
+    await scenario.run(args.requests, _request)
+    return scenario
+
+
+async def hot_wallet(
+    http: aiohttp.ClientSession, args: argparse.Namespace, wallets: list[str]
+) -> Scenario:
+    scenario = Scenario(args.concurrency)
+    wallet_uuid = await _create_wallet(http, INITIAL_BALANCE)
+    succeeded = Counter()
+
+    async def _request(number: int) -> int:
+        operation_type = "DEPOSIT" if number % 2 == 0 else "WITHDRAW"
+        status = await _operation(http, wallet_uuid, operation_type)
+        if status == 200:
+            succeeded[operation_type] += 1
+        return status
+
+    await scenario.run(args.requests, _request)
+    expected = INITIAL_BALANCE + AMOUNT * (succeeded["DEPOSIT"] - succeeded["WITHDRAW"])
+    actual = await _balance(http, wallet_uuid)
+    # Плюс запись о начальном балансе при создании.
+    expected_ledger = succeeded.total() + 1
+    actual_ledger = await _ledger_size(http, wallet_uuid)
+    scenario.checks = {
+        "expected_balance": str(expected),
+        "actual_balance": str(actual),
+        "lost_updates": int((expected - actual) / AMOUNT),
+        "missing_ledger_entries": expected_ledger - actual_ledger,
+        # Исход запросов с ошибкой клиента неизвестен: при них
+        # расхождение не обязательно означает потерянное обновление.
+        "conclusive": scenario.errors == 0,
+    }
+    return scenario
+
+
+async def mixed_95_5(
+    http: aiohttp.ClientSession, args: argparse.Namespace, wallets: list[str]
+) -> Scenario:
+    scenario = Scenario(args.concurrency)
+    deposits = Counter()
+
+    async def _request(number: int) -> int:
+        wallet_uuid = random.choice(wallets)
+        if random.random() < MIXED_WRITE_SHARE:
+            status = await _operation(http, wallet_uuid, "DEPOSIT")
+            if status == 200:
+                deposits[wallet_uuid] += 1
+            return status
+        async with http.get(f"{WALLETS}/{wallet_uuid}") as response:
+            await response.read()
+            return response.status
+
+    await scenario.run(args.requests, _request)
+    lost = 0
+    for wallet_uuid, count in deposits.items():
+        actual = await _balance(http, wallet_uuid)
+        lost += int((INITIAL_BALANCE + AMOUNT * count - actual) / AMOUNT)
+    scenario.checks = {
+        "writes": deposits.total(),
+        "wallets_written": len(deposits),
+        "lost_updates": lost,
+        "conclusive": scenario.errors == 0,
+    }
+    return scenario
+
+
+SCENARIOS = {
+    "create_burst": create_burst,
+    "uniform_reads": uniform_reads,
+    "hot_wallet": hot_wallet,
+    "mixed_95_5": mixed_95_5,
+}
+
+
+async def run_scenarios(base_url: str, args: argparse.Namespace) -> dict:
+    """
+    :return: Отчеты сценариев по именам.
+    """
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(
+        base_url, timeout=timeout, connector=connector
+    ) as http:
+        # Прогрев: соединения клиента и пула приложения.
+        warmup = argparse.Namespace(**{**vars(args), "requests": args.concurrency * 20})
+        await uniform_reads(http, warmup, [await _create_wallet(http, INITIAL_BALANCE)])
+
+        wallets = []
+        reports = {}
+        for name, scenario in SCENARIOS.items():
+            reports[name] = (await scenario(http, args, wallets)).report()
+            print(_summary_line(name, reports[name]), file=sys.stderr)
+        return reports
+
+
+def _git(*command: str) -> str:
+    try:
+        return subprocess.run(
+            ["git", *command],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _app_settings() -> dict[str, str]:
+    # Без подключения к базе: в нем адреса и пароли.
+    return {
+        key: value
+        for key, value in sorted(os.environ.items())
+        if key.upper().startswith("WALLET__APP__")
+        and not key.upper().startswith("WALLET__APP__DB__")
+    }
+
+
+def _summary_line(name: str, report: dict) -> str:
+    latency = report["latency_ms"]
+    return (
+        f"{name:>14}: {report['throughput_rps']:8.1f} req/sec, "
+        f"p50 {latency.get('p50', 0):7.2f} ms, "
+        f"p95 {latency.get('p95', 0):7.2f} ms, "
+        f"p99 {latency.get('p99', 0):7.2f} ms, "
+        f"lost updates {report['checks'].get('lost_updates', '-')}"
+    )
+
+
+def compare(baseline: dict, current: dict) -> None:
+    """
+    Напечатать изменение пропускной способности и p99 относительно
+    отчета baseline.
+    """
+
+    def _change(before: float, after: float) -> str:
+        if not before:
+            return "     n/a"
+        return f"{(after - before) / before:+8.1%}"
+
+    print(f"baseline {baseline['commit'][:12]} -> {current['commit'][:12]}")
+    for name, report in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        print(
+            f"{name:>14}: req/sec "
+            f"{old['throughput_rps']:8.1f} -> {report['throughput_rps']:8.1f} "
+            f"{_change(old['throughput_rps'], report['throughput_rps'])}, "
+            f"p99 {old['latency_ms'].get('p99', 0):7.2f} -> "
+            f"{report['latency_ms'].get('p99', 0):7.2f} ms "
+            f"{_change(old['latency_ms'].get('p99', 0), report['latency_ms'].get('p99', 0))}"
+        )
+
+
+def main(args: argparse.Namespace) -> int:
+    random.seed(args.seed)
+    started_at = datetime.now(timezone.utc)
+    with throwaway_postgres(args.postgres, args.pg_bin) as db_env:
+        env = {**os.environ, **db_env}
+        with app_server(env, args.workers) as base_url:
+            scenarios = asyncio.run(run_scenarios(base_url, args))
+    report = {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "postgres": args.postgres,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "wallets": args.wallets,
+        "seed": args.seed,
+        "settings": _app_settings(),
+        "scenarios": scenarios,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        compare(json.loads(args.compare.read_text()), report)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--postgres",
+        choices=("initdb", "docker", "settings"),
+        help="По умолчанию initdb, если он найден, иначе docker",
+    )
+    parser.add_argument("--pg-bin", type=Path, help="Каталог с initdb и pg_ctl")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--wallets", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, metavar="BASELINE_JSON")
+    args = parser.parse_args()
+    if args.postgres is None:
+        args.postgres = "initdb" if args.pg_bin or shutil.which("initdb") else "docker"
+    sys.exit(main(args))
@@ -0,0 +1,66 @@
+"""
+Стоимость триггера NOTIFY (wallets_notify_balance) для операций.
+
+Параллельные пополнения разных кошельков, чтобы фиксации не ждали
+друг друга на блокировках строк: сначала без триггера, как в схеме
+по умолчанию, затем с ним. Транзакция с NOTIFY при фиксации берет
+глобальную блокировку очереди уведомлений, поэтому с триггером
+фиксации идут по одной. Состояние триггера после замера
+восстанавливается.
+"""
+
+import argparse
+import asyncio
+from contextlib import AsyncExitStack
+from decimal import Decimal
+
+from api.v1.wallets.crud import WalletCRUD
+from models.triggers import TRIGGERS, set_trigger, trigger_installed
+from schemas.operation import OperationTypeSchema
+
+from benchmarks.common import Timer, bench_session_factory, temporary_wallet
+
+AMOUNT = Decimal("1.00")
+
+
+async def run(operations: int, wallets: int, pool_size: int) -> None:
+    trigger = TRIGGERS["notify"]
+    async with bench_session_factory(pool_size) as session_factory:
+        engine = session_factory.kw["bind"]
+        async with engine.connect() as conn:
+            installed = await trigger_installed(conn, trigger)
+
+        async def deposit(wallet_uuid):
+            async with session_factory() as session:
+                await WalletCRUD(session).operation(
+                    wallet_uuid, OperationTypeSchema.DEPOSIT, AMOUNT
+                )
+
+        async with AsyncExitStack() as stack:
+            uuids = [
+                (
+                    await stack.enter_async_context(temporary_wallet(session_factory))
+                ).uuid
+                for _ in range(wallets)
+            ]
+            try:
+                for name, enabled in (("default", False), ("notify", True)):
+                    async with engine.begin() as conn:
+                        await set_trigger(conn, trigger, enabled)
+                    with Timer() as t:
+                        await asyncio.gather(
+                            *(deposit(uuids[i % wallets]) for i in range(operations))
+                        )
+                    print(f"{name:>7}: {operations / t.elapsed:8.0f} ops/sec")
+            finally:
+                async with engine.begin() as conn:
+                    await set_trigger(conn, trigger, installed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--wallets", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.operations, args.wallets, args.pool_size))
@@ -0,0 +1,63 @@
+"""
+Пропускная способность операций над одним "горячим" кошельком.
+
+Сравнивает прежнюю схему (session.get, изменение баланса в Python, commit)
+с одним условным UPDATE ... RETURNING из WalletCRUD.operation
+и проверяет, сколько обновлений было потеряно.
+"""
+
+import argparse
+import asyncio
+from decimal import Decimal
+from uuid import UUID
+
+from api.v1.wallets.crud import WalletCRUD
+from models import Wallet
+from schemas.operation import OperationTypeSchema
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import Timer, bench_session_factory, temporary_wallet
+
+AMOUNT = Decimal("1.00")
+
+
+async def legacy_deposit(session_factory: async_sessionmaker, wallet_uuid: UUID):
+    async with session_factory() as session:
+        wallet = await session.get(Wallet, wallet_uuid)
+        wallet.balance += AMOUNT
+        await session.commit()
+
+
+async def atomic_deposit(session_factory: async_sessionmaker, wallet_uuid: UUID):
+    async with session_factory() as session:
+        await WalletCRUD(session).operation(
+            wallet_uuid, OperationTypeSchema.DEPOSIT, AMOUNT
+        )
+
+
+async def run(operations: int, pool_size: int) -> None:
+    async with bench_session_factory(pool_size) as session_factory:
+        for name, deposit in (("legacy", legacy_deposit), ("atomic", atomic_deposit)):
+            async with temporary_wallet(session_factory) as wallet:
+                with Timer() as t:
+                    await asyncio.gather(
+                        *(
+                            deposit(session_factory, wallet.uuid)
+                            for _ in range(operations)
+                        )
+                    )
+                async with session_factory() as session:
+                    balance = (await session.get(Wallet, wallet.uuid)).balance
+                lost = operations - int(balance / AMOUNT)
+                print(
+                    f"{name:>7}: {operations / t.elapsed:8.0f} ops/sec, "
+                    f"lost updates: {lost}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--pool-size", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.operations, args.pool_size))
@@ -0,0 +1,105 @@
+"""
+Задержка и пропускная способность горячих запросов для реализаций
+WalletCRUD: SQLAlchemy ORM против подготовленных выражений asyncpg
+(настройка repository).
+
+Каждый запрос - отдельная сессия, как в обработчике FastAPI; операции
+распределены по --wallets кошелькам, чтобы замерять накладные расходы
+запроса, а не ожидание блокировки одной строки.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from contextlib import AsyncExitStack
+from decimal import Decimal
+from statistics import quantiles
+from uuid import UUID
+
+from api.v1.wallets.dependecies import REPOSITORIES
+from schemas.operation import OperationTypeSchema
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import Timer, bench_session_factory, temporary_wallet
+
+AMOUNT = Decimal("1.00")
+
+
+async def measure(
+    session_factory: async_sessionmaker,
+    crud_cls: type,
+    endpoint: str,
+    wallets: list[UUID],
+    requests: int,
+    concurrency: int,
+) -> tuple[list[float], float]:
+    """
+    :return: Задержки запросов в секундах и общее время.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def _request(wallet_uuid: UUID) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            async with session_factory() as session:
+                crud = crud_cls(session)
+                if endpoint == "get_balance":
+                    await crud.get_by_uuid(wallet_uuid)
+                else:
+                    await crud.operation(
+                        wallet_uuid, OperationTypeSchema.DEPOSIT, AMOUNT
+                    )
+            latencies.append(time.perf_counter() - started)
+
+    with Timer() as t:
+        await asyncio.gather(
+            *(_request(random.choice(wallets)) for _ in range(requests))
+        )
+    return latencies, t.elapsed
+
+
+async def run(requests: int, concurrency: int, wallet_count: int) -> None:
+    async with bench_session_factory(concurrency) as session_factory:
+        async with AsyncExitStack() as stack:
+            wallets = [
+                (
+                    await stack.enter_async_context(temporary_wallet(session_factory))
+                ).uuid
+                for _ in range(wallet_count)
+            ]
+            for endpoint in ("get_balance", "wallet_operation"):
+                for name, crud_cls in REPOSITORIES.items():
+                    # Прогрев: соединения пула и подготовленные выражения.
+                    await measure(
+                        session_factory,
+                        crud_cls,
+                        endpoint,
+                        wallets,
+                        concurrency * 2,
+                        concurrency,
+                    )
+                    latencies, elapsed = await measure(
+                        session_factory,
+                        crud_cls,
+                        endpoint,
+                        wallets,
+                        requests,
+                        concurrency,
+                    )
+                    percentiles = quantiles(latencies, n=100)
+                    print(
+                        f"{endpoint:>16} {name:>10}: {requests / elapsed:7.0f} req/sec, "
+                        f"p50 {percentiles[49] * 1000:6.2f} ms, "
+                        f"p99 {percentiles[98] * 1000:6.2f} ms"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--wallets", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.wallets))
@@ -0,0 +1,112 @@
+"""
+Стоимость сериализации ответа кошелька на один запрос: путь
+response_model (повторная проверка ORM-объекта pydantic и JSONResponse,
+как FastAPI делал раньше) против готового WalletJSONResponse на orjson.
+
+БД не нужна: сравнивается только работа от значения, которое вернул
+WalletCRUD, до байтов тела ответа.
+"""
+
+import argparse
+import asyncio
+from decimal import Decimal
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+from api.v1.wallets.responses import (
+    WalletJSONResponse,
+    balance_response,
+    wallet_body,
+    wallet_response,
+)
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from models import Wallet
+from schemas.wallet import (
+    WalletLookupResultSchema,
+    WalletReadBalanceSchema,
+    WalletReadSchema,
+)
+
+from benchmarks.common import Timer
+
+
+def response_model_path(
+    response_model: type, build: Callable[[], Any]
+) -> Callable[[], Awaitable[bytes]]:
+    field = create_model_field(
+        name="Response", type_=response_model, mode="serialization"
+    )
+
+    async def run() -> bytes:
+        content = await serialize_response(field=field, response_content=build())
+        return JSONResponse(content).body
+
+    return run
+
+
+def orjson_path(build: Callable[[], Any]) -> Callable[[], Awaitable[bytes]]:
+    async def run() -> bytes:
+        return build().body
+
+    return run
+
+
+async def per_request_us(run: Callable[[], Awaitable[bytes]], requests: int) -> float:
+    for _ in range(min(requests, 1000)):
+        await run()
+    with Timer() as t:
+        for _ in range(requests):
+            await run()
+    return t.elapsed / requests * 1_000_000
+
+
+async def run(requests: int, lookup_size: int) -> None:
+    wallet = Wallet(uuid=uuid4(), balance=Decimal("1234.50"))
+    wallets = [
+        Wallet(uuid=uuid4(), balance=Decimal(n).scaleb(-2)) for n in range(lookup_size)
+    ]
+    cases = {
+        "balance": (
+            response_model_path(WalletReadBalanceSchema, lambda: wallet),
+            orjson_path(lambda: balance_response(wallet)),
+        ),
+        "wallet": (
+            response_model_path(WalletReadSchema, lambda: wallet),
+            orjson_path(lambda: wallet_response(wallet)),
+        ),
+        f"lookup x{lookup_size}": (
+            response_model_path(
+                WalletLookupResultSchema,
+                lambda: WalletLookupResultSchema(
+                    wallets=[
+                        WalletReadSchema(uuid=w.uuid, balance=w.balance)
+                        for w in wallets
+                    ],
+                    missing=[],
+                ),
+            ),
+            orjson_path(
+                lambda: WalletJSONResponse(
+                    {"wallets": [wallet_body(w) for w in wallets], "missing": []}
+                )
+            ),
+        ),
+    }
+    print(f"{'response':>12} | {'before, us':>10} | {'after, us':>9} | {'speedup':>7}")
+    for name, (before, after) in cases.items():
+        before_us = await per_request_us(before, requests)
+        after_us = await per_request_us(after, requests)
+        print(
+            f"{name:>12} | {before_us:>10.1f} | {after_us:>9.1f} "
+            f"| {before_us / after_us:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--lookup-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.lookup_size))
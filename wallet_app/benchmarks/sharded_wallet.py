@@ -0,0 +1,114 @@
+"""
+Пропускная способность "горячего" кошелька: одна строка wallets
+против баланса, разнесенного по шардам.
+
+Параллельные пополнения (и при --withdraw-share > 0 списания)
+одного кошелька; после замера проверяется, что баланс сошелся.
+Нагрузка делится между --workers процессами, как между воркерами
+uvicorn: в одном процессе предел обычно ставит event loop, а не
+блокировка строки в БД.
+"""
+
+import argparse
+import asyncio
+import random
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from uuid import UUID
+
+from api.v1.wallets.crud import WalletCRUD
+from api.v1.wallets.shards import set_shards
+from schemas.operation import OperationTypeSchema
+
+from benchmarks.common import Timer, bench_session_factory, temporary_wallet
+
+AMOUNT = Decimal("1.00")
+INITIAL = Decimal("1000000.00")
+
+
+async def run_operations(
+    wallet_uuid: UUID,
+    ops: list[OperationTypeSchema],
+    pool_size: int,
+) -> float:
+    """
+    Операции одного воркера.
+    :return: Время выполнения операций без запуска процесса и пула.
+    """
+    async with bench_session_factory(pool_size) as session_factory:
+
+        async def _run(op_type: OperationTypeSchema) -> None:
+            async with session_factory() as session:
+                await WalletCRUD(session).operation(wallet_uuid, op_type, AMOUNT)
+
+        await _run(OperationTypeSchema.DEPOSIT)
+        with Timer() as t:
+            await asyncio.gather(*(_run(op_type) for op_type in ops))
+        await _run(OperationTypeSchema.WITHDRAW)
+    return t.elapsed
+
+
+def worker(wallet_uuid: UUID, ops: list[OperationTypeSchema], pool_size: int) -> float:
+    return asyncio.run(run_operations(wallet_uuid, ops, pool_size))
+
+
+async def run(
+    operations: int,
+    pool_size: int,
+    workers: int,
+    shard_counts: list[int],
+    withdraw_share: float,
+) -> None:
+    ops = [
+        OperationTypeSchema.WITHDRAW
+        if random.random() < withdraw_share
+        else OperationTypeSchema.DEPOSIT
+        for _ in range(operations)
+    ]
+    expected = INITIAL + sum(
+        AMOUNT if op_type == OperationTypeSchema.DEPOSIT else -AMOUNT for op_type in ops
+    )
+    async with bench_session_factory(pool_size) as session_factory:
+        for shards in [0, *shard_counts]:
+            async with temporary_wallet(session_factory, INITIAL) as wallet:
+                if shards:
+                    async with session_factory() as session:
+                        await set_shards(session, wallet.uuid, shards)
+                loop = asyncio.get_running_loop()
+                with ProcessPoolExecutor(workers) as pool:
+                    elapsed = await asyncio.gather(
+                        *(
+                            loop.run_in_executor(
+                                pool, worker, wallet.uuid, ops[i::workers], pool_size
+                            )
+                            for i in range(workers)
+                        )
+                    )
+                async with session_factory() as session:
+                    balance = (
+                        await WalletCRUD(session).get_by_uuid(wallet.uuid)
+                    ).balance
+                name = f"{shards} shards" if shards else "single row"
+                print(
+                    f"{name:>10}: {operations / max(elapsed):8.0f} ops/sec, "
+                    f"balance ok: {balance == expected}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--pool-size", type=int, default=20, help="Per worker")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shards", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--withdraw-share", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(
+        run(
+            args.operations,
+            args.pool_size,
+            args.workers,
+            args.shards,
+            args.withdraw_share,
+        )
+    )
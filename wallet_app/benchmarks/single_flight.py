@@ -0,0 +1,103 @@
+"""
+Всплеск одинаковых чтений баланса: запросы к БД и задержка
+без объединения чтений и с SingleFlight (настройка single_flight).
+
+Каждый всплеск - --requests одновременных чтений, распределенных
+по --wallets кошелькам, каждое в своей сессии, как в обработчике
+FastAPI. Запросы к БД считаются по вызовам чтения кошелька
+из репозитория (_read_wallet - один SELECT на вызов).
+"""
+
+import argparse
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from statistics import quantiles
+from uuid import UUID
+
+from api.v1.wallets.dependecies import REPOSITORIES
+from api.v1.wallets.singleflight import SingleFlight
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import Timer, bench_session_factory, temporary_wallet
+
+
+def counting(crud_cls: type) -> type:
+    class CountingCRUD(crud_cls):
+        queries = 0
+
+        async def _read_wallet(self, wallet_uuid: UUID):
+            CountingCRUD.queries += 1
+            return await super()._read_wallet(wallet_uuid)
+
+    return CountingCRUD
+
+
+async def burst(
+    session_factory: async_sessionmaker,
+    crud_cls: type,
+    single_flight: SingleFlight | None,
+    wallets: list[UUID],
+    requests: int,
+) -> list[float]:
+    """
+    :return: Задержки чтений в секундах.
+    """
+    latencies = []
+
+    async def _request(wallet_uuid: UUID) -> None:
+        started = time.perf_counter()
+        async with session_factory() as session:
+            await crud_cls(session, None, single_flight).get_by_uuid(wallet_uuid)
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(
+        *(_request(wallets[n % len(wallets)]) for n in range(requests))
+    )
+    return latencies
+
+
+async def run(requests: int, bursts: int, wallet_count: int, pool_size: int) -> None:
+    async with bench_session_factory(pool_size) as session_factory:
+        async with AsyncExitStack() as stack:
+            wallets = [
+                (
+                    await stack.enter_async_context(temporary_wallet(session_factory))
+                ).uuid
+                for _ in range(wallet_count)
+            ]
+            for name, crud_cls in REPOSITORIES.items():
+                for mode in ("off", "on"):
+                    counted = counting(crud_cls)
+                    single_flight = SingleFlight() if mode == "on" else None
+                    # Прогрев: соединения пула и подготовленные выражения.
+                    await burst(session_factory, counted, None, wallets, pool_size)
+                    counted.queries = 0
+                    latencies = []
+                    with Timer() as t:
+                        for _ in range(bursts):
+                            latencies += await burst(
+                                session_factory,
+                                counted,
+                                single_flight,
+                                wallets,
+                                requests,
+                            )
+                    percentiles = quantiles(latencies, n=100)
+                    print(
+                        f"{name:>10} single_flight={mode:>3}: "
+                        f"{counted.queries / bursts:6.1f} queries/burst, "
+                        f"{requests * bursts / t.elapsed:6.0f} req/sec, "
+                        f"p50 {percentiles[49] * 1000:6.2f} ms, "
+                        f"p99 {percentiles[98] * 1000:6.2f} ms"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--wallets", type=int, default=1)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.bursts, args.wallets, args.pool_size))
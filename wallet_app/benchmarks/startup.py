@@ -0,0 +1,71 @@
+"""
+Первые запросы нового процесса: холодный пул против прогретого
+warm_up_pool (настройка db.warmup_connections).
+
+Для каждого режима создается новый engine, как при старте процесса,
+и сразу приходит всплеск из --requests одновременных запросов
+баланса. В режиме warm перед всплеском пул прогревается, время
+прогрева печатается отдельно - это задержка готовности процесса.
+"""
+
+import argparse
+import asyncio
+import time
+from statistics import quantiles
+
+from api.v1.wallets.dependecies import REPOSITORIES
+from api.v1.wallets.warmup import warm_up_pool
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import Timer, bench_session_factory, temporary_wallet
+
+
+async def first_requests(
+    session_factory: async_sessionmaker,
+    crud_cls: type,
+    wallet_uuid,
+    requests: int,
+) -> list[float]:
+    """
+    :return: Задержки первых запросов в секундах.
+    """
+    latencies = []
+
+    async def _request() -> None:
+        started = time.perf_counter()
+        async with session_factory() as session:
+            await crud_cls(session).get_by_uuid(wallet_uuid)
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(_request() for _ in range(requests)))
+    return latencies
+
+
+async def run(requests: int, pool_size: int) -> None:
+    async with bench_session_factory(1) as setup_factory:
+        async with temporary_wallet(setup_factory) as wallet:
+            for name, crud_cls in REPOSITORIES.items():
+                for mode in ("cold", "warm"):
+                    async with bench_session_factory(pool_size) as session_factory:
+                        with Timer() as t:
+                            if mode == "warm":
+                                await warm_up_pool(session_factory, pool_size, crud_cls)
+                        latencies = await first_requests(
+                            session_factory, crud_cls, wallet.uuid, requests
+                        )
+                    percentiles = quantiles(latencies, n=100)
+                    print(
+                        f"{name:>10} {mode}: warmup {t.elapsed * 1000:7.1f} ms, "
+                        f"first {requests}: "
+                        f"p50 {percentiles[49] * 1000:6.2f} ms, "
+                        f"p99 {percentiles[98] * 1000:6.2f} ms, "
+                        f"max {max(latencies) * 1000:6.2f} ms"
+                    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.pool_size))
@@ -0,0 +1,222 @@
+"""
+Командная строка сервиса кошельков.
+Запускается из каталога wallet_app:
+
+    python cli.py bulk-create wallets.ndjson > created.ndjson
+    python cli.py export --format csv --gzip > balances.csv.gz
+    python cli.py partitions create --ahead 3
+    python cli.py partitions detach --before 2026-01-01 --drop
+    python cli.py partitions detach --table idempotency_keys --drop
+    python cli.py shards enable <wallet_uuid> --shards 16
+    python cli.py events disable
+    python cli.py notify enable
+"""
+
+import argparse
+import asyncio
+import sys
+from collections.abc import AsyncIterator
+from datetime import date, datetime, timezone
+from pathlib import Path
+from uuid import UUID
+
+from api.v1.wallets.bulk import BulkFormat, BulkRowError, parse_wallet_rows
+from api.v1.wallets.crud import WalletCRUD
+from api.v1.wallets.export import EXPORT_CHUNK_SIZE, ExportFormat, stream_export
+from api.v1.wallets.shards import MAX_SHARDS, set_shards
+from exceptions import WalletNotFound
+from models.db import dispose_engines, primary_engine, session_factory
+from models.partitions import (
+    PARTITIONED_TABLES,
+    create_partitions,
+    detach_partitions,
+    lock_partitions,
+)
+from models.triggers import TRIGGERS, set_trigger
+
+
+async def _read_lines(path: Path) -> AsyncIterator[bytes]:
+    with path.open("rb") as file:
+        for line in file:
+            yield line.rstrip(b"\r\n")
+
+
+async def bulk_create(args: argparse.Namespace) -> int:
+    """
+    Массовое создание кошельков из файла NDJSON или CSV.
+    uuid созданных кошельков печатаются по одному на строку.
+    """
+    fmt = args.format or (
+        BulkFormat.CSV if args.path.suffix == ".csv" else BulkFormat.NDJSON
+    )
+    wallets = parse_wallet_rows(_read_lines(args.path), fmt)
+    async with session_factory() as session:
+        try:
+            async for wallet_uuid in WalletCRUD(session).bulk_create(
+                wallets, chunk_size=args.chunk_size
+            ):
+                sys.stdout.write(f"{wallet_uuid}\n")
+        except BulkRowError as e:
+            print(e, file=sys.stderr)
+            return 1
+    return 0
+
+
+async def export(args: argparse.Namespace) -> int:
+    """
+    Выгрузка балансов всех кошельков (NDJSON или CSV) в stdout
+    или в файл --output.
+    """
+    output = args.output.open("wb") if args.output else sys.stdout.buffer
+    try:
+        async for chunk in stream_export(
+            session_factory,
+            args.format,
+            compress=args.gzip,
+            chunk_size=args.chunk_size,
+        ):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        else:
+            output.flush()
+    return 0
+
+
+async def partitions_create(args: argparse.Namespace) -> int:
+    """
+    Создание недостающих секций: текущей и --ahead следующих.
+    """
+    today = datetime.now(timezone.utc).date()
+    async with primary_engine().begin() as conn:
+        await lock_partitions(conn)
+        for table in args.tables:
+            scheme = PARTITIONED_TABLES[table]
+            ahead = scheme.ahead if args.ahead is None else args.ahead
+            for name in await create_partitions(conn, scheme, ahead, today):
+                print(f"created {name}")
+    return 0
+
+
+async def partitions_detach(args: argparse.Namespace) -> int:
+    """
+    Отсоединение (и при --drop удаление) секций старше --before,
+    а без --before - старше срока хранения таблицы.
+    """
+    now = datetime.now(timezone.utc)
+    async with primary_engine().connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in args.tables:
+            scheme = PARTITIONED_TABLES[table]
+            before = args.before or scheme.expired_before(now)
+            if before is None:
+                continue
+            for name in await detach_partitions(conn, scheme, before, args.drop):
+                print(f"detached {name}")
+    return 0
+
+
+async def shards_set(args: argparse.Namespace) -> int:
+    """
+    Включение, изменение числа шардов и выключение шардирования кошелька.
+    """
+    async with session_factory() as session:
+        try:
+            balance = await set_shards(session, args.wallet_uuid, args.shards)
+        except WalletNotFound:
+            print(f"Wallet {args.wallet_uuid} not found", file=sys.stderr)
+            return 1
+    print(f"{args.wallet_uuid}: shards={args.shards} balance={balance}")
+    return 0
+
+
+async def trigger_set(args: argparse.Namespace) -> int:
+    """
+    Установка или снятие триггера для всей базы.
+    """
+    trigger = TRIGGERS[args.command]
+    async with primary_engine().begin() as conn:
+        changed = await set_trigger(conn, trigger, args.enabled)
+    state = "enabled" if args.enabled else "disabled"
+    print(f"{trigger.name}: {state}" + ("" if changed else " (unchanged)"))
+    return 0
+
+
+async def _run(args: argparse.Namespace) -> int:
+    try:
+        return await args.handler(args)
+    finally:
+        await dispose_engines()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Wallet service CLI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bulk = commands.add_parser("bulk-create", help=bulk_create.__doc__)
+    bulk.add_argument("path", type=Path)
+    bulk.add_argument("--format", type=BulkFormat, choices=list(BulkFormat))
+    bulk.add_argument("--chunk-size", type=int, default=10_000)
+    bulk.set_defaults(handler=bulk_create)
+
+    exporting = commands.add_parser("export", help=export.__doc__)
+    exporting.add_argument(
+        "--format",
+        type=ExportFormat,
+        choices=list(ExportFormat),
+        default=ExportFormat.NDJSON,
+    )
+    exporting.add_argument("--gzip", action="store_true")
+    exporting.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    exporting.add_argument("--output", "-o", type=Path)
+    exporting.set_defaults(handler=export)
+
+    partitions = commands.add_parser("partitions", help="Partition maintenance")
+    partition_commands = partitions.add_subparsers(dest="action", required=True)
+    create = partition_commands.add_parser("create", help=partitions_create.__doc__)
+    create.add_argument("--ahead", type=int)
+    create.set_defaults(handler=partitions_create)
+    detach = partition_commands.add_parser("detach", help=partitions_detach.__doc__)
+    detach.add_argument("--before", type=date.fromisoformat)
+    detach.add_argument("--drop", action="store_true")
+    detach.set_defaults(handler=partitions_detach)
+    for command in (create, detach):
+        command.add_argument(
+            "--table",
+            dest="tables",
+            action="append",
+            choices=list(PARTITIONED_TABLES),
+        )
+
+    shards = commands.add_parser("shards", help="Sharded wallet balances")
+    shard_commands = shards.add_subparsers(dest="action", required=True)
+    enable = shard_commands.add_parser("enable", help=shards_set.__doc__)
+    enable.add_argument("wallet_uuid", type=UUID)
+    enable.add_argument("--shards", type=int, default=16, metavar=f"1..{MAX_SHARDS}")
+    enable.set_defaults(handler=shards_set)
+    disable = shard_commands.add_parser("disable", help=shards_set.__doc__)
+    disable.add_argument("wallet_uuid", type=UUID)
+    disable.set_defaults(handler=shards_set, shards=0)
+
+    for feature, help_text in (
+        ("events", "Outbox trigger of the balance change stream"),
+        ("notify", "Balance change notifications for the cache listener"),
+    ):
+        trigger = commands.add_parser(feature, help=help_text)
+        trigger_commands = trigger.add_subparsers(dest="action", required=True)
+        for action, enabled in (("enable", True), ("disable", False)):
+            command = trigger_commands.add_parser(action, help=trigger_set.__doc__)
+            command.set_defaults(handler=trigger_set, enabled=enabled)
+
+    args = parser.parse_args()
+    if args.command == "shards" and args.action == "enable":
+        if not 1 <= args.shards <= MAX_SHARDS:
+            parser.error(f"--shards must be between 1 and {MAX_SHARDS}")
+    if args.command == "partitions" and not args.tables:
+        args.tables = list(PARTITIONED_TABLES)
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,4 +8,8 @@ alembic upgrade head
 
 echo "Successfully alembic migrations"
 
+echo "Create upcoming table partitions"
+
+python cli.py partitions create
+
 exec "$@"
\ No newline at end of file
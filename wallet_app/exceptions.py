@@ -4,3 +4,22 @@ class WalletNotFound(Exception):
 
 class NotEnoughBalanceError(Exception):
     pass
+
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+
+class WalletVersionMismatch(Exception):
+    pass
+
+
+class Overloaded(Exception):
+    """
+    Операция не допущена к выполнению: очередь переполнена
+    или ожидание в ней истекло.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
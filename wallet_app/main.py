@@ -1,5 +1,104 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from api import router as api_router
-from fastapi import FastAPI
+from api.v1.wallets.dependecies import REPOSITORIES, balance_cache, event_relay
+from api.v1.wallets.notify import BalanceListener
+from api.v1.wallets.warmup import warm_up_pool
+from config import settings
+from fastapi import FastAPI, Response
+from metrics import MetricsMiddleware, instrument_engine, metrics_response
+from models.db import (
+    dispose_engines,
+    engines,
+    primary_engine,
+    replica_router,
+    session_factory,
+)
+from models.partitions import PartitionMaintainer
+from models.triggers import require_trigger
+from sqlalchemy.exc import SQLAlchemyError
+
+log = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запуск процесса: engine создаются и прогреваются до приема запросов,
+    затем запускаются создание секций наперед, слушатель изменений
+    балансов для кэша, если кэш включен (нужен триггер
+    `cli.py notify enable`), и ретранслятор событий, если
+    включен поток событий (если триггер outbox не выключен командой
+    `cli.py events disable`, иначе старт прерывается), и только после
+    этого /ready отвечает 200.
+    Остановка (uvicorn по SIGTERM сначала дожидается текущих запросов):
+    /ready снова 503, ретранслятор закрывает потоки SSE, слушатель
+    и создание секций останавливаются, пулы закрываются.
+    """
+    app.state.ready = False
+    for engine in engines().values():
+        instrument_engine(engine)
+    started = time.perf_counter()
+    connections = settings.db.warmup_connections
+    if connections is None:
+        connections = settings.db.pool_size
+    connections = min(connections, settings.db.pool_size)
+    repository = REPOSITORIES[settings.repository]
+    await warm_up_pool(session_factory, connections, repository)
+    for index, replica in enumerate(replica_router.replicas):
+        # Недоступная реплика не мешает старту: ReplicaRouter
+        # и так пропускает ее до восстановления.
+        try:
+            await warm_up_pool(replica, connections, repository, operations=False)
+        except (OSError, SQLAlchemyError):
+            log.warning("Replica %d warmup failed", index, exc_info=True)
+    log.info(
+        "Warmed up %d connection(s) per pool in %.3fs",
+        connections,
+        time.perf_counter() - started,
+    )
+    maintainer = None
+    if settings.partitions.enabled:
+        maintainer = PartitionMaintainer(
+            primary_engine, settings.partitions.check_interval
+        )
+        await maintainer.start()
+    listener = None
+    if balance_cache is not None and settings.cache.listen:
+        await require_trigger(primary_engine(), "notify")
+        listener = BalanceListener(settings.db.dsn, balance_cache)
+        await listener.start()
+    if event_relay is not None:
+        await require_trigger(primary_engine(), "events")
+        await event_relay.start()
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    if event_relay is not None:
+        await event_relay.stop()
+    if listener is not None:
+        await listener.stop()
+    if maintainer is not None:
+        await maintainer.stop()
+    await dispose_engines()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 app.include_router(api_router)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+
+@app.get("/ready", include_in_schema=False)
+async def ready() -> Response:
+    """
+    Проба готовности: 200 после прогрева пулов, 503 до него
+    и во время остановки.
+    """
+    return Response(status_code=200 if getattr(app.state, "ready", False) else 503)
@@ -0,0 +1,197 @@
+"""
+Метрики Prometheus: запросы по маршрутам, время в БД на запрос,
+исходы операций и отказы в допуске операций.
+
+Дочерние метрики с метками создаются один раз на маршрут и код ответа
+и дальше берутся из словаря, поэтому запрос не собирает метки заново.
+Маршрут - шаблон пути ("/api/v1/wallets/{wallet_uuid}"), а не сам путь,
+чтобы число рядов не росло с числом кошельков.
+
+Время в БД копится в contextvar запроса: для выражений SQLAlchemy -
+по событиям engine, для прямых вызовов asyncpg - через record_db_time.
+При нескольких воркерах uvicorn задайте PROMETHEUS_MULTIPROC_DIR,
+чтобы /metrics собирал метрики всех процессов.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+
+from fastapi import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+REQUESTS = Counter(
+    "wallet_http_requests_total",
+    "HTTP-запросы по маршрутам и кодам ответа.",
+    ["method", "route", "status"],
+)
+LATENCY = Histogram(
+    "wallet_http_request_duration_seconds",
+    "Время обработки HTTP-запроса.",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_TIME = Histogram(
+    "wallet_http_request_db_seconds",
+    "Время выполнения SQL за HTTP-запрос.",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "wallet_http_requests_in_flight",
+    "HTTP-запросы в обработке.",
+    multiprocess_mode="livesum",
+)
+OUTCOMES = Counter(
+    "wallet_operation_outcomes_total",
+    "Отказы по кошелькам: нет кошелька, недостаточно средств.",
+    ["outcome"],
+)
+WALLET_NOT_FOUND = OUTCOMES.labels("wallet_not_found")
+NOT_ENOUGH_BALANCE = OUTCOMES.labels("not_enough_balance")
+ADMISSION_QUEUED = Gauge(
+    "wallet_admission_queued",
+    "Операции, ожидающие допуска к выполнению.",
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "wallet_admission_rejected_total",
+    "Операции, отклоненные с 503: queue_full - очередь переполнена, "
+    "timeout - ожидание истекло.",
+    ["reason"],
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+_db_time: ContextVar[list[float] | None] = ContextVar("db_time", default=None)
+
+
+def record_db_time(started: float) -> None:
+    """
+    Добавить к времени в БД текущего запроса время с started
+    (time.perf_counter()); вне запроса ничего не делает.
+    :param started:
+    :return:
+    """
+    spent = _db_time.get()
+    if spent is not None:
+        spent[0] += time.perf_counter() - started
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Считать время выражений engine во время в БД текущего запроса.
+    :param engine:
+    :return:
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        record_db_time(conn.info.pop("query_started"))
+
+
+class _RouteMetrics:
+    __slots__ = ("method", "route", "latency", "db_time", "requests")
+
+    def __init__(self, route: str, method: str):
+        self.method = method
+        self.route = route
+        self.latency = LATENCY.labels(method, route)
+        self.db_time = DB_TIME.labels(method, route)
+        self.requests = {}
+
+    def observe(self, status: int, elapsed: float, db_time: float) -> None:
+        requests = self.requests.get(status)
+        if requests is None:
+            requests = self.requests[status] = REQUESTS.labels(
+                self.method, self.route, str(status)
+            )
+        requests.inc()
+        self.latency.observe(elapsed)
+        self.db_time.observe(db_time)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware метрик HTTP-запросов. Шаблон маршрута FastAPI
+    записывает в scope["route"] при маршрутизации, поэтому он известен
+    после обработки запроса.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: dict[tuple[str, str], _RouteMetrics] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        spent = [0.0]
+        token = _db_time.set(spent)
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            _db_time.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                key = (route.path, scope["method"])
+            else:
+                key = (UNMATCHED_ROUTE, "")
+            metrics = self._routes.get(key)
+            if metrics is None:
+                metrics = self._routes[key] = _RouteMetrics(*key)
+            metrics.observe(status, elapsed, spent[0])
+
+
+def metrics_response() -> Response:
+    """
+    Ответ /metrics в текстовом формате Prometheus.
+    :return:
+    """
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
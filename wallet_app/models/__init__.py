@@ -1,2 +1,6 @@
 from models.base import Base as Base
+from models.event import WalletEvent as WalletEvent
+from models.idempotency import IdempotencyKey as IdempotencyKey
+from models.operation import WalletOperation as WalletOperation
+from models.shard import WalletBalanceShard as WalletBalanceShard
 from models.wallet import Wallet as Wallet
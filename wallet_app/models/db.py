@@ -1,16 +1,179 @@
+import itertools
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from functools import partial
+
 from config import settings
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
 
-engine = create_async_engine(
-    url=settings.db.url,
-    echo=settings.db.echo,
-)
+from models.pool import MeteredQueuePool
+
+# Engine создаются при первом обращении, а не при импорте: импорт
+# моделей (alembic, cli, тесты) не требует настроек пула, а процесс
+# приложения создает и прогревает их в lifespan (см. main.py).
+_engines: dict[str, AsyncEngine] = {}
+
+
+class LazyBindSession(Session):
+    """
+    Сессия, которая получает engine из engine_factory при первом
+    обращении к БД, а не при создании фабрики сессий.
+    """
+
+    def __init__(self, *args, engine_factory: Callable[[], AsyncEngine], **kwargs):
+        super().__init__(*args, **kwargs)
+        self.engine_factory = engine_factory
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        return self.engine_factory().sync_engine
+
+
+def lazy_sessionmaker(
+    engine_factory: Callable[[], AsyncEngine], **kwargs
+) -> async_sessionmaker:
+    """
+    :param engine_factory: Возвращает engine сессий.
+    :param kwargs: Параметры сессий.
+    :return: Фабрика сессий, engine которой создается при первом запросе.
+    """
+    return async_sessionmaker(
+        sync_session_class=LazyBindSession,
+        engine_factory=engine_factory,
+        expire_on_commit=False,
+        autocommit=False,
+        **kwargs,
+    )
+
+
+def primary_engine() -> AsyncEngine:
+    """
+    :return: Engine primary, при первом вызове - новый.
+    """
+    if "primary" not in _engines:
+        _engines["primary"] = create_async_engine(
+            url=settings.db.url,
+            echo=settings.db.echo,
+            poolclass=MeteredQueuePool,
+            **settings.db.engine_options,
+        )
+    return _engines["primary"]
+
+
+session_factory = lazy_sessionmaker(primary_engine)
 
-session_factory = async_sessionmaker(
-    bind=engine,
-    expire_on_commit=False,
-    autocommit=False,
+
+class ReplicaRouter:
+    """
+    Сессии для чтения с реплик по кругу (round-robin).
+    Реплика, к которой не удалось подключиться, пропускается
+    retry_after секунд; если доступных реплик нет, сессия
+    открывается на primary.
+    Сессии реплик помечены session.info["replica"] = True: их данные
+    могут отставать от primary.
+    """
+
+    def __init__(
+        self,
+        replicas: list[async_sessionmaker],
+        primary: async_sessionmaker,
+        retry_after: float,
+    ):
+        self.replicas = replicas
+        self.primary = primary
+        self.retry_after = retry_after
+        self._down_until = [0.0] * len(replicas)
+        self._turn = itertools.count()
+
+    def _candidates(self) -> list[int]:
+        if not self.replicas:
+            return []
+        start = next(self._turn) % len(self.replicas)
+        now = time.monotonic()
+        order = [
+            (start + shift) % len(self.replicas) for shift in range(len(self.replicas))
+        ]
+        return [index for index in order if self._down_until[index] <= now]
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Сессия на следующей доступной реплике либо на primary.
+        Соединение берется сразу, чтобы недоступность реплики
+        обнаружилась до запроса, а не в его середине.
+        :return:
+        """
+        for index in self._candidates():
+            async with self.replicas[index]() as session:
+                try:
+                    await session.connection()
+                except (OSError, SQLAlchemyError):
+                    self._down_until[index] = time.monotonic() + self.retry_after
+                    continue
+                yield session
+                return
+        async with self.primary() as session:
+            yield session
+
+
+def replica_engine(index: int) -> AsyncEngine:
+    """
+    Engine реплики: соединение проверяется перед выдачей, а подключение
+    ограничено replica_connect_timeout, чтобы недоступная реплика
+    быстро уступала следующей.
+    :param index: Номер реплики в settings.db.replicas.
+    :return: Engine реплики, при первом вызове - новый.
+    """
+    name = f"replica-{index}"
+    if name not in _engines:
+        options = settings.db.engine_options
+        options["pool_pre_ping"] = True
+        options["connect_args"]["timeout"] = settings.db.replica_connect_timeout
+        _engines[name] = create_async_engine(
+            url=settings.db.replica_urls[index],
+            echo=settings.db.echo,
+            poolclass=MeteredQueuePool,
+            **options,
+        )
+    return _engines[name]
+
+
+replica_router = ReplicaRouter(
+    [
+        lazy_sessionmaker(partial(replica_engine, index), info={"replica": True})
+        for index in range(len(settings.db.replica_urls))
+    ],
+    primary=session_factory,
+    retry_after=settings.db.replica_retry_after,
 )
+
+
+def engines() -> dict[str, AsyncEngine]:
+    """
+    :return: Engine primary и реплик по именам для метрик пулов;
+    еще не созданные создаются.
+    """
+    return {
+        "primary": primary_engine(),
+        **{
+            f"replica-{index}": replica_engine(index)
+            for index in range(len(settings.db.replica_urls))
+        },
+    }
+
+
+async def dispose_engines() -> None:
+    """
+    Закрытие пулов всех созданных engine: свободные соединения
+    закрываются сразу. Следующее обращение создаст engine заново.
+    """
+    while _engines:
+        _, engine = _engines.popitem()
+        await engine.dispose()
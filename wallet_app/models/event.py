@@ -0,0 +1,47 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import BigInteger, DateTime, Enum, Identity, Index, func, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base
+from models.money import MinorUnits
+
+
+class WalletEvent(Base):
+    """
+    Outbox событий изменения балансов для потока SSE.
+    Строки пишет триггер wallet_operations_outbox на каждую запись
+    журнала операций, в той же транзакции. txid - номер транзакции,
+    записавшей событие; позиция события в потоке - (txid, id).
+    Таблица секционирована по created_at посуточно (см. models.partitions),
+    события старше срока хранения отсоединяются целиком секциями.
+    """
+
+    __tablename__ = "wallet_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+    )
+    txid: Mapped[int] = mapped_column(
+        BigInteger,
+        server_default=text("pg_current_xact_id()::text::bigint"),
+    )
+    operation_id: Mapped[int] = mapped_column(BigInteger)
+    wallet_uuid: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True))
+    operation_type: Mapped[OperationTypeSchema] = mapped_column(
+        Enum(OperationTypeSchema, native_enum=False, length=16),
+    )
+    amount: Mapped[Decimal] = mapped_column(MinorUnits)
+    balance: Mapped[Decimal] = mapped_column(MinorUnits)
+
+    __table_args__ = (
+        Index("ix_wallet_events_position", txid, id),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
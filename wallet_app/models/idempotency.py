@@ -0,0 +1,46 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from schemas.operation import OperationStatusSchema, OperationTypeSchema
+from sqlalchemy import BigInteger, DateTime, Enum, String, func
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base
+from models.money import MinorUnits
+
+
+class IdempotencyKey(Base):
+    """
+    Ключи идемпотентности операций с сохраненным результатом.
+    Запись добавляется в той же транзакции, что и изменение баланса.
+    Таблица секционирована по created_at посуточно: ключи старше TTL
+    удаляются целиком секциями (см. models.partitions), а не DELETE.
+    Первичный ключ (key, created_at) служит индексом для поиска ключа;
+    уникальность key между секциями обеспечивает advisory-блокировка
+    по ключу в WalletCRUD.operation.
+    version - версия кошелька после операции, чтобы повтор отдавал
+    тот же ETag (None у шардированного кошелька и у ключей, сохраненных
+    до ее появления).
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+    )
+    wallet_uuid: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True))
+    operation_type: Mapped[OperationTypeSchema] = mapped_column(
+        Enum(OperationTypeSchema, native_enum=False, length=16),
+    )
+    amount: Mapped[Decimal] = mapped_column(MinorUnits)
+    status: Mapped[OperationStatusSchema] = mapped_column(
+        Enum(OperationStatusSchema, native_enum=False, length=32),
+    )
+    balance: Mapped[Decimal | None] = mapped_column(MinorUnits)
+    version: Mapped[int | None] = mapped_column(BigInteger)
@@ -0,0 +1,62 @@
+"""
+Денежные суммы в БД хранятся целым числом минимальных единиц (копеек)
+в BIGINT: арифметика над балансами в PostgreSQL - целочисленная, а не
+numeric, и драйвер декодирует int8 вместо numeric.
+
+Приложение и API по-прежнему работают с Decimal с двумя знаками после
+запятой; перевод точный и происходит только на границе с БД - в типе
+колонок MinorUnits и в явных вызовах to_minor/from_minor там, где SQL
+выполняется прямо на asyncpg.
+"""
+
+from decimal import Decimal
+
+from sqlalchemy import BigInteger
+from sqlalchemy.sql import operators
+from sqlalchemy.types import TypeDecorator
+
+SCALE = 2
+
+
+def to_minor(amount: Decimal | int) -> int:
+    """
+    :param amount: Сумма, не больше двух знаков после запятой.
+    :return: Сумма в минимальных единицах.
+    :raises ValueError: У суммы больше двух знаков после запятой.
+    """
+    minor = Decimal(amount).scaleb(SCALE)
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{amount} has more than {SCALE} decimal places")
+    return int(minor)
+
+
+def from_minor(minor: int) -> Decimal:
+    """
+    :param minor: Сумма в минимальных единицах.
+    :return: Сумма с двумя знаками после запятой.
+    """
+    return Decimal(minor).scaleb(-SCALE)
+
+
+class MinorUnits(TypeDecorator):
+    """
+    Колонка BIGINT с суммой в минимальных единицах, в Python - Decimal.
+    Сумма и разность таких колонок (и колонки с параметром) остаются
+    MinorUnits, поэтому результат выражений вроде balance + :amount
+    тоже приходит в Decimal.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    class comparator_factory(TypeDecorator.Comparator, BigInteger.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            if op in (operators.add, operators.sub, operators.neg):
+                return op, self.type
+            return super()._adapt_expression(op, other_comparator)
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_minor(value)
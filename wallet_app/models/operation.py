@@ -0,0 +1,48 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import BigInteger, DateTime, Enum, Identity, Index, func
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base
+from models.money import MinorUnits
+
+
+class WalletOperation(Base):
+    """
+    Журнал операций над кошельками, только на добавление.
+    Таблица секционирована по created_at помесячно (см. models.partitions),
+    старые секции отсоединяются целиком вместо DELETE.
+    balance - баланс кошелька сразу после операции.
+    Индекс ix_wallet_operations_history покрывает чтение истории
+    кошелька от новых к старым без обращения к самой таблице.
+    """
+
+    __tablename__ = "wallet_operations"
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+    )
+    wallet_uuid: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True))
+    operation_type: Mapped[OperationTypeSchema] = mapped_column(
+        Enum(OperationTypeSchema, native_enum=False, length=16),
+    )
+    amount: Mapped[Decimal] = mapped_column(MinorUnits)
+    balance: Mapped[Decimal] = mapped_column(MinorUnits)
+
+    __table_args__ = (
+        Index(
+            "ix_wallet_operations_history",
+            wallet_uuid,
+            created_at.desc(),
+            id.desc(),
+            postgresql_include=["operation_type", "amount", "balance"],
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
@@ -0,0 +1,272 @@
+"""
+Обслуживание секционированных по времени таблиц.
+
+Секции создаются заранее: entrypoint.sh при старте контейнера
+(`python cli.py partitions create`) и PartitionMaintainer в каждом
+процессе приложения, пока он работает. Старые секции отсоединяются
+через DETACH PARTITION ... CONCURRENTLY: это не блокирует запись
+в таблицу и не порождает огромный DELETE. У таблиц нет секции DEFAULT,
+иначе CONCURRENTLY недоступен, поэтому запись в таблицу без секции
+на текущую дату завершается ошибкой - секции должны опережать время.
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+from config import settings
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+log = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки: секции создает один процесс за раз.
+MAINTENANCE_LOCK = 0x7061727469  # "parti"
+# CREATE TABLE ... PARTITION OF блокирует родительскую таблицу; без
+# lock_timeout ожидание за долгой транзакцией остановило бы всю запись.
+LOCK_TIMEOUT = "5s"
+
+
+@dataclass(frozen=True)
+class PartitionScheme:
+    """
+    Схема секционирования таблицы по диапазонам времени.
+    step - "month" или "day", секция называется <table>_p<YYYYMM[DD]>.
+    ahead - сколько секций создавать наперед по умолчанию.
+    retention - срок хранения: секции, целиком старше него, можно
+    отсоединять без явной границы. None - хранить, пока не указана граница.
+    """
+
+    table: str
+    step: str
+    ahead: int = 3
+    retention: timedelta | None = None
+
+    def start_of(self, day: date) -> date:
+        return day.replace(day=1) if self.step == "month" else day
+
+    def next_start(self, start: date) -> date:
+        if self.step == "day":
+            return start + timedelta(days=1)
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    def name(self, start: date) -> str:
+        fmt = "%Y%m" if self.step == "month" else "%Y%m%d"
+        return f"{self.table}_p{start.strftime(fmt)}"
+
+    def parse(self, name: str) -> date | None:
+        suffix = name.removeprefix(f"{self.table}_p")
+        if suffix == name or not suffix.isdigit():
+            return None
+        if self.step == "month" and len(suffix) == 6:
+            return date(int(suffix[:4]), int(suffix[4:]), 1)
+        if self.step == "day" and len(suffix) == 8:
+            return date(int(suffix[:4]), int(suffix[4:6]), int(suffix[6:]))
+        return None
+
+    def expired_before(self, now: datetime) -> date | None:
+        """
+        Граница для detach_partitions по сроку хранения.
+        :param now:
+        :return: Секции, кончающиеся не позже этой даты, старше retention.
+        """
+        if self.retention is None:
+            return None
+        return (now - self.retention).astimezone(timezone.utc).date()
+
+
+PARTITIONED_TABLES = {
+    "wallet_operations": PartitionScheme("wallet_operations", "month"),
+    "idempotency_keys": PartitionScheme(
+        "idempotency_keys",
+        "day",
+        ahead=7,
+        retention=settings.idempotency.ttl,
+    ),
+    "wallet_events": PartitionScheme(
+        "wallet_events",
+        "day",
+        ahead=7,
+        retention=settings.events.retention,
+    ),
+}
+
+
+def create_partition_sql(scheme: PartitionScheme, start: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {scheme.name(start)} "
+        f"PARTITION OF {scheme.table} "
+        f"FOR VALUES FROM ('{start} 00:00:00+00') "
+        f"TO ('{scheme.next_start(start)} 00:00:00+00')"
+    )
+
+
+async def list_partitions(
+    conn: AsyncConnection,
+    scheme: PartitionScheme,
+) -> dict[date, str]:
+    """
+    Подключенные секции таблицы.
+    :param conn:
+    :param scheme:
+    :return: Начало диапазона секции -> имя секции.
+    """
+    rows = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ),
+        {"table": scheme.table},
+    )
+    partitions = {}
+    for (name,) in rows:
+        start = scheme.parse(name)
+        if start is not None:
+            partitions[start] = name
+    return partitions
+
+
+async def create_partitions(
+    conn: AsyncConnection,
+    scheme: PartitionScheme,
+    ahead: int,
+    today: date,
+) -> list[str]:
+    """
+    Создать недостающие секции: текущую и ahead следующих.
+    :param conn:
+    :param scheme:
+    :param ahead: Сколько секций создать наперед.
+    :param today:
+    :return: Имена созданных секций.
+    """
+    existing = await list_partitions(conn, scheme)
+    created = []
+    start = scheme.start_of(today)
+    for _ in range(ahead + 1):
+        if start not in existing:
+            await conn.execute(text(create_partition_sql(scheme, start)))
+            created.append(scheme.name(start))
+        start = scheme.next_start(start)
+    return created
+
+
+async def lock_partitions(conn: AsyncConnection, wait: bool = True) -> bool:
+    """
+    Advisory-блокировка создания секций до конца транзакции conn:
+    одновременные CREATE TABLE IF NOT EXISTS одной секции из разных
+    процессов падают на уникальности имени в каталоге.
+    :param conn:
+    :param wait: Ждать блокировку, а не сразу вернуть False.
+    :return: Взята ли блокировка.
+    """
+    if wait:
+        await conn.execute(select(func.pg_advisory_xact_lock(MAINTENANCE_LOCK)))
+        return True
+    return await conn.scalar(select(func.pg_try_advisory_xact_lock(MAINTENANCE_LOCK)))
+
+
+async def detach_partitions(
+    conn: AsyncConnection,
+    scheme: PartitionScheme,
+    before: date,
+    drop: bool = False,
+) -> list[str]:
+    """
+    Отсоединить секции, целиком лежащие раньше before.
+    Соединение должно быть в режиме AUTOCOMMIT: DETACH ... CONCURRENTLY
+    нельзя выполнять внутри транзакции.
+    :param conn:
+    :param scheme:
+    :param before: Граница хранения.
+    :param drop: Удалить отсоединенные секции, а не оставить для архива.
+    :return: Имена отсоединенных секций.
+    """
+    detached = []
+    for start, name in sorted((await list_partitions(conn, scheme)).items()):
+        if scheme.next_start(start) > before:
+            continue
+        await conn.execute(
+            text(f"ALTER TABLE {scheme.table} DETACH PARTITION {name} CONCURRENTLY")
+        )
+        if drop:
+            await conn.execute(text(f"DROP TABLE {name}"))
+        detached.append(name)
+    return detached
+
+
+class PartitionMaintainer:
+    """
+    Создание недостающих секций наперед из самого приложения: при старте
+    и затем раз в interval секунд, чтобы долго работающий процесс
+    не зависел от внешнего cron. Каждой таблице создается текущая секция
+    и ahead следующих по ее схеме. Из нескольких процессов работу делает
+    тот, кто первым взял advisory-блокировку, остальные пропускают
+    проверку. Неудача (например, lock_timeout) только пишется в лог:
+    секции создаются с запасом, и следующая проверка повторит попытку.
+    """
+
+    def __init__(
+        self,
+        engine: Callable[[], AsyncEngine],
+        interval: float,
+        schemes: Iterable[PartitionScheme] = PARTITIONED_TABLES.values(),
+    ):
+        self.engine = engine
+        self.interval = interval
+        self.schemes = list(schemes)
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """
+        Проверить секции сейчас и запустить периодическую проверку.
+        :return:
+        """
+        await self._check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._check()
+
+    async def _check(self) -> None:
+        try:
+            created = await self.run_once()
+        except Exception:
+            log.exception("Partition maintenance failed")
+            return
+        if created:
+            log.info("Created partitions: %s", ", ".join(created))
+
+    async def run_once(self, today: date | None = None) -> list[str] | None:
+        """
+        Создать недостающие секции всех таблиц.
+        :param today: Дата, от которой считаются секции (по умолчанию -
+        сегодня по UTC).
+        :return: Имена созданных секций или None, если проверку
+        выполняет другой процесс.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        async with self.engine().begin() as conn:
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            if not await lock_partitions(conn, wait=False):
+                return None
+            created = []
+            for scheme in self.schemes:
+                created += await create_partitions(conn, scheme, scheme.ahead, today)
+        return created
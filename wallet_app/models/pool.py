@@ -0,0 +1,95 @@
+"""
+Пул соединений с метриками ожидания.
+
+QueuePool сам по себе показывает только текущее состояние (сколько
+соединений выдано, сколько сверх pool_size). Чтобы видеть, сколько
+запросы ждут соединение под нагрузкой, MeteredQueuePool замеряет
+каждое получение соединения из пула и копит гистограмму времени
+ожидания, число выдач сверх pool_size и таймаутов.
+"""
+
+import time
+from bisect import bisect_left
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Верхние границы корзин гистограммы ожидания, секунды.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolMetrics:
+    """
+    Счетчики пула с момента его создания.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.wait_sum = 0.0
+        self._wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe(self, wait: float, overflow: bool) -> None:
+        """
+        :param wait: Сколько секунд ждали соединение.
+        :param overflow: Соединение открыто сверх pool_size.
+        :return:
+        """
+        self.checkouts += 1
+        self.overflow_checkouts += overflow
+        self.wait_sum += wait
+        self._wait_counts[bisect_left(WAIT_BUCKETS, wait)] += 1
+
+    def wait_histogram(self) -> dict[str, int]:
+        """
+        :return: Накопительная гистограмма ожидания в стиле Prometheus:
+        граница корзины ("le") -> число ожиданий не дольше нее.
+        """
+        histogram = {}
+        total = 0
+        for bound, count in zip((*WAIT_BUCKETS, "+Inf"), self._wait_counts):
+            total += count
+            histogram[str(bound)] = total
+        return histogram
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool, замеряющий получение соединений.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        before = self._overflow
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        self.metrics.observe(
+            time.perf_counter() - start,
+            overflow=self._overflow > max(before, 0),
+        )
+        return conn
+
+    def stats(self) -> dict:
+        """
+        :return: Текущее состояние пула и накопленные счетчики.
+        """
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.metrics.checkouts,
+            "overflow_checkouts": self.metrics.overflow_checkouts,
+            "timeouts": self.metrics.timeouts,
+            "wait_seconds_sum": self.metrics.wait_sum,
+            "wait_seconds": self.metrics.wait_histogram(),
+        }
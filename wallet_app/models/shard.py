@@ -0,0 +1,30 @@
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import SmallInteger
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base
+from models.money import MinorUnits
+
+
+class WalletBalanceShard(Base):
+    """
+    Часть баланса шардированного кошелька.
+    Баланс такого кошелька - сумма его шардов (wallets.balance держится
+    равным нулю), поэтому параллельные операции меняют разные строки
+    и не ждут одну блокировку.
+    """
+
+    __tablename__ = "wallet_balance_shards"
+
+    wallet_uuid: Mapped[UUID] = mapped_column(
+        PG_UUID(as_uuid=True),
+        primary_key=True,
+    )
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    balance: Mapped[Decimal] = mapped_column(
+        MinorUnits,
+        default=Decimal("0.00"),
+    )
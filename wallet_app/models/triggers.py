@@ -0,0 +1,113 @@
+"""
+Триггеры, которые включаются и выключаются для всей базы.
+
+Состояние по умолчанию задают миграции: outbox событий стоит,
+NOTIFY для кэша - нет. Меняется оно только явной командой
+(`python cli.py events|notify enable|disable`), а не при старте
+процесса: настройки одного процесса не должны менять схему для всех
+остальных.
+CREATE/DROP TRIGGER блокирует запись в таблицу, поэтому выполняется
+под lock_timeout и только когда состояние действительно меняется.
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# Без lock_timeout ожидание за долгой транзакцией остановило бы
+# всю запись в таблицу.
+LOCK_TIMEOUT = "5s"
+
+
+@dataclass(frozen=True)
+class Trigger:
+    """
+    Переключаемый триггер.
+    definition - все после "CREATE OR REPLACE TRIGGER <name>".
+    """
+
+    name: str
+    table: str
+    definition: str
+
+    def create_sql(self) -> str:
+        return f"CREATE OR REPLACE TRIGGER {self.name} {self.definition}"
+
+    def drop_sql(self) -> str:
+        return f"DROP TRIGGER IF EXISTS {self.name} ON {self.table}"
+
+
+TRIGGERS = {
+    # Outbox потока событий (api/v1/wallets/events.py). Триггер
+    # на выражение, а не на строку: пакет операций пишет события
+    # одним INSERT ... SELECT в порядке журнала.
+    "events": Trigger(
+        "wallet_operations_outbox",
+        "wallet_operations",
+        "AFTER INSERT ON wallet_operations "
+        "REFERENCING NEW TABLE AS new_operations "
+        "FOR EACH STATEMENT "
+        "EXECUTE FUNCTION write_wallet_events()",
+    ),
+    # Уведомления об изменении балансов для BalanceListener
+    # (api/v1/wallets/notify.py). NOTIFY берет при фиксации
+    # глобальную блокировку очереди уведомлений и выстраивает
+    # в очередь фиксации всех пишущих транзакций базы, поэтому
+    # ставится, только если кэш слушает изменения.
+    "notify": Trigger(
+        "wallets_notify_balance",
+        "wallets",
+        "AFTER UPDATE OF balance, shards ON wallets "
+        "FOR EACH ROW "
+        "WHEN (OLD.balance IS DISTINCT FROM NEW.balance "
+        "OR OLD.shards IS DISTINCT FROM NEW.shards) "
+        "EXECUTE FUNCTION notify_wallet_balance()",
+    ),
+}
+
+
+async def trigger_installed(conn: AsyncConnection, trigger: Trigger) -> bool:
+    return await conn.scalar(
+        text(
+            "SELECT EXISTS (SELECT FROM pg_trigger "
+            "WHERE tgrelid = CAST(:table AS regclass) AND tgname = :name)"
+        ),
+        {"table": trigger.table, "name": trigger.name},
+    )
+
+
+async def set_trigger(
+    conn: AsyncConnection,
+    trigger: Trigger,
+    enabled: bool,
+) -> bool:
+    """
+    Поставить или снять триггер в транзакции conn.
+    :param conn:
+    :param trigger:
+    :param enabled:
+    :return: Изменилось ли состояние триггера.
+    """
+    if await trigger_installed(conn, trigger) == enabled:
+        return False
+    await conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    await conn.execute(text(trigger.create_sql() if enabled else trigger.drop_sql()))
+    return True
+
+
+async def require_trigger(engine: AsyncEngine, feature: str) -> None:
+    """
+    Проверка при старте функции, которой нужен триггер: без него она
+    молча отдавала бы неполные данные.
+    :param engine:
+    :param feature: Ключ TRIGGERS.
+    :return:
+    """
+    trigger = TRIGGERS[feature]
+    async with engine.connect() as conn:
+        if not await trigger_installed(conn, trigger):
+            raise RuntimeError(
+                f"Trigger {trigger.name} is not installed: "
+                f"run `python cli.py {feature} enable`"
+            )
@@ -1,14 +1,24 @@
 from decimal import Decimal
 from uuid import UUID, uuid4
 
-from sqlalchemy import Numeric
+from sqlalchemy import BigInteger, SmallInteger
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
 from models import Base
+from models.money import MinorUnits
 
 
 class Wallet(Base):
+    """
+    Кошелек. shards > 0 - баланс разнесен по wallet_balance_shards
+    (см. api.v1.wallets.shards), а balance равен нулю.
+    Суммы хранятся в минимальных единицах (см. models.money).
+    version увеличивается при каждом изменении строки и отдается
+    клиентам как ETag; у шардированного кошелька баланс меняется
+    в шардах, поэтому его версия не отражает баланс.
+    """
+
     __tablename__ = "wallets"
     uuid: Mapped[UUID] = mapped_column(
         PG_UUID(as_uuid=True),
@@ -16,6 +26,16 @@ class Wallet(Base):
         default=uuid4,
     )
     balance: Mapped[Decimal] = mapped_column(
-        Numeric(20, 2),
+        MinorUnits,
         default=Decimal("0.00"),
     )
+    shards: Mapped[int] = mapped_column(
+        SmallInteger,
+        default=0,
+        server_default="0",
+    )
+    version: Mapped[int] = mapped_column(
+        BigInteger,
+        default=1,
+        server_default="1",
+    )
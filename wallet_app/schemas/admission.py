@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+
+
+class AdmissionStatsSchema(BaseModel):
+    """
+    Схема счетчиков допуска операций текущего процесса.
+    """
+
+    enabled: bool
+    in_flight: int = 0
+    queued: int = 0
+    admitted: int = 0
+    rejected_queue_full: int = 0
+    rejected_timeout: int = 0
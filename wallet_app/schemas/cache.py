@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class CacheStatsSchema(BaseModel):
+    """
+    Схема счетчиков кэша балансов текущего процесса.
+    """
+
+    enabled: bool
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+
+class EventRelayStatsSchema(BaseModel):
+    """
+    Схема счетчиков ретранслятора событий текущего процесса.
+    position - id последнего разосланного события,
+    dropped - сколько подписчиков отключено из-за переполнения очереди.
+    """
+
+    enabled: bool
+    position: str | None = None
+    subscribers: int = 0
+    published: int = 0
+    dropped: int = 0
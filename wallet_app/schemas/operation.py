@@ -1,4 +1,11 @@
+from datetime import datetime
+from decimal import Decimal
 from enum import Enum
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+from schemas.wallet import Money, WalletReadSchema
 
 
 class OperationTypeSchema(str, Enum):
@@ -9,3 +16,89 @@ class OperationTypeSchema(str, Enum):
 
     DEPOSIT = "DEPOSIT"
     WITHDRAW = "WITHDRAW"
+
+
+class OperationStatusSchema(str, Enum):
+    """
+    Итог отдельной операции в пакетном запросе.
+    ROLLED_BACK - операция прошла бы, но пакет "все или ничего" отменен
+    из-за другой операции.
+    """
+
+    OK = "OK"
+    WALLET_NOT_FOUND = "WALLET_NOT_FOUND"
+    NOT_ENOUGH_BALANCE = "NOT_ENOUGH_BALANCE"
+    ROLLED_BACK = "ROLLED_BACK"
+
+
+class OperationSchema(BaseModel):
+    """
+    Схема одной операции в пакетном запросе.
+    """
+
+    wallet_uuid: UUID
+    operation_type: OperationTypeSchema
+    amount: Money = Field(gt=0)
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class OperationResultSchema(BaseModel):
+    """
+    Схема результата одной операции пакетного запроса.
+    balance - баланс кошелька сразу после операции, если она применена.
+    """
+
+    wallet_uuid: UUID
+    status: OperationStatusSchema
+    balance: Decimal | None = None
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class OperationHistoryItemSchema(BaseModel):
+    """
+    Схема записи журнала операций кошелька.
+    balance - баланс кошелька сразу после операции.
+    """
+
+    id: int
+    created_at: datetime
+    operation_type: OperationTypeSchema
+    amount: Decimal
+    balance: Decimal
+    model_config = ConfigDict(from_attributes=True)
+
+
+class OperationHistoryPageSchema(BaseModel):
+    """
+    Схема страницы истории операций, от новых к старым.
+    next_cursor - курсор следующей страницы, None на последней.
+    """
+
+    items: list[OperationHistoryItemSchema]
+    next_cursor: str | None = None
+
+
+class TransferSchema(BaseModel):
+    """
+    Схема перевода между кошельками.
+    """
+
+    from_wallet_uuid: UUID
+    to_wallet_uuid: UUID
+    amount: Money = Field(gt=0)
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    @model_validator(mode="after")
+    def _different_wallets(self) -> "TransferSchema":
+        if self.from_wallet_uuid == self.to_wallet_uuid:
+            raise ValueError("Кошельки перевода должны различаться")
+        return self
+
+
+class TransferResultSchema(BaseModel):
+    """
+    Схема результата перевода: балансы обоих кошельков после него.
+    """
+
+    from_wallet: WalletReadSchema
+    to_wallet: WalletReadSchema
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+
+class PoolStatsSchema(BaseModel):
+    """
+    Схема состояния и счетчиков пула соединений текущего процесса.
+    wait_seconds - накопительная гистограмма ожидания соединения:
+    граница корзины в секундах -> число ожиданий не дольше нее.
+    """
+
+    name: str
+    size: int
+    max_overflow: int
+    checked_out: int
+    idle: int
+    overflow: int
+    checkouts: int
+    overflow_checkouts: int
+    timeouts: int
+    wait_seconds_sum: float
+    wait_seconds: dict[str, int]
@@ -1,7 +1,21 @@
 from decimal import Decimal
+from typing import Annotated
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
+
+LOOKUP_MAX_WALLETS = 1000
+
+# Суммы хранятся в BIGINT минимальных единиц (см. models.money):
+# больше двух знаков после запятой не округляются, а отклоняются,
+# 18 цифр гарантированно помещаются в BIGINT.
+MONEY_MAX_DIGITS = 18
+MONEY_DECIMAL_PLACES = 2
+
+Money = Annotated[
+    Decimal,
+    Field(max_digits=MONEY_MAX_DIGITS, decimal_places=MONEY_DECIMAL_PLACES),
+]
 
 
 class WalletCreateSchema(BaseModel):
@@ -9,7 +23,7 @@ class WalletCreateSchema(BaseModel):
     Схема создания кошелька.
     """
 
-    balance: Decimal
+    balance: Money
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
@@ -30,3 +44,22 @@ class WalletReadBalanceSchema(BaseModel):
 
     balance: Decimal
     model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class WalletLookupSchema(BaseModel):
+    """
+    Схема запроса балансов нескольких кошельков.
+    """
+
+    uuids: list[UUID] = Field(min_length=1, max_length=LOOKUP_MAX_WALLETS)
+
+
+class WalletLookupResultSchema(BaseModel):
+    """
+    Схема балансов нескольких кошельков.
+    wallets - найденные кошельки в порядке запроса,
+    missing - uuid несуществующих кошельков.
+    """
+
+    wallets: list[WalletReadSchema]
+    missing: list[UUID]
@@ -4,10 +4,17 @@ from uuid import uuid4
 
 import pytest
 import pytest_asyncio
+from api.v1.wallets.crud import WalletCRUD
+from api.v1.wallets.dependecies import REPOSITORIES
 from api.v1.wallets.views import router as wallets_router
+from config import settings
 from fastapi import FastAPI
 from httpx import ASGITransport, AsyncClient
-from models.wallet import Wallet
+from models import Wallet, WalletBalanceShard, WalletEvent, WalletOperation
+from schemas.wallet import WalletCreateSchema
+from sqlalchemy import delete, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 
 @pytest.fixture(scope="session")
@@ -56,8 +63,12 @@ def mock_crud(wallet_factory):
     """
     crud = MagicMock()
     crud.get_by_uuid = AsyncMock()
+    crud.get_many = AsyncMock()
     crud.create = AsyncMock()
     crud.operation = AsyncMock()
+    crud.batch_operation = AsyncMock()
+    crud.transfer = AsyncMock()
+    crud.history = AsyncMock()
     return crud
 
 
@@ -78,14 +89,87 @@ def override_wallet_crud(mock_crud):
 @pytest_asyncio.fixture
 async def client(test_app, override_wallet_crud):
     """
-    Создание асинхронного клиента с подменой wallet_crud на мок.
+    Создание асинхронного клиента с подменой wallet_crud
+    и read_wallet_crud на мок.
     :param test_app:
     :param override_wallet_crud:
     :return:
     """
-    from api.v1.wallets.dependecies import wallet_crud
+    from api.v1.wallets.dependecies import read_wallet_crud, wallet_crud
 
     test_app.dependency_overrides[wallet_crud] = override_wallet_crud
+    test_app.dependency_overrides[read_wallet_crud] = override_wallet_crud
     transport = ASGITransport(app=test_app)
     async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
         yield ac
+
+
+@pytest.fixture(params=sorted(REPOSITORIES))
+def crud_cls(request):
+    """
+    Реализация WalletCRUD: тесты с БД проходят для каждой
+    из выбираемых настройкой repository.
+    :param request:
+    :return: Класс CRUD.
+    """
+    return REPOSITORIES[request.param]
+
+
+@pytest_asyncio.fixture
+async def pg_session_factory():
+    """
+    Фабрика сессий к реальной PostgreSQL из настроек приложения.
+    Нужна для тестов конкурентного доступа, которые нельзя проверить на моках.
+    Перед запуском к базе должны быть применены миграции alembic,
+    иначе (или если база недоступна) тест пропускается.
+    :return: async_sessionmaker, привязанный к отдельному engine
+    """
+    engine = create_async_engine(
+        url=settings.db.url,
+        pool_size=20,
+        max_overflow=0,
+        connect_args={"timeout": 2},
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1 FROM wallets LIMIT 1"))
+    except (OSError, SQLAlchemyError) as e:
+        await engine.dispose()
+        pytest.skip(f"PostgreSQL недоступна: {e}")
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def pg_wallet_factory(pg_session_factory):
+    """
+    Создание кошельков в реальной БД с удалением после теста
+    (вместе с их записями в журнале операций, событиями и шардами баланса).
+    :param pg_session_factory:
+    :return: Фабрика wallet
+    """
+    created = []
+
+    async def _factory(balance=Decimal("100.00")):
+        async with pg_session_factory() as session:
+            wallet = await WalletCRUD(session).create(
+                WalletCreateSchema(balance=balance)
+            )
+        created.append(wallet.uuid)
+        return wallet
+
+    yield _factory
+    async with pg_session_factory() as session:
+        await session.execute(delete(Wallet).where(Wallet.uuid.in_(created)))
+        await session.execute(
+            delete(WalletOperation).where(WalletOperation.wallet_uuid.in_(created))
+        )
+        await session.execute(
+            delete(WalletEvent).where(WalletEvent.wallet_uuid.in_(created))
+        )
+        await session.execute(
+            delete(WalletBalanceShard).where(
+                WalletBalanceShard.wallet_uuid.in_(created)
+            )
+        )
+        await session.commit()
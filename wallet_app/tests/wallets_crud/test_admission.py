@@ -0,0 +1,77 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.admission import AdmissionController
+from exceptions import Overloaded
+
+
+async def _hold(controller, wallet_uuid, release: asyncio.Event):
+    async with controller.admit(wallet_uuid):
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_admission_queue_full_and_timeout():
+    """
+    Сверх max_concurrency операция ждет в очереди не дольше
+    queue_timeout, а при полной очереди сразу получает отказ.
+    :return:
+    """
+    controller = AdmissionController(
+        max_concurrency=1, wallet_concurrency=0, max_queue=1, queue_timeout=0.05
+    )
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, uuid4(), release))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(_hold(controller, uuid4(), asyncio.Event()))
+    await asyncio.sleep(0)
+    assert controller.stats()["queued"] == 1
+
+    with pytest.raises(Overloaded) as e:
+        async with controller.admit(uuid4()):
+            pass
+    assert e.value.reason == "queue_full"
+    with pytest.raises(Overloaded) as e:
+        await waiting
+    assert e.value.reason == "timeout"
+
+    release.set()
+    await holder
+    async with controller.admit(uuid4()):
+        pass
+    assert controller.stats() == {
+        "in_flight": 0,
+        "queued": 0,
+        "admitted": 2,
+        "rejected_queue_full": 1,
+        "rejected_timeout": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_admission_per_wallet_limit():
+    """
+    Очередь к одному кошельку не занимает общие места: операции над
+    другими кошельками допускаются, пока "горячий" кошелек занят.
+    :return:
+    """
+    controller = AdmissionController(
+        max_concurrency=3, wallet_concurrency=1, max_queue=10, queue_timeout=1
+    )
+    hot = uuid4()
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(controller, hot, release))
+    await asyncio.sleep(0)
+    queued = [asyncio.create_task(_hold(controller, hot, release)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert controller.stats()["in_flight"] == 1
+    assert controller.stats()["queued"] == 3
+
+    async with controller.admit(uuid4()):
+        assert controller.stats()["in_flight"] == 2
+
+    release.set()
+    await asyncio.gather(holder, *queued)
+    assert controller.stats()["admitted"] == 5
+    assert controller._wallets == {}
@@ -0,0 +1,150 @@
+from decimal import Decimal
+from unittest.mock import patch
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.cache import MISSING, BalanceCache
+from exceptions import WalletNotFound
+from schemas.operation import OperationTypeSchema
+
+
+def test_cache_lru_eviction():
+    """
+    При переполнении вытесняется давно не читанная запись.
+    :return:
+    """
+    cache = BalanceCache(max_size=2, ttl=60, negative_ttl=1)
+    first, second, third = uuid4(), uuid4(), uuid4()
+    cache.set(first, Decimal("1.00"))
+    cache.set(second, Decimal("2.00"))
+    assert cache.get(first) == Decimal("1.00")
+    cache.set(third, Decimal("3.00"))
+    assert cache.get(second) is MISSING
+    assert cache.get(first) == Decimal("1.00")
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_cache_ttl_and_negative_entries():
+    """
+    Отрицательные записи живут negative_ttl, обычные - ttl.
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=10, negative_ttl=1)
+    known, unknown = uuid4(), uuid4()
+    with patch("api.v1.wallets.cache.time.monotonic", return_value=100.0):
+        cache.set(known, Decimal("5.00"))
+        cache.set(unknown, None)
+    with patch("api.v1.wallets.cache.time.monotonic", return_value=100.5):
+        assert cache.get(unknown) is None
+    with patch("api.v1.wallets.cache.time.monotonic", return_value=102.0):
+        assert cache.get(unknown) is MISSING
+        assert cache.get(known) == Decimal("5.00")
+    with patch("api.v1.wallets.cache.time.monotonic", return_value=111.0):
+        assert cache.get(known) is MISSING
+
+
+@pytest.mark.asyncio
+async def test_crud_writes_through_cache(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Операции обновляют кэш балансом после фиксации,
+    чтение после этого обходится без запроса в БД.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=60)
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    missing = uuid4()
+    async with pg_session_factory() as session:
+        crud = crud_cls(session, cache)
+        await crud.operation(wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("5.00"))
+        with pytest.raises(WalletNotFound):
+            await crud.operation(missing, OperationTypeSchema.DEPOSIT, Decimal("1.00"))
+    assert cache.get(wallet.uuid) == Decimal("15.00")
+
+    async with pg_session_factory() as session:
+        with patch.object(session, "get") as session_get:
+            crud = crud_cls(session, cache)
+            assert (await crud.get_by_uuid(wallet.uuid)).balance == Decimal("15.00")
+            assert await crud.get_by_uuid(missing) is None
+        session_get.assert_not_called()
+
+
+def test_cache_refresh_skips_older_versions():
+    """
+    Уведомление о более старой версии, пришедшее после сквозной записи,
+    не затирает ее; без версии запись обновляется как раньше.
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=1)
+    wallet_uuid = uuid4()
+    cache.set(wallet_uuid, Decimal("3.00"), version=3)
+    cache.refresh(wallet_uuid, Decimal("2.00"), version=2)
+    assert (cache.get(wallet_uuid), cache.version(wallet_uuid)) == (Decimal("3.00"), 3)
+    cache.refresh(wallet_uuid, Decimal("4.00"), version=4)
+    assert (cache.get(wallet_uuid), cache.version(wallet_uuid)) == (Decimal("4.00"), 4)
+    cache.refresh(wallet_uuid, Decimal("5.00"))
+    assert (cache.get(wallet_uuid), cache.version(wallet_uuid)) == (
+        Decimal("5.00"),
+        None,
+    )
+
+
+def test_cache_set_keeps_newer_version():
+    """
+    Запоздавшее заполнение кэша более старой версией или отсутствием
+    кошелька не затирает запись более новой версии.
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=1)
+    wallet_uuid = uuid4()
+    cache.set(wallet_uuid, Decimal("15.00"), version=2)
+    cache.set(wallet_uuid, Decimal("10.00"), version=1)
+    cache.set(wallet_uuid, None)
+    assert (cache.get(wallet_uuid), cache.version(wallet_uuid)) == (
+        Decimal("15.00"),
+        2,
+    )
+    cache.set(wallet_uuid, Decimal("20.00"), version=3)
+    assert (cache.get(wallet_uuid), cache.version(wallet_uuid)) == (
+        Decimal("20.00"),
+        3,
+    )
+
+
+@pytest.mark.asyncio
+async def test_slow_read_does_not_overwrite_newer_balance(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Чтение получило баланс до операции, а записывает его в кэш после
+    того, как операция закэшировала новый баланс: в кэше остается новый.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=60)
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    async with pg_session_factory() as read_session:
+        reader = crud_cls(read_session, cache)
+        deferred = []
+        reader._remember_read = lambda *args: deferred.append(args)
+        stale = await reader.get_by_uuid(wallet.uuid)
+        assert stale.balance == Decimal("10.00")
+
+        async with pg_session_factory() as session:
+            await crud_cls(session, cache).operation(
+                wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("5.00")
+            )
+        assert deferred
+        for args in deferred:
+            crud_cls._remember_read(reader, *args)
+
+    assert (cache.get(wallet.uuid), cache.version(wallet.uuid)) == (
+        Decimal("15.00"),
+        2,
+    )
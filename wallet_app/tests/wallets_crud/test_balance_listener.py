@@ -0,0 +1,78 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from api.v1.wallets.cache import BalanceCache
+from api.v1.wallets.notify import BalanceListener
+from config import settings
+from models.triggers import TRIGGERS, require_trigger, set_trigger
+from schemas.operation import OperationTypeSchema
+
+
+@pytest_asyncio.fixture
+async def notify_trigger(pg_session_factory):
+    """
+    Триггер NOTIFY на время теста, как после `cli.py notify enable`;
+    после теста снимается, как в схеме по умолчанию.
+    :param pg_session_factory:
+    :return:
+    """
+    engine = pg_session_factory.kw["bind"]
+    async with engine.begin() as conn:
+        await set_trigger(conn, TRIGGERS["notify"], True)
+    yield
+    async with engine.begin() as conn:
+        await set_trigger(conn, TRIGGERS["notify"], False)
+
+
+async def _wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_listener_refreshes_cache_from_other_worker(
+    notify_trigger, pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Изменение баланса в другом процессе (здесь - CRUD без кэша)
+    доходит до кэша через NOTIFY. Незакэшированные кошельки
+    в кэш не попадают.
+    :param notify_trigger:
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    cached = await pg_wallet_factory(Decimal("10.00"))
+    other = await pg_wallet_factory(Decimal("10.00"))
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=1)
+    listener = BalanceListener(settings.db.dsn, cache)
+    await listener.start()
+    try:
+        cache.set(cached.uuid, cached.balance)
+        async with pg_session_factory() as session:
+            crud = crud_cls(session)
+            for wallet in (cached, other):
+                await crud.operation(
+                    wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("5.00")
+                )
+        await _wait_for(lambda: cache.get(cached.uuid) == Decimal("15.00"))
+        assert cache.version(cached.uuid) == 2
+        assert len(cache) == 1
+    finally:
+        await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_no_notify_trigger_by_default(pg_session_factory):
+    """
+    По умолчанию триггера NOTIFY нет, и слушатель без него не стартует.
+    :param pg_session_factory:
+    :return:
+    """
+    with pytest.raises(RuntimeError, match="cli.py notify enable"):
+        await require_trigger(pg_session_factory.kw["bind"], "notify")
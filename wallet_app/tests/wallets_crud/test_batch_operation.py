@@ -0,0 +1,115 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.crud import WalletCRUD
+from schemas.operation import (
+    OperationSchema,
+    OperationStatusSchema,
+    OperationTypeSchema,
+)
+
+DEPOSIT = OperationTypeSchema.DEPOSIT
+WITHDRAW = OperationTypeSchema.WITHDRAW
+
+
+def _batch(*items):
+    return [
+        OperationSchema(wallet_uuid=w, operation_type=t, amount=Decimal(a))
+        for w, t, a in items
+    ]
+
+
+async def _balances(session_factory, *wallets):
+    async with session_factory() as session:
+        crud = WalletCRUD(session)
+        return [(await crud.get_by_uuid(w.uuid)).balance for w in wallets]
+
+
+@pytest.mark.asyncio
+async def test_batch_operation_per_item(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Поштучный режим: проходящие операции применяются, остальные
+    отклоняются со своим статусом.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    first = await pg_wallet_factory(Decimal("10.00"))
+    second = await pg_wallet_factory(Decimal("5.00"))
+    missing = uuid4()
+    operations = _batch(
+        (first.uuid, DEPOSIT, "5.00"),
+        (second.uuid, WITHDRAW, "6.00"),
+        (missing, DEPOSIT, "1.00"),
+        (second.uuid, DEPOSIT, "2.00"),
+        (first.uuid, WITHDRAW, "15.00"),
+        (second.uuid, WITHDRAW, "6.00"),
+    )
+    async with pg_session_factory() as session:
+        results = await crud_cls(session).batch_operation(operations, atomic=False)
+    assert [r.status for r in results] == [
+        OperationStatusSchema.OK,
+        OperationStatusSchema.NOT_ENOUGH_BALANCE,
+        OperationStatusSchema.WALLET_NOT_FOUND,
+        OperationStatusSchema.OK,
+        OperationStatusSchema.OK,
+        OperationStatusSchema.OK,
+    ]
+    assert [r.balance for r in results] == [
+        Decimal("15.00"),
+        None,
+        None,
+        Decimal("7.00"),
+        Decimal("0.00"),
+        Decimal("1.00"),
+    ]
+    assert await _balances(pg_session_factory, first, second) == [
+        Decimal("0.00"),
+        Decimal("1.00"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_operation_all_or_nothing(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Режим "все или ничего": одна отклоненная операция откатывает пакет.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    first = await pg_wallet_factory(Decimal("10.00"))
+    second = await pg_wallet_factory(Decimal("5.00"))
+    operations = _batch(
+        (first.uuid, WITHDRAW, "10.00"),
+        (second.uuid, WITHDRAW, "6.00"),
+    )
+    async with pg_session_factory() as session:
+        results = await crud_cls(session).batch_operation(operations)
+    assert [r.status for r in results] == [
+        OperationStatusSchema.ROLLED_BACK,
+        OperationStatusSchema.NOT_ENOUGH_BALANCE,
+    ]
+    assert await _balances(pg_session_factory, first, second) == [
+        Decimal("10.00"),
+        Decimal("5.00"),
+    ]
+
+    operations = _batch(
+        (first.uuid, WITHDRAW, "10.00"),
+        (second.uuid, DEPOSIT, "1.00"),
+        (second.uuid, WITHDRAW, "6.00"),
+    )
+    async with pg_session_factory() as session:
+        results = await crud_cls(session).batch_operation(operations)
+    assert all(r.status == OperationStatusSchema.OK for r in results)
+    assert await _balances(pg_session_factory, first, second) == [
+        Decimal("0.00"),
+        Decimal("0.00"),
+    ]
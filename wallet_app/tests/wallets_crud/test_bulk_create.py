@@ -0,0 +1,45 @@
+from decimal import Decimal
+
+import pytest
+from api.v1.wallets.crud import WalletCRUD
+from models import Wallet
+from schemas.wallet import WalletCreateSchema
+from sqlalchemy import delete, func, select
+
+
+async def _wallets(count):
+    for i in range(count):
+        yield WalletCreateSchema(balance=Decimal(i))
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_copies_in_chunks(pg_session_factory):
+    """
+    Кошельки загружаются через COPY несколькими пачками
+    и становятся видимы после фиксации транзакции.
+    :param pg_session_factory:
+    :return:
+    """
+    async with pg_session_factory() as session:
+        created = [
+            wallet_uuid
+            async for wallet_uuid in WalletCRUD(session).bulk_create(
+                _wallets(25), chunk_size=10
+            )
+        ]
+    assert len(set(created)) == 25
+    try:
+        async with pg_session_factory() as session:
+            count, total = (
+                await session.execute(
+                    select(func.count(), func.sum(Wallet.balance)).where(
+                        Wallet.uuid.in_(created)
+                    )
+                )
+            ).one()
+        assert count == 25
+        assert total == Decimal(sum(range(25)))
+    finally:
+        async with pg_session_factory() as session:
+            await session.execute(delete(Wallet).where(Wallet.uuid.in_(created)))
+            await session.commit()
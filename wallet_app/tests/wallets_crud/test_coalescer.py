@@ -0,0 +1,90 @@
+import asyncio
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.coalescer import OperationCoalescer
+from api.v1.wallets.crud import WalletCRUD
+from exceptions import NotEnoughBalanceError, WalletNotFound
+from schemas.operation import OperationTypeSchema
+
+DEPOSIT = OperationTypeSchema.DEPOSIT
+WITHDRAW = OperationTypeSchema.WITHDRAW
+
+
+@pytest.mark.asyncio
+async def test_coalescer_checks_withdrawals_in_order(
+    pg_session_factory, pg_wallet_factory
+):
+    """
+    Списание, для которого не хватает промежуточного баланса, отклоняется,
+    остальные операции пачки применяются и получают свои балансы.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("5.00"))
+    coalescer = OperationCoalescer(pg_session_factory, window=0.01)
+    ops = [
+        (WITHDRAW, "3.00"),
+        (DEPOSIT, "1.00"),
+        (WITHDRAW, "5.00"),
+        (WITHDRAW, "2.00"),
+        (DEPOSIT, "10.00"),
+    ]
+    results = await asyncio.gather(
+        *(
+            coalescer.submit(wallet.uuid, op_type, Decimal(amount))
+            for op_type, amount in ops
+        ),
+        return_exceptions=True,
+    )
+    assert [r.balance for r in results[:2]] == [Decimal("2.00"), Decimal("3.00")]
+    assert isinstance(results[2], NotEnoughBalanceError)
+    assert [r.balance for r in results[3:]] == [
+        Decimal("1.00"),
+        Decimal("11.00"),
+    ]
+    async with pg_session_factory() as session:
+        stored = await WalletCRUD(session).get_by_uuid(wallet.uuid)
+    assert stored.balance == Decimal("11.00")
+
+
+@pytest.mark.asyncio
+async def test_coalescer_no_lost_updates(pg_session_factory, pg_wallet_factory):
+    """
+    Параллельные операции через coalescer не теряют обновлений.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("100.00"))
+    coalescer = OperationCoalescer(pg_session_factory, window=0.001)
+    results = await asyncio.gather(
+        *(
+            coalescer.submit(
+                wallet.uuid, DEPOSIT if i % 2 else WITHDRAW, Decimal("1.00")
+            )
+            for i in range(1001)
+        )
+    )
+    async with pg_session_factory() as session:
+        stored = await WalletCRUD(session).get_by_uuid(wallet.uuid)
+    assert stored.balance == Decimal("99.00")
+    assert all(r.balance >= Decimal("0.00") for r in results)
+
+
+@pytest.mark.asyncio
+async def test_coalescer_wallet_not_found(pg_session_factory):
+    """
+    Все операции пачки над несуществующим кошельком получают WalletNotFound.
+    :param pg_session_factory:
+    :return:
+    """
+    coalescer = OperationCoalescer(pg_session_factory, window=0.001)
+    results = await asyncio.gather(
+        coalescer.submit(uuid4(), DEPOSIT, Decimal("1.00")),
+        coalescer.submit(uuid4(), WITHDRAW, Decimal("1.00")),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, WalletNotFound) for r in results)
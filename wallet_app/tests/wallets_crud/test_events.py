@@ -0,0 +1,233 @@
+import asyncio
+from decimal import Decimal
+
+import orjson
+import pytest
+from api.v1.wallets.events import HEARTBEAT, EventRelay, parse_event_id, stream_events
+from exceptions import NotEnoughBalanceError
+from models import WalletEvent
+from models.triggers import TRIGGERS, require_trigger, set_trigger
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import select
+
+
+def _parse(chunk: bytes) -> list[dict]:
+    events = []
+    for block in chunk.decode().split("\n\n"):
+        if not block or block.startswith(":"):
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append({"id": fields["id"], **orjson.loads(fields["data"])})
+    return events
+
+
+async def _next_event(subscription, timeout=5.0) -> dict:
+    _, event = await asyncio.wait_for(subscription.queue.get(), timeout)
+    return _parse(event)[0]
+
+
+@pytest.mark.asyncio
+async def test_operation_writes_event_in_same_transaction(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Каждая записанная операция добавляет событие в outbox с балансом
+    после нее; отклоненная операция события не оставляет.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        await crud.operation(wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("5.00"))
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.operation(
+                wallet.uuid, OperationTypeSchema.WITHDRAW, Decimal("100.00")
+            )
+        await crud.operation(wallet.uuid, OperationTypeSchema.WITHDRAW, Decimal("3.00"))
+
+    async with pg_session_factory() as session:
+        events = (
+            await session.scalars(
+                select(WalletEvent)
+                .where(WalletEvent.wallet_uuid == wallet.uuid)
+                .order_by(WalletEvent.txid, WalletEvent.id)
+            )
+        ).all()
+    assert [(e.operation_type, e.amount, e.balance) for e in events] == [
+        (OperationTypeSchema.DEPOSIT, Decimal("10.00"), Decimal("10.00")),
+        (OperationTypeSchema.DEPOSIT, Decimal("5.00"), Decimal("15.00")),
+        (OperationTypeSchema.WITHDRAW, Decimal("3.00"), Decimal("12.00")),
+    ]
+    assert len({e.txid for e in events}) == 3
+
+
+@pytest.mark.asyncio
+async def test_no_events_while_outbox_trigger_disabled(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Снятый командой триггер: операции проходят без событий в outbox,
+    а поток событий не стартует. Включение возвращает триггер.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    engine = pg_session_factory.kw["bind"]
+    trigger = TRIGGERS["events"]
+    async with engine.begin() as conn:
+        assert await set_trigger(conn, trigger, False)
+    try:
+        with pytest.raises(RuntimeError, match="cli.py events enable"):
+            await require_trigger(engine, "events")
+        wallet = await pg_wallet_factory(Decimal("10.00"))
+        async with pg_session_factory() as session:
+            await crud_cls(session).operation(
+                wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("5.00")
+            )
+        async with pg_session_factory() as session:
+            events = await session.scalars(
+                select(WalletEvent).where(WalletEvent.wallet_uuid == wallet.uuid)
+            )
+            assert events.all() == []
+    finally:
+        async with engine.begin() as conn:
+            assert await set_trigger(conn, trigger, True)
+    await require_trigger(engine, "events")
+    async with engine.begin() as conn:
+        assert not await set_trigger(conn, trigger, True)
+
+
+@pytest.mark.asyncio
+async def test_relay_delivers_wallet_events_in_order(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Ретранслятор раздает новые события по порядку: подписчику
+    кошелька - только его события, подписчику всех - все.
+    Пачка меньше числа событий: полные пачки читаются подряд.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    other = await pg_wallet_factory(Decimal("10.00"))
+    relay = EventRelay(
+        pg_session_factory, poll_interval=0.01, batch_size=2, queue_size=100
+    )
+    await relay.start()
+    try:
+        mine = relay.subscribe(wallet.uuid)
+        everything = relay.subscribe()
+        async with pg_session_factory() as session:
+            crud = crud_cls(session)
+            for target, amount in (
+                (wallet, "1.00"),
+                (other, "2.00"),
+                (wallet, "3.00"),
+            ):
+                await crud.operation(
+                    target.uuid, OperationTypeSchema.DEPOSIT, Decimal(amount)
+                )
+
+        received = [await _next_event(mine) for _ in range(2)]
+        assert [(e["wallet_uuid"], e["balance"]) for e in received] == [
+            (str(wallet.uuid), "11.00"),
+            (str(wallet.uuid), "14.00"),
+        ]
+        assert received[0]["operation_id"] < received[1]["operation_id"]
+        assert mine.queue.empty()
+
+        received = [await _next_event(everything) for _ in range(3)]
+        assert [e["amount"] for e in received] == ["1.00", "2.00", "3.00"]
+        positions = [parse_event_id(e["id"]) for e in received]
+        assert positions == sorted(positions)
+    finally:
+        await relay.stop()
+    assert mine.closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_from_last_event_id(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Клиент, переподключившийся с Last-Event-ID, получает из БД
+    события после него, затем - новые из очереди, без повторов.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    relay = EventRelay(
+        pg_session_factory, poll_interval=0.01, batch_size=2, queue_size=100
+    )
+    await relay.start()
+    try:
+        subscription = relay.subscribe(wallet.uuid)
+        async with pg_session_factory() as session:
+            crud = crud_cls(session)
+            for amount in ("1.00", "2.00", "3.00"):
+                await crud.operation(
+                    wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal(amount)
+                )
+        seen = [await _next_event(subscription) for _ in range(3)]
+        relay.unsubscribe(subscription)
+
+        stream = stream_events(
+            relay, wallet.uuid, parse_event_id(seen[0]["id"]), heartbeat=5.0
+        )
+        replayed = []
+        async for chunk in stream:
+            if chunk == HEARTBEAT:
+                break
+            replayed += _parse(chunk)
+        assert [e["id"] for e in replayed] == [e["id"] for e in seen[1:]]
+
+        async with pg_session_factory() as session:
+            await crud_cls(session).operation(
+                wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("4.00")
+            )
+        chunk = await asyncio.wait_for(anext(stream), 5.0)
+        assert [e["balance"] for e in _parse(chunk)] == ["20.00"]
+        await stream.aclose()
+    finally:
+        await relay.stop()
+
+
+@pytest.mark.asyncio
+async def test_relay_drops_lagging_subscriber(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Подписчик, не забирающий события, отключается, когда его очередь
+    полна; уже полученное остается в очереди.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    relay = EventRelay(
+        pg_session_factory, poll_interval=0.01, batch_size=10, queue_size=1
+    )
+    await relay.start()
+    try:
+        lagging = relay.subscribe(wallet.uuid)
+        async with pg_session_factory() as session:
+            crud = crud_cls(session)
+            for _ in range(2):
+                await crud.operation(
+                    wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("1.00")
+                )
+        await asyncio.wait_for(lagging.closed.wait(), 5.0)
+        assert lagging.queue.qsize() == 1
+        assert relay.stats()["dropped"] == 1
+        assert relay.stats()["subscribers"] == 0
+    finally:
+        await relay.stop()
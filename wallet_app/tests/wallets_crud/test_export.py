@@ -0,0 +1,85 @@
+import csv
+import gzip
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from api.v1.wallets.export import ExportFormat, stream_export
+from api.v1.wallets.shards import set_shards
+from schemas.operation import OperationTypeSchema
+
+
+async def _export(session_factory, fmt, compress=False, chunk_size=2):
+    data = b"".join(
+        [
+            chunk
+            async for chunk in stream_export(
+                session_factory, fmt, compress=compress, chunk_size=chunk_size
+            )
+        ]
+    )
+    return gzip.decompress(data) if compress else data
+
+
+def _parse(data, fmt):
+    if fmt == ExportFormat.NDJSON:
+        rows = [json.loads(line) for line in data.splitlines()]
+    else:
+        rows = list(csv.DictReader(io.StringIO(data.decode())))
+    return [(row["uuid"], Decimal(row["balance"])) for row in rows]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fmt", list(ExportFormat))
+@pytest.mark.parametrize("compress", [False, True])
+async def test_export_balances(pg_session_factory, pg_wallet_factory, fmt, compress):
+    """
+    Выгрузка содержит все кошельки в порядке uuid, для шардированного -
+    с суммой шардов.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param fmt:
+    :param compress:
+    :return:
+    """
+    wallets = [
+        await pg_wallet_factory(Decimal(balance)) for balance in ("1.50", "0", "30")
+    ]
+    async with pg_session_factory() as session:
+        await set_shards(session, wallets[2].uuid, 4)
+
+    rows = _parse(await _export(pg_session_factory, fmt, compress), fmt)
+    assert [uuid for uuid, _ in rows] == sorted(uuid for uuid, _ in rows)
+    exported = dict(rows)
+    assert [exported[str(w.uuid)] for w in wallets] == [
+        Decimal("1.50"),
+        Decimal("0.00"),
+        Decimal("30.00"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_is_consistent_snapshot(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Переводы, зафиксированные после начала выгрузки, в нее не попадают:
+    сумма выгруженных балансов совпадает с суммой на момент начала.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallets = [await pg_wallet_factory(Decimal("10.00")) for _ in range(4)]
+    stream = stream_export(pg_session_factory, ExportFormat.NDJSON, chunk_size=1)
+    chunks = [await anext(stream)]
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        for source, target in zip(wallets, wallets[1:]):
+            await crud.transfer(source.uuid, target.uuid, Decimal("5.00"))
+        await crud.operation(wallets[0].uuid, OperationTypeSchema.DEPOSIT, Decimal(1))
+    chunks += [chunk async for chunk in stream]
+
+    exported = dict(_parse(b"".join(chunks), ExportFormat.NDJSON))
+    assert [exported[str(w.uuid)] for w in wallets] == [Decimal("10.00")] * 4
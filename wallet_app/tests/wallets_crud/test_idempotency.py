@@ -0,0 +1,93 @@
+import asyncio
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from exceptions import IdempotencyKeyReused, NotEnoughBalanceError
+from models import IdempotencyKey, WalletOperation
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import delete, func, select
+
+DEPOSIT = OperationTypeSchema.DEPOSIT
+WITHDRAW = OperationTypeSchema.WITHDRAW
+
+
+@pytest_asyncio.fixture
+async def idempotency_key(pg_session_factory):
+    """
+    Уникальный ключ идемпотентности, удаляемый после теста.
+    :param pg_session_factory:
+    :return:
+    """
+    key = f"test-{uuid4()}"
+    yield key
+    async with pg_session_factory() as session:
+        await session.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_parallel_retries_apply_once(
+    pg_session_factory, pg_wallet_factory, idempotency_key, crud_cls
+):
+    """
+    Параллельные повторы пополнения с одним ключом применяются один раз
+    и все получают один и тот же баланс.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param idempotency_key:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("100.00"))
+
+    async def _retry():
+        async with pg_session_factory() as session:
+            return await crud_cls(session).operation(
+                wallet.uuid, DEPOSIT, Decimal("50.00"), idempotency_key
+            )
+
+    results = await asyncio.gather(*(_retry() for _ in range(10)))
+    assert {result.balance for result in results} == {Decimal("150.00")}
+
+    async with pg_session_factory() as session:
+        stored = await crud_cls(session).get_by_uuid(wallet.uuid)
+        ledger = await session.scalar(
+            select(func.count()).where(WalletOperation.wallet_uuid == wallet.uuid)
+        )
+    assert stored.balance == Decimal("150.00")
+    assert ledger == 2
+
+
+@pytest.mark.asyncio
+async def test_replay_keeps_original_result(
+    pg_session_factory, pg_wallet_factory, idempotency_key, crud_cls
+):
+    """
+    Отказ тоже сохраняется: повтор после пополнения кошелька получает
+    прежний отказ. Ключ нельзя использовать для другой операции.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param idempotency_key:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.operation(
+                wallet.uuid, WITHDRAW, Decimal("20.00"), idempotency_key
+            )
+        await crud.operation(wallet.uuid, DEPOSIT, Decimal("20.00"))
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.operation(
+                wallet.uuid, WITHDRAW, Decimal("20.00"), idempotency_key
+            )
+        with pytest.raises(IdempotencyKeyReused):
+            await crud.operation(
+                wallet.uuid, WITHDRAW, Decimal("5.00"), idempotency_key
+            )
+        stored = await crud.get_by_uuid(wallet.uuid)
+    assert stored.balance == Decimal("30.00")
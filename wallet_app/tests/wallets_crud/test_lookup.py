@@ -0,0 +1,58 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.cache import BalanceCache
+from api.v1.wallets.shards import set_shards
+from schemas.operation import OperationTypeSchema
+
+
+@pytest.mark.asyncio
+async def test_get_many(pg_session_factory, pg_wallet_factory, crud_cls):
+    """
+    Несколько кошельков одним запросом: отсутствующих в результате нет,
+    баланс шардированного - сумма шардов.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    plain = await pg_wallet_factory(Decimal("12.50"))
+    sharded = await pg_wallet_factory(Decimal("40.00"))
+    missing = uuid4()
+    async with pg_session_factory() as session:
+        await set_shards(session, sharded.uuid, 4)
+        await crud_cls(session).operation(
+            sharded.uuid, OperationTypeSchema.DEPOSIT, Decimal("2.00")
+        )
+        found = await crud_cls(session).get_many([plain.uuid, missing, sharded.uuid])
+    assert {uuid: wallet.balance for uuid, wallet in found.items()} == {
+        plain.uuid: Decimal("12.50"),
+        sharded.uuid: Decimal("42.00"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_many_reads_only_cache_misses(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    С кэшем балансов из БД читаются только промахи, а прочитанное,
+    включая отсутствие кошелька, попадает в кэш.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=60)
+    cached, fresh = uuid4(), await pg_wallet_factory(Decimal("3.00"))
+    missing = uuid4()
+    cache.set(cached, Decimal("99.00"))
+    async with pg_session_factory() as session:
+        found = await crud_cls(session, cache).get_many([cached, fresh.uuid, missing])
+    assert {uuid: wallet.balance for uuid, wallet in found.items()} == {
+        cached: Decimal("99.00"),
+        fresh.uuid: Decimal("3.00"),
+    }
+    assert cache.get(fresh.uuid) == Decimal("3.00")
+    assert cache.get(missing) is None
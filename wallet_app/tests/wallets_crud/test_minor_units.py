@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import pytest
+from api.v1.wallets.shards import set_shards
+from models.money import from_minor, to_minor
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import text
+
+
+@pytest.mark.parametrize(
+    "amount, minor",
+    [
+        (Decimal("0.01"), 1),
+        (Decimal("12.50"), 1250),
+        (Decimal("1.500"), 150),
+        (Decimal("-3"), -300),
+        (Decimal("9999999999999999.99"), 999999999999999999),
+    ],
+)
+def test_minor_units_round_trip(amount, minor):
+    """
+    Перевод в минимальные единицы и обратно точный.
+    :param amount:
+    :param minor:
+    :return:
+    """
+    assert to_minor(amount) == minor
+    assert from_minor(minor) == amount
+
+
+def test_to_minor_rejects_fractions_of_cent():
+    """
+    Сумма с долями копейки не округляется.
+    :return:
+    """
+    with pytest.raises(ValueError):
+        to_minor(Decimal("0.005"))
+
+
+@pytest.mark.asyncio
+async def test_balance_stored_in_minor_units(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Баланс и журнал хранятся целыми копейками, а репозиторий отдает
+    Decimal с двумя знаками, в том числе для шардированного кошелька.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("0.10"))
+    sharded = await pg_wallet_factory(Decimal("0.00"))
+    async with pg_session_factory() as session:
+        await set_shards(session, sharded.uuid, 4)
+        crud = crud_cls(session)
+        for _ in range(3):
+            await crud.operation(
+                wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("0.01")
+            )
+            await crud.operation(
+                sharded.uuid, OperationTypeSchema.DEPOSIT, Decimal("0.01")
+            )
+        read = await crud_cls(session).get_by_uuid(wallet.uuid)
+        read_sharded = await crud_cls(session).get_by_uuid(sharded.uuid)
+        stored = await session.scalar(
+            text("SELECT balance FROM wallets WHERE uuid = :uuid"),
+            {"uuid": wallet.uuid},
+        )
+        amounts = await session.scalars(
+            text("SELECT amount FROM wallet_operations WHERE wallet_uuid = :uuid"),
+            {"uuid": wallet.uuid},
+        )
+        amounts = sorted(amounts.all())
+    assert stored == 13
+    assert amounts == [1, 1, 1, 10]
+    assert read.balance == Decimal("0.13")
+    assert str(read.balance) == "0.13"
+    assert read_sharded.balance == Decimal("0.03")
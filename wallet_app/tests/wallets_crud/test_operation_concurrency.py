@@ -0,0 +1,66 @@
+import asyncio
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from exceptions import NotEnoughBalanceError, WalletNotFound
+from schemas.operation import OperationTypeSchema
+
+OPERATIONS = 2000
+
+
+@pytest.mark.asyncio
+async def test_parallel_operations_no_lost_updates(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Тысячи параллельных пополнений и списаний одного кошелька.
+    Итоговый баланс должен учитывать каждую операцию.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("1000.00"))
+
+    async def _run(op_type: OperationTypeSchema) -> None:
+        async with pg_session_factory() as session:
+            await crud_cls(session).operation(wallet.uuid, op_type, Decimal("1.00"))
+
+    ops = [
+        OperationTypeSchema.DEPOSIT if i % 2 else OperationTypeSchema.WITHDRAW
+        for i in range(OPERATIONS)
+    ]
+    ops.append(OperationTypeSchema.DEPOSIT)
+    await asyncio.gather(*(_run(op) for op in ops))
+
+    async with pg_session_factory() as session:
+        stored = await crud_cls(session).get_by_uuid(wallet.uuid)
+    assert stored.balance == Decimal("1001.00")
+
+
+@pytest.mark.asyncio
+async def test_operation_distinguishes_errors(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Отсутствующий кошелек и нехватка средств дают разные исключения,
+    а неудачное списание не меняет баланс.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.operation(
+                wallet.uuid, OperationTypeSchema.WITHDRAW, Decimal("10.01")
+            )
+        with pytest.raises(WalletNotFound):
+            await crud.operation(uuid4(), OperationTypeSchema.DEPOSIT, Decimal("1.00"))
+        result = await crud.operation(
+            wallet.uuid, OperationTypeSchema.WITHDRAW, Decimal("10.00")
+        )
+    assert result.balance == Decimal("0.00")
@@ -0,0 +1,62 @@
+from datetime import timedelta
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from exceptions import WalletNotFound
+from schemas.operation import OperationTypeSchema
+
+DEPOSIT = OperationTypeSchema.DEPOSIT
+WITHDRAW = OperationTypeSchema.WITHDRAW
+
+
+@pytest.mark.asyncio
+async def test_history_keyset_pages(pg_session_factory, pg_wallet_factory, crud_cls):
+    """
+    Постраничный обход истории курсорами отдает каждую операцию ровно
+    один раз от новых к старым; фильтры применяются к выборке.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("0.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        for i in range(1, 8):
+            op_type = WITHDRAW if i % 3 == 0 else DEPOSIT
+            await crud.operation(wallet.uuid, op_type, Decimal(i))
+
+        pages, after = [], None
+        while True:
+            items, after = await crud.history(wallet.uuid, 3, after=after)
+            pages.append([item.amount for item in items])
+            if after is None:
+                break
+        assert pages == [
+            [Decimal(7), Decimal(6), Decimal(5)],
+            [Decimal(4), Decimal(3), Decimal(2)],
+            [Decimal(1)],
+        ]
+
+        withdrawals, _ = await crud.history(wallet.uuid, 10, operation_type=WITHDRAW)
+        assert [item.amount for item in withdrawals] == [Decimal(6), Decimal(3)]
+
+        newest = withdrawals[0].created_at
+        assert (await crud.history(wallet.uuid, 10, since=newest))[0]
+        assert (
+            await crud.history(wallet.uuid, 10, since=newest + timedelta(seconds=1))
+        ) == ([], None)
+
+
+@pytest.mark.asyncio
+async def test_history_wallet_not_found(pg_session_factory, crud_cls):
+    """
+    Пустая история существующего кошелька отличается от отсутствующего.
+    :param pg_session_factory:
+    :param crud_cls:
+    :return:
+    """
+    async with pg_session_factory() as session:
+        with pytest.raises(WalletNotFound):
+            await crud_cls(session).history(uuid4(), 10)
@@ -0,0 +1,142 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from exceptions import NotEnoughBalanceError
+from models import WalletOperation
+from models.partitions import (
+    PartitionScheme,
+    create_partitions,
+    detach_partitions,
+    list_partitions,
+)
+from schemas.operation import (
+    OperationSchema,
+    OperationStatusSchema,
+    OperationTypeSchema,
+)
+from sqlalchemy import select, text
+
+DEPOSIT = OperationTypeSchema.DEPOSIT
+WITHDRAW = OperationTypeSchema.WITHDRAW
+
+
+async def _ledger(session, wallet_uuid):
+    rows = await session.execute(
+        select(
+            WalletOperation.operation_type,
+            WalletOperation.amount,
+            WalletOperation.balance,
+        )
+        .where(WalletOperation.wallet_uuid == wallet_uuid)
+        .order_by(WalletOperation.id)
+    )
+    return [tuple(row) for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_ledger_records_every_applied_operation(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Создание, одиночные и пакетные операции пишутся в журнал с балансом
+    после каждой операции, отклоненные операции - нет.
+    Баланс кошелька восстанавливается суммой журнала.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        await crud.operation(wallet.uuid, DEPOSIT, Decimal("5.00"))
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.operation(wallet.uuid, WITHDRAW, Decimal("100.00"))
+        results = await crud.batch_operation(
+            [
+                OperationSchema(
+                    wallet_uuid=wallet.uuid, operation_type=op, amount=amount
+                )
+                for op, amount in [
+                    (WITHDRAW, Decimal("15.00")),
+                    (WITHDRAW, Decimal("1.00")),
+                    (DEPOSIT, Decimal("3.00")),
+                ]
+            ],
+            atomic=False,
+        )
+        assert [r.status for r in results] == [
+            OperationStatusSchema.OK,
+            OperationStatusSchema.NOT_ENOUGH_BALANCE,
+            OperationStatusSchema.OK,
+        ]
+        await crud.batch_operation(
+            [
+                OperationSchema(
+                    wallet_uuid=wallet.uuid,
+                    operation_type=DEPOSIT,
+                    amount=Decimal("2.00"),
+                ),
+                OperationSchema(
+                    wallet_uuid=wallet.uuid,
+                    operation_type=WITHDRAW,
+                    amount=Decimal("4.00"),
+                ),
+            ]
+        )
+        ledger = await _ledger(session, wallet.uuid)
+        stored = await crud.get_by_uuid(wallet.uuid)
+
+    assert ledger == [
+        ("DEPOSIT", Decimal("10.00"), Decimal("10.00")),
+        ("DEPOSIT", Decimal("5.00"), Decimal("15.00")),
+        ("WITHDRAW", Decimal("15.00"), Decimal("0.00")),
+        ("DEPOSIT", Decimal("3.00"), Decimal("3.00")),
+        ("DEPOSIT", Decimal("2.00"), Decimal("5.00")),
+        ("WITHDRAW", Decimal("4.00"), Decimal("1.00")),
+    ]
+    rebuilt = sum(
+        amount if op_type == "DEPOSIT" else -amount for op_type, amount, _ in ledger
+    )
+    assert rebuilt == stored.balance == Decimal("1.00")
+
+
+@pytest.mark.asyncio
+async def test_partitions_create_and_detach(pg_session_factory):
+    """
+    Секции создаются наперед и отсоединяются по границе хранения.
+    :param pg_session_factory:
+    :return:
+    """
+    scheme = PartitionScheme("test_partitioned_ledger", "day")
+    engine = pg_session_factory.kw["bind"]
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                f"CREATE TABLE {scheme.table} (created_at timestamptz NOT NULL) "
+                "PARTITION BY RANGE (created_at)"
+            )
+        )
+    try:
+        async with engine.begin() as conn:
+            created = await create_partitions(conn, scheme, 2, date(2026, 1, 31))
+            again = await create_partitions(conn, scheme, 2, date(2026, 1, 31))
+        assert created == [
+            f"{scheme.table}_p20260131",
+            f"{scheme.table}_p20260201",
+            f"{scheme.table}_p20260202",
+        ]
+        assert again == []
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            detached = await detach_partitions(
+                conn, scheme, date(2026, 2, 2), drop=True
+            )
+            remaining = await list_partitions(conn, scheme)
+        assert detached == created[:2]
+        assert remaining == {date(2026, 2, 2): created[2]}
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP TABLE {scheme.table}"))
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+from models.partitions import (
+    PARTITIONED_TABLES,
+    PartitionMaintainer,
+    list_partitions,
+    lock_partitions,
+)
+from sqlalchemy import text
+
+# Дата, до которой ни старт контейнера, ни приложение секций не создают.
+FAR_FUTURE = date(2099, 1, 15)
+
+
+async def _drop_future_partitions(engine) -> None:
+    async with engine.begin() as conn:
+        for scheme in PARTITIONED_TABLES.values():
+            for start, name in (await list_partitions(conn, scheme)).items():
+                if start.year == FAR_FUTURE.year:
+                    await conn.execute(text(f"DROP TABLE {name}"))
+
+
+@pytest.mark.asyncio
+async def test_maintainer_creates_partitions_ahead(pg_session_factory):
+    """
+    Проверка создает текущую и ahead следующих секций каждой таблицы,
+    повторная ничего не создает.
+    :param pg_session_factory:
+    :return:
+    """
+    engine = pg_session_factory.kw["bind"]
+    maintainer = PartitionMaintainer(lambda: engine, interval=3600)
+    try:
+        created = await maintainer.run_once(FAR_FUTURE)
+
+        assert "wallet_operations_p209901" in created
+        assert "wallet_operations_p209904" in created
+        assert "idempotency_keys_p20990115" in created
+        assert "idempotency_keys_p20990122" in created
+        assert "wallet_events_p20990122" in created
+        assert len(created) == 4 + 8 + 8
+        assert await maintainer.run_once(FAR_FUTURE) == []
+    finally:
+        await _drop_future_partitions(engine)
+
+
+@pytest.mark.asyncio
+async def test_maintainer_skips_while_another_process_holds_lock(
+    pg_session_factory,
+):
+    """
+    Пока секции создает другой процесс, проверка пропускается, а не ждет.
+    :param pg_session_factory:
+    :return:
+    """
+    engine = pg_session_factory.kw["bind"]
+    maintainer = PartitionMaintainer(lambda: engine, interval=3600)
+    try:
+        async with engine.begin() as conn:
+            await lock_partitions(conn)
+            assert await maintainer.run_once(FAR_FUTURE) is None
+        assert await maintainer.run_once(FAR_FUTURE)
+    finally:
+        await _drop_future_partitions(engine)
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from config import settings
+from models.pool import MeteredQueuePool
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+@pytest.mark.asyncio
+async def test_pool_metrics(pg_session_factory):
+    """
+    Пул считает выдачи соединений, выдачи сверх pool_size, ожидания
+    и таймауты.
+    :param pg_session_factory:
+    :return:
+    """
+    engine = create_async_engine(
+        settings.db.url,
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.2,
+    )
+    try:
+        first = await engine.connect()
+        second = await engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            await engine.connect()
+
+        async def _wait_and_query():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        waiting = asyncio.create_task(_wait_and_query())
+        await asyncio.sleep(0.05)
+        await second.close()
+        await waiting
+        await first.close()
+
+        stats = engine.pool.stats()
+        assert stats["checked_out"] == 0
+        assert stats["checkouts"] == 3
+        assert stats["overflow_checkouts"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["wait_seconds"]["0.01"] == 2
+        assert stats["wait_seconds"]["+Inf"] == 3
+        assert stats["wait_seconds_sum"] >= 0.05
+    finally:
+        await engine.dispose()
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import pytest
+import pytest_asyncio
+from api.v1.wallets import dependecies
+from api.v1.wallets.cache import MISSING, BalanceCache
+from models.db import ReplicaRouter
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+
+@pytest_asyncio.fixture
+async def replica_factory(pg_session_factory):
+    """
+    Фабрика сессий "реплик": рабочая указывает на ту же базу, что и тесты,
+    недоступная - на закрытый порт.
+    :param pg_session_factory:
+    :return:
+    """
+    engines = []
+
+    def _factory(alive=True):
+        url = pg_session_factory.kw["bind"].url
+        if not alive:
+            url = url.set(port=1)
+        engine = create_async_engine(url, connect_args={"timeout": 1})
+        engines.append(engine)
+        return async_sessionmaker(
+            bind=engine,
+            expire_on_commit=False,
+            info={"replica": True},
+        )
+
+    yield _factory
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_replicas_round_robin_and_fallback(pg_session_factory, replica_factory):
+    """
+    Чтения идут по кругу по репликам, недоступная реплика пропускается,
+    без доступных реплик сессия открывается на primary.
+    :param pg_session_factory:
+    :param replica_factory:
+    :return:
+    """
+    first, second = replica_factory(), replica_factory()
+    router = ReplicaRouter([first, second], pg_session_factory, retry_after=60)
+    used = []
+    for _ in range(4):
+        async with router.session() as session:
+            used.append(session.bind)
+    assert used == [first.kw["bind"], second.kw["bind"]] * 2
+
+    dead = replica_factory(alive=False)
+    router = ReplicaRouter([dead, first], pg_session_factory, retry_after=60)
+    for _ in range(2):
+        async with router.session() as session:
+            assert session.bind is first.kw["bind"]
+    assert router._down_until[0] > 0
+
+    router = ReplicaRouter([dead], pg_session_factory, retry_after=60)
+    async with router.session() as session:
+        assert session.bind is pg_session_factory.kw["bind"]
+        assert not session.info.get("replica")
+
+
+@pytest.mark.asyncio
+async def test_read_session_read_your_writes(
+    monkeypatch, pg_session_factory, replica_factory, pg_wallet_factory, crud_cls
+):
+    """
+    С Read-Your-Writes чтение идет на primary; прочитанное с реплики
+    не записывается в кэш балансов.
+    :param monkeypatch:
+    :param pg_session_factory:
+    :param replica_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    replica = replica_factory()
+    monkeypatch.setattr(
+        dependecies,
+        "replica_router",
+        ReplicaRouter([replica], pg_session_factory, retry_after=60),
+    )
+    monkeypatch.setattr(dependecies, "session_factory", pg_session_factory)
+    wallet = await pg_wallet_factory(Decimal("7.00"))
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=60)
+
+    async for session in dependecies.get_read_session(read_your_writes=False):
+        assert session.info["replica"] is True
+        stored = await crud_cls(session, cache).get_by_uuid(wallet.uuid)
+    assert stored.balance == Decimal("7.00")
+    assert cache.get(wallet.uuid) is MISSING
+
+    async for session in dependecies.get_read_session(read_your_writes=True):
+        assert session.bind is pg_session_factory.kw["bind"]
+        await crud_cls(session, cache).get_by_uuid(wallet.uuid)
+    assert cache.get(wallet.uuid) == Decimal("7.00")
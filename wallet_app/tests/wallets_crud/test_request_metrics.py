@@ -0,0 +1,30 @@
+import pytest
+from api.v1.wallets.raw import RawWalletCRUD
+from metrics import _db_time, instrument_engine
+from sqlalchemy import text
+
+
+@pytest.mark.asyncio
+async def test_db_time_per_request(pg_session_factory, pg_wallet_factory):
+    """
+    Время в БД копится в счетчик текущего запроса и для выражений
+    SQLAlchemy, и для прямых вызовов asyncpg.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :return:
+    """
+    instrument_engine(pg_session_factory.kw["bind"])
+    wallet = await pg_wallet_factory()
+
+    spent = [0.0]
+    token = _db_time.set(spent)
+    try:
+        async with pg_session_factory() as session:
+            await session.execute(text("SELECT pg_sleep(0.05)"))
+        orm_time = spent[0]
+        async with pg_session_factory() as session:
+            await RawWalletCRUD(session).get_by_uuid(wallet.uuid)
+    finally:
+        _db_time.reset(token)
+    assert orm_time >= 0.05
+    assert spent[0] > orm_time
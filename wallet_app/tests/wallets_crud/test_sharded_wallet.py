@@ -0,0 +1,138 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from api.v1.wallets.shards import set_shards
+from exceptions import NotEnoughBalanceError
+from models import WalletBalanceShard, WalletOperation
+from schemas.operation import (
+    OperationSchema,
+    OperationStatusSchema,
+    OperationTypeSchema,
+)
+from sqlalchemy import func, select
+
+DEPOSIT = OperationTypeSchema.DEPOSIT
+WITHDRAW = OperationTypeSchema.WITHDRAW
+SHARDS = 8
+
+
+async def _shard_balances(session, wallet_uuid):
+    return list(
+        await session.scalars(
+            select(WalletBalanceShard.balance)
+            .where(WalletBalanceShard.wallet_uuid == wallet_uuid)
+            .order_by(WalletBalanceShard.shard)
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_parallel_operations_on_shards(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Параллельные пополнения и списания шардированного кошелька
+    не теряют обновлений, а баланс - сумма шардов.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("100.00"))
+    async with pg_session_factory() as session:
+        assert await set_shards(session, wallet.uuid, SHARDS) == Decimal("100.00")
+
+    async def _run(op_type):
+        async with pg_session_factory() as session:
+            await crud_cls(session).operation(wallet.uuid, op_type, Decimal("1.00"))
+
+    ops = [DEPOSIT] * 300 + [WITHDRAW] * 200
+    await asyncio.gather(*(_run(op) for op in ops))
+
+    async with pg_session_factory() as session:
+        stored = await crud_cls(session).get_by_uuid(wallet.uuid)
+        shards = await _shard_balances(session, wallet.uuid)
+        ledger = await session.scalar(
+            select(func.count()).where(WalletOperation.wallet_uuid == wallet.uuid)
+        )
+    assert stored.balance == sum(shards) == Decimal("200.00")
+    assert len(shards) == SHARDS
+    assert ledger == len(ops) + 1
+
+
+@pytest.mark.asyncio
+async def test_withdraw_consolidates_shards(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Списание больше любого отдельного шарда проходит через сведение
+    шардов с равным распределением остатка, а больше их суммы - отклоняется.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("0.00"))
+    async with pg_session_factory() as session:
+        await set_shards(session, wallet.uuid, 4)
+        crud = crud_cls(session)
+        for _ in range(20):
+            await crud.operation(wallet.uuid, DEPOSIT, Decimal("5.00"))
+        assert max(await _shard_balances(session, wallet.uuid)) < Decimal("100.00")
+        await session.commit()
+
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.operation(wallet.uuid, WITHDRAW, Decimal("100.01"))
+        result = await crud.operation(wallet.uuid, WITHDRAW, Decimal("89.99"))
+        assert result.balance == Decimal("10.01")
+        assert await _shard_balances(session, wallet.uuid) == [
+            Decimal("2.51"),
+            Decimal("2.50"),
+            Decimal("2.50"),
+            Decimal("2.50"),
+        ]
+
+
+@pytest.mark.asyncio
+async def test_batch_and_disable_sharding(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Пакет операций применяется к шардированному кошельку, а выключение
+    шардирования возвращает баланс в строку wallets.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    async with pg_session_factory() as session:
+        await set_shards(session, wallet.uuid, 4)
+        crud = crud_cls(session)
+        results = await crud.batch_operation(
+            [
+                OperationSchema(
+                    wallet_uuid=wallet.uuid, operation_type=op_type, amount=amount
+                )
+                for op_type, amount in [
+                    (DEPOSIT, Decimal("5.00")),
+                    (WITHDRAW, Decimal("20.00")),
+                    (WITHDRAW, Decimal("15.00")),
+                ]
+            ],
+            atomic=False,
+        )
+        assert [(r.status, r.balance) for r in results] == [
+            (OperationStatusSchema.OK, Decimal("15.00")),
+            (OperationStatusSchema.NOT_ENOUGH_BALANCE, None),
+            (OperationStatusSchema.OK, Decimal("0.00")),
+        ]
+
+        await crud.operation(wallet.uuid, DEPOSIT, Decimal("7.00"))
+        assert await set_shards(session, wallet.uuid, 0) == Decimal("7.00")
+        assert await _shard_balances(session, wallet.uuid) == []
+        stored = await crud.get_by_uuid(wallet.uuid)
+        assert (stored.balance, stored.shards) == (Decimal("7.00"), 0)
+        result = await crud.operation(wallet.uuid, WITHDRAW, Decimal("7.00"))
+        assert result.balance == Decimal("0.00")
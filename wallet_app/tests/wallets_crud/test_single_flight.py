@@ -0,0 +1,101 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+from api.v1.wallets.singleflight import SingleFlight
+from schemas.operation import OperationTypeSchema
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_concurrent_calls():
+    """
+    Одновременные вызовы с одним ключом получают результат одного
+    вызова, а следующий после него вызов выполняется заново.
+    :return:
+    """
+    flights = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def _fetch():
+        nonlocal calls
+        calls += 1
+        call = calls
+        await release.wait()
+        return call
+
+    tasks = [asyncio.create_task(flights.do("key", _fetch)) for _ in range(5)]
+    other = asyncio.create_task(flights.do("other", _fetch))
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*tasks) == [1] * 5
+    assert await other == 2
+    assert await flights.do("key", _fetch) == 3
+    assert flights.stats() == {"in_flight": 0, "calls": 3, "shared": 4}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_errors_and_cancellation():
+    """
+    Ошибка вызова достается всем ожидающим; при отмене запроса,
+    выполнявшего вызов, ожидающий выполняет его сам.
+    :return:
+    """
+    flights = SingleFlight()
+    release = asyncio.Event()
+
+    async def _fail():
+        await release.wait()
+        raise RuntimeError("db is down")
+
+    tasks = [asyncio.create_task(flights.do("key", _fail)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert [type(result) for result in results] == [RuntimeError] * 2
+
+    async def _value():
+        await asyncio.sleep(0.01)
+        return "value"
+
+    leader = asyncio.create_task(flights.do("key", _value))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do("key", _value))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "value"
+    assert flights.stats()["calls"] == 3
+
+
+@pytest.mark.asyncio
+async def test_crud_single_flight_reads(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Одновременные чтения одного кошелька, каждое в своей сессии, ждут
+    один запрос к БД; чтение после записи видит новый баланс.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(balance=Decimal("10.00"))
+    flights = SingleFlight()
+
+    async def _read():
+        async with pg_session_factory() as session:
+            found = await crud_cls(session, None, flights).get_by_uuid(wallet.uuid)
+            return found.balance
+
+    assert (
+        await asyncio.gather(*(_read() for _ in range(10))) == [Decimal("10.00")] * 10
+    )
+    assert flights.calls == 1
+    assert flights.shared == 9
+
+    async with pg_session_factory() as session:
+        await crud_cls(session).operation(
+            wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("5.00")
+        )
+    assert await _read() == Decimal("15.00")
+    assert flights.calls == 2
@@ -0,0 +1,129 @@
+import asyncio
+import random
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.shards import set_shards
+from exceptions import NotEnoughBalanceError, WalletNotFound
+from models import WalletOperation
+from schemas.operation import OperationTypeSchema
+from sqlalchemy import select
+
+TRANSFERS = 1000
+WALLETS = 5
+
+
+async def _ledger_balance(session, wallet_uuid):
+    rows = await session.execute(
+        select(WalletOperation.operation_type, WalletOperation.amount).where(
+            WalletOperation.wallet_uuid == wallet_uuid
+        )
+    )
+    return sum(
+        -amount if op_type == OperationTypeSchema.WITHDRAW else amount
+        for op_type, amount in rows
+    )
+
+
+@pytest.mark.asyncio
+async def test_parallel_transfers_conserve_total(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Тысяча параллельных переводов между несколькими кошельками во всех
+    направлениях, в том числе встречных: ни одного deadlock, сумма
+    балансов сохраняется, балансы не уходят в минус, а журнал каждого
+    кошелька сходится с его балансом.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallets = [await pg_wallet_factory(Decimal("50.00")) for _ in range(WALLETS)]
+    rng = random.Random(0)
+    pairs = [
+        [wallet.uuid for wallet in rng.sample(wallets, 2)] for _ in range(TRANSFERS)
+    ]
+
+    async def _run(source_uuid, target_uuid):
+        async with pg_session_factory() as session:
+            try:
+                await crud_cls(session).transfer(
+                    source_uuid, target_uuid, Decimal("7.00")
+                )
+            except NotEnoughBalanceError:
+                return False
+        return True
+
+    done = await asyncio.gather(*(_run(*pair) for pair in pairs))
+    assert any(done)
+
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        balances = [(await crud.get_by_uuid(w.uuid)).balance for w in wallets]
+        ledger = [await _ledger_balance(session, w.uuid) for w in wallets]
+    assert sum(balances) == Decimal("50.00") * WALLETS
+    assert min(balances) >= 0
+    assert ledger == balances
+
+
+@pytest.mark.asyncio
+async def test_rejected_transfer_changes_nothing(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Нехватка средств и отсутствующий кошелек (источник или получатель)
+    отклоняют перевод целиком.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    source = await pg_wallet_factory(Decimal("10.00"))
+    target = await pg_wallet_factory(Decimal("1.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.transfer(source.uuid, target.uuid, Decimal("10.01"))
+        with pytest.raises(WalletNotFound):
+            await crud.transfer(source.uuid, uuid4(), Decimal("1.00"))
+        with pytest.raises(WalletNotFound):
+            await crud.transfer(uuid4(), target.uuid, Decimal("1.00"))
+        moved = await crud.transfer(source.uuid, target.uuid, Decimal("10.00"))
+        balances = [(await crud.get_by_uuid(w.uuid)).balance for w in (source, target)]
+        ledger = [await _ledger_balance(session, w.uuid) for w in (source, target)]
+    assert [w.balance for w in moved] == [Decimal("0.00"), Decimal("11.00")]
+    assert balances == ledger == [Decimal("0.00"), Decimal("11.00")]
+
+
+@pytest.mark.asyncio
+async def test_transfer_with_sharded_wallet(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Перевод с шардированного кошелька и на него.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    hot = await pg_wallet_factory(Decimal("100.00"))
+    other = await pg_wallet_factory(Decimal("20.00"))
+    async with pg_session_factory() as session:
+        await set_shards(session, hot.uuid, 4)
+
+    async def _run(source_uuid, target_uuid):
+        async with pg_session_factory() as session:
+            await crud_cls(session).transfer(source_uuid, target_uuid, Decimal("1.00"))
+
+    await asyncio.gather(
+        *(_run(hot.uuid, other.uuid) for _ in range(60)),
+        *(_run(other.uuid, hot.uuid) for _ in range(20)),
+    )
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        with pytest.raises(NotEnoughBalanceError):
+            await crud.transfer(hot.uuid, other.uuid, Decimal("60.01"))
+        balances = [(await crud.get_by_uuid(w.uuid)).balance for w in (hot, other)]
+    assert balances == [Decimal("60.00"), Decimal("60.00")]
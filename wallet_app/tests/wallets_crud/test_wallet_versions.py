@@ -0,0 +1,257 @@
+import asyncio
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.cache import BalanceCache
+from api.v1.wallets.coalescer import CoalescingWalletCRUD, OperationCoalescer
+from api.v1.wallets.shards import known_shards, set_shards
+from exceptions import WalletNotFound, WalletVersionMismatch
+from models import Wallet, WalletEvent, WalletOperation
+from schemas.operation import (
+    OperationSchema,
+    OperationStatusSchema,
+    OperationTypeSchema,
+)
+from schemas.wallet import WalletCreateSchema
+from sqlalchemy import delete, func, select
+
+
+@pytest.mark.asyncio
+async def test_version_bumped_on_every_change(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Версия нового кошелька - 1; каждая операция, пакет и перевод
+    увеличивают ее на единицу.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(balance=Decimal("100.00"))
+    other = await pg_wallet_factory(balance=Decimal("0.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        assert (await crud.get_by_uuid(wallet.uuid)).version == 1
+        result = await crud.operation(
+            wallet.uuid, OperationTypeSchema.WITHDRAW, Decimal("10.00")
+        )
+        assert (result.balance, result.version) == (Decimal("90.00"), 2)
+        await crud.batch_operation(
+            [
+                OperationSchema(
+                    wallet_uuid=wallet.uuid,
+                    operation_type=OperationTypeSchema.DEPOSIT,
+                    amount=Decimal("1.00"),
+                )
+            ]
+            * 2
+        )
+        await crud.transfer(wallet.uuid, other.uuid, Decimal("1.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session)
+        assert (await crud.get_by_uuid(wallet.uuid)).version == 4
+        assert (await crud.get_by_uuid(other.uuid)).version == 2
+
+
+@pytest.mark.asyncio
+async def test_conditional_operation(pg_session_factory, pg_wallet_factory, crud_cls):
+    """
+    Операция с if_match применяется только к кошельку той же версии;
+    при несовпадении баланс и журнал не меняются.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(balance=Decimal("100.00"))
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=1)
+    async with pg_session_factory() as session:
+        crud = crud_cls(session, cache)
+        result = await crud.operation(
+            wallet.uuid, OperationTypeSchema.WITHDRAW, Decimal("30.00"), if_match=[1]
+        )
+        assert (result.balance, result.version) == (Decimal("70.00"), 2)
+        assert cache.version(wallet.uuid) == 2
+
+        for if_match in ([1], [], [0, 5]):
+            with pytest.raises(WalletVersionMismatch):
+                await crud.operation(
+                    wallet.uuid,
+                    OperationTypeSchema.WITHDRAW,
+                    Decimal("30.00"),
+                    idempotency_key=f"versions-{uuid4()}",
+                    if_match=if_match,
+                )
+        with pytest.raises(WalletNotFound):
+            await crud.operation(
+                uuid4(), OperationTypeSchema.DEPOSIT, Decimal("1.00"), if_match=[1]
+            )
+
+        found = await crud_cls(session).get_by_uuid(wallet.uuid)
+        assert (found.balance, found.version) == (Decimal("70.00"), 2)
+        operations = await session.scalar(
+            select(func.count())
+            .select_from(WalletOperation)
+            .where(WalletOperation.wallet_uuid == wallet.uuid)
+        )
+        assert operations == 2
+
+
+@pytest.mark.asyncio
+async def test_sharded_wallet_has_no_version(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Баланс шардированного кошелька меняется в шардах, поэтому версии
+    у него нет, а условная операция всегда отклоняется.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    wallet = await pg_wallet_factory(balance=Decimal("100.00"))
+    async with pg_session_factory() as session:
+        await set_shards(session, wallet.uuid, 2)
+    known_shards.pop(wallet.uuid, None)
+    try:
+        async with pg_session_factory() as session:
+            crud = crud_cls(session)
+            assert (await crud.get_by_uuid(wallet.uuid)).version is None
+            for _ in range(2):
+                # Второй раз кошелек уже в known_shards.
+                with pytest.raises(WalletVersionMismatch):
+                    await crud.operation(
+                        wallet.uuid,
+                        OperationTypeSchema.DEPOSIT,
+                        Decimal("1.00"),
+                        if_match=[2],
+                    )
+                known_shards[wallet.uuid] = 2
+    finally:
+        known_shards.pop(wallet.uuid, None)
+        async with pg_session_factory() as session:
+            await set_shards(session, wallet.uuid, 0)
+
+
+@pytest.mark.asyncio
+async def test_write_paths_return_and_cache_version(
+    pg_session_factory, pg_wallet_factory, crud_cls
+):
+    """
+    Перевод, пакет (и его разбор по операциям) и повтор по ключу
+    идемпотентности отдают версию после изменения и кладут ее в кэш
+    вместе с балансом.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :param crud_cls:
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=60)
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    other = await pg_wallet_factory(Decimal("0.00"))
+    async with pg_session_factory() as session:
+        crud = crud_cls(session, cache)
+        source, target = await crud.transfer(wallet.uuid, other.uuid, Decimal("1.00"))
+        assert (source.version, target.version) == (2, 2)
+        assert cache.version(wallet.uuid) == cache.version(other.uuid) == 2
+
+        results = await crud.batch_operation(
+            [
+                OperationSchema(
+                    wallet_uuid=wallet.uuid,
+                    operation_type=OperationTypeSchema.DEPOSIT,
+                    amount=Decimal("1.00"),
+                ),
+                OperationSchema(
+                    wallet_uuid=other.uuid,
+                    operation_type=OperationTypeSchema.WITHDRAW,
+                    amount=Decimal("5.00"),
+                ),
+                OperationSchema(
+                    wallet_uuid=other.uuid,
+                    operation_type=OperationTypeSchema.DEPOSIT,
+                    amount=Decimal("2.00"),
+                ),
+            ],
+            atomic=False,
+        )
+        assert [r.status for r in results] == [
+            OperationStatusSchema.OK,
+            OperationStatusSchema.NOT_ENOUGH_BALANCE,
+            OperationStatusSchema.OK,
+        ]
+        assert (cache.get(wallet.uuid), cache.version(wallet.uuid)) == (
+            Decimal("10.00"),
+            3,
+        )
+        assert (cache.get(other.uuid), cache.version(other.uuid)) == (
+            Decimal("3.00"),
+            3,
+        )
+
+        key = f"versions-{uuid4()}"
+        first = await crud.operation(
+            wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("1.00"), key
+        )
+        replayed = await crud.operation(
+            wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("1.00"), key
+        )
+        assert (replayed.balance, replayed.version) == (first.balance, 4)
+
+
+@pytest.mark.asyncio
+async def test_create_returns_and_caches_version(pg_session_factory, crud_cls):
+    """
+    Созданный кошелек - версии 1, в том числе в кэше.
+    :param pg_session_factory:
+    :param crud_cls:
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=60)
+    async with pg_session_factory() as session:
+        wallet = await crud_cls(session, cache).create(
+            WalletCreateSchema(balance=Decimal("1.00"))
+        )
+        try:
+            assert wallet.version == 1
+            assert cache.version(wallet.uuid) == 1
+        finally:
+            for model in (Wallet, WalletOperation, WalletEvent):
+                column = model.uuid if model is Wallet else model.wallet_uuid
+                await session.execute(delete(model).where(column == wallet.uuid))
+            await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_coalesced_operation_caches_version(
+    pg_session_factory, pg_wallet_factory
+):
+    """
+    Версию из пачки объединенных операций получает только последняя
+    примененная операция; в кэше - итоговые баланс и версия.
+    :param pg_session_factory:
+    :param pg_wallet_factory:
+    :return:
+    """
+    cache = BalanceCache(max_size=10, ttl=60, negative_ttl=60)
+    wallet = await pg_wallet_factory(Decimal("10.00"))
+    coalescer = OperationCoalescer(pg_session_factory, window=0.01)
+
+    async def _operation(op_type, amount):
+        async with pg_session_factory() as session:
+            return await CoalescingWalletCRUD(session, coalescer, cache).operation(
+                wallet.uuid, op_type, Decimal(amount)
+            )
+
+    results = await asyncio.gather(
+        _operation(OperationTypeSchema.DEPOSIT, "1.00"),
+        _operation(OperationTypeSchema.WITHDRAW, "2.00"),
+        _operation(OperationTypeSchema.DEPOSIT, "3.00"),
+    )
+    assert [r.version for r in results] == [None, None, 2]
+    assert (cache.get(wallet.uuid), cache.version(wallet.uuid)) == (
+        Decimal("12.00"),
+        2,
+    )
@@ -0,0 +1,46 @@
+import pytest
+from api.v1.wallets.warmup import NIL_UUID, warm_up_pool
+from httpx import ASGITransport, AsyncClient
+from models import Wallet, WalletOperation
+from sqlalchemy import func, select
+
+
+@pytest.mark.asyncio
+async def test_warm_up_pool(pg_session_factory, crud_cls):
+    """
+    Прогрев открывает запрошенное число соединений пула и не оставляет
+    следов в данных.
+    :param pg_session_factory:
+    :param crud_cls:
+    :return:
+    """
+    await warm_up_pool(pg_session_factory, 3, crud_cls)
+
+    pool = pg_session_factory.kw["bind"].pool
+    assert pool.checkedin() >= 3
+    assert pool.checkedout() == 0
+    async with pg_session_factory() as session:
+        assert await session.get(Wallet, NIL_UUID) is None
+        operations = await session.scalar(
+            select(func.count())
+            .select_from(WalletOperation)
+            .where(WalletOperation.wallet_uuid == NIL_UUID)
+        )
+    assert operations == 0
+
+
+@pytest.mark.asyncio
+async def test_ready_after_lifespan(pg_session_factory):
+    """
+    /ready отвечает 503 до прогрева и после остановки, 200 - между ними.
+    :param pg_session_factory:
+    :return:
+    """
+    from main import app
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        assert (await ac.get("/ready")).status_code == 503
+        async with app.router.lifespan_context(app):
+            assert (await ac.get("/ready")).status_code == 200
+        assert (await ac.get("/ready")).status_code == 503
@@ -0,0 +1,120 @@
+import json
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from fastapi import status
+from schemas.operation import (
+    OperationResultSchema,
+    OperationStatusSchema,
+    OperationTypeSchema,
+)
+
+URL = "/wallets/operations:batch"
+
+
+def _operations(wallet_uuid):
+    return [
+        {
+            "wallet_uuid": str(wallet_uuid),
+            "operation_type": OperationTypeSchema.DEPOSIT.value,
+            "amount": "10.00",
+        },
+        {
+            "wallet_uuid": str(wallet_uuid),
+            "operation_type": OperationTypeSchema.WITHDRAW.value,
+            "amount": "25.00",
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_operation_json(client, mock_crud):
+    """
+    Пакет операций JSON-массивом, по умолчанию "все или ничего".
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    wallet_uuid = uuid4()
+    mock_crud.batch_operation.return_value = [
+        OperationResultSchema(
+            wallet_uuid=wallet_uuid,
+            status=OperationStatusSchema.OK,
+            balance=Decimal("110.00"),
+        ),
+        OperationResultSchema(
+            wallet_uuid=wallet_uuid,
+            status=OperationStatusSchema.OK,
+            balance=Decimal("85.00"),
+        ),
+    ]
+    resp = await client.post(URL, json=_operations(wallet_uuid))
+    assert resp.status_code == 200
+    assert [item["balance"] for item in resp.json()] == ["110.00", "85.00"]
+    args, kwargs = mock_crud.batch_operation.await_args
+    assert [op.amount for op in args[0]] == [Decimal("10.00"), Decimal("25.00")]
+    assert kwargs == {"atomic": True}
+
+
+@pytest.mark.asyncio
+async def test_batch_operation_ndjson_per_item(client, mock_crud):
+    """
+    Пакет операций в NDJSON с поштучными результатами.
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    mock_crud.batch_operation.return_value = []
+    body = "\n".join(json.dumps(op) for op in _operations(uuid4())) + "\n"
+    resp = await client.post(
+        URL,
+        params={"atomic": "false"},
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    args, kwargs = mock_crud.batch_operation.await_args
+    assert [op.operation_type for op in args[0]] == [
+        OperationTypeSchema.DEPOSIT,
+        OperationTypeSchema.WITHDRAW,
+    ]
+    assert kwargs == {"atomic": False}
+
+
+@pytest.mark.asyncio
+async def test_batch_operation_invalid_ndjson_line(client, mock_crud):
+    """
+    Невалидная строка NDJSON отклоняет весь пакет с указанием строки.
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    operations = _operations(uuid4())
+    operations[1]["operation_type"] = "INVALID_OP"
+    body = "\n".join(json.dumps(op) for op in operations)
+    resp = await client.post(
+        URL, content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert resp.json()["detail"][0]["loc"] == ["body", 1, "operation_type"]
+    mock_crud.batch_operation.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("amount", ["-500.00", "0"])
+async def test_batch_operation_non_positive_amount(client, mock_crud, amount):
+    """
+    Неположительная сумма отклоняет весь пакет: отрицательное пополнение
+    иначе уменьшило бы баланс в обход проверки средств.
+    :param client:
+    :param mock_crud:
+    :param amount:
+    :return:
+    """
+    operations = _operations(uuid4())
+    operations[0]["amount"] = amount
+    resp = await client.post(URL, json=operations)
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert resp.json()["detail"][0]["loc"] == ["body", 0, "amount"]
+    mock_crud.batch_operation.assert_not_awaited()
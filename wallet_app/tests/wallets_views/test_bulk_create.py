@@ -0,0 +1,74 @@
+import json
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+URL = "/wallets:bulk"
+
+
+@pytest.fixture
+def bulk_create_spy(mock_crud):
+    """
+    Подмена crud.bulk_create: запоминает загруженные балансы
+    и выдает новый uuid на каждый кошелек.
+    :param mock_crud:
+    :return: Список загруженных балансов.
+    """
+    balances = []
+
+    async def _bulk_create(wallets):
+        async for wallet in wallets:
+            balances.append(wallet.balance)
+            yield uuid4()
+
+    mock_crud.bulk_create.side_effect = _bulk_create
+    return balances
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_ndjson(client, bulk_create_spy):
+    """
+    Загрузка NDJSON возвращает поток uuid созданных кошельков.
+    :param client:
+    :param bulk_create_spy:
+    :return:
+    """
+    body = '{"balance": "1.50"}\n\n{"balance": "2.00"}'
+    resp = await client.post(
+        URL, content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert resp.status_code == 200
+    created = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(created) == 2
+    assert all("uuid" in item for item in created)
+    assert bulk_create_spy == [Decimal("1.50"), Decimal("2.00")]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_csv(client, bulk_create_spy):
+    """
+    Загрузка CSV с заголовком.
+    :param client:
+    :param bulk_create_spy:
+    :return:
+    """
+    body = "owner,balance\r\nalice,10.00\r\nbob,0\r\n"
+    resp = await client.post(URL, content=body, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200
+    assert len(resp.text.splitlines()) == 2
+    assert bulk_create_spy == [Decimal("10.00"), Decimal("0")]
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_invalid_row(client, bulk_create_spy):
+    """
+    Невалидная строка отклоняет загрузку с номером строки.
+    :param client:
+    :param bulk_create_spy:
+    :return:
+    """
+    body = "balance\n1.00\nnot_a_decimal\n"
+    resp = await client.post(URL, content=body, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 422
+    assert resp.json()["detail"].startswith("Line 2")
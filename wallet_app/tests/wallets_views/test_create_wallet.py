@@ -52,3 +52,19 @@ async def test_create_wallet_invalid_body(client):
     req = {"balance": "not_a_decimal"}
     resp = await client.post("/wallets/", json=req)
     assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("balance", ["10.001", "10000000000000000.00"])
+async def test_create_wallet_balance_out_of_range(client, mock_crud, balance):
+    """
+    Баланс с долями копейки или больше 18 цифр отклоняется, а не
+    округляется при переводе в минимальные единицы.
+    :param client:
+    :param mock_crud:
+    :param balance:
+    :return:
+    """
+    resp = await client.post("/wallets/", json={"balance": balance})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_crud.create.assert_not_awaited()
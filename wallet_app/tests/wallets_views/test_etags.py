@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+import pytest
+from api.v1.wallets.etags import parse_if_match
+from exceptions import WalletVersionMismatch
+from schemas.operation import OperationTypeSchema
+
+PARAMS = {"operation_type": OperationTypeSchema.DEPOSIT.value, "amount": "1.00"}
+
+
+@pytest.mark.parametrize(
+    "value, versions",
+    [
+        ('"3"', [3]),
+        ('"3", "7"', [3, 7]),
+        ("*", None),
+        ('W/"3"', []),
+        ('"abc", "3"', [3]),
+        ("3", []),
+        (f'"{"9" * 19}"', []),
+    ],
+)
+def test_parse_if_match(value, versions):
+    """
+    Слабые теги и теги не формата версии не совпадают ни с одной версией.
+    :param value:
+    :param versions:
+    :return:
+    """
+    assert parse_if_match(value) == versions
+
+
+@pytest.mark.asyncio
+async def test_etag_returned_for_known_version(client, mock_crud, wallet_factory):
+    """
+    Баланс и результат операции несут ETag версии; без версии
+    (шардированный кошелек) ETag нет.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    wallet = wallet_factory(balance=Decimal("10.00"))
+    wallet.version = 7
+    mock_crud.get_by_uuid.return_value = wallet
+    mock_crud.operation.return_value = wallet
+
+    resp = await client.get(f"/wallets/{wallet.uuid}")
+    assert resp.headers["etag"] == '"7"'
+    resp = await client.post(f"/wallets/{wallet.uuid}/operation", params=PARAMS)
+    assert resp.headers["etag"] == '"7"'
+
+    wallet.version = None
+    resp = await client.get(f"/wallets/{wallet.uuid}")
+    assert "etag" not in resp.headers
+
+
+@pytest.mark.asyncio
+async def test_operation_if_match(client, mock_crud, wallet_factory):
+    """
+    If-Match передается в CRUD списком версий; несовпадение - 412.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    wallet = wallet_factory()
+    url = f"/wallets/{wallet.uuid}/operation"
+    mock_crud.operation.return_value = wallet
+    resp = await client.post(url, params=PARAMS, headers={"If-Match": '"3"'})
+    assert resp.status_code == 200
+    assert mock_crud.operation.await_args.kwargs["if_match"] == [3]
+
+    mock_crud.operation.side_effect = WalletVersionMismatch(wallet.uuid)
+    resp = await client.post(url, params=PARAMS, headers={"If-Match": '"2"'})
+    assert resp.status_code == 412
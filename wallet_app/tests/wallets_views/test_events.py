@@ -0,0 +1,129 @@
+from collections import namedtuple
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+import orjson
+import pytest
+from api.v1.wallets.dependecies import get_event_relay
+from api.v1.wallets.events import EventRelay, encode_event
+from schemas.operation import OperationTypeSchema
+
+EventRow = namedtuple(
+    "EventRow",
+    "txid id wallet_uuid operation_id operation_type amount balance created_at",
+)
+
+
+class ClosedRelay(EventRelay):
+    """
+    Ретранслятор без БД: подписка сразу получает заданные события
+    и закрыта, поэтому поток отдает их и заканчивается.
+    """
+
+    def __init__(self, rows):
+        super().__init__(None, poll_interval=1, batch_size=10, queue_size=10)
+        self.rows = rows
+        self.position = (100, 0)
+
+    def subscribe(self, wallet_uuid=None):
+        subscription = super().subscribe(wallet_uuid)
+        # События приходят после подписки: позиция на момент подписки прежняя.
+        position = self.position
+        self.publish(self.rows)
+        self.position = position
+        subscription.closed.set()
+        return subscription
+
+
+def _row(txid, event_id, wallet_uuid, balance):
+    return EventRow(
+        txid,
+        event_id,
+        wallet_uuid,
+        event_id,
+        OperationTypeSchema.DEPOSIT,
+        Decimal("1.00"),
+        Decimal(balance),
+        datetime(2026, 10, 18, tzinfo=timezone.utc),
+    )
+
+
+@pytest.mark.asyncio
+async def test_events_stream_disabled(client):
+    """
+    Поток событий выключен по умолчанию: 404.
+    :param client:
+    :return:
+    """
+    resp = await client.get("/wallets:events")
+    assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_wallet_events_stream(client, test_app):
+    """
+    Поток кошелька: text/event-stream, только события этого кошелька
+    с id "<txid>-<id>" и суммами строками.
+    :param client:
+    :param test_app:
+    :return:
+    """
+    wallet_uuid = uuid4()
+    relay = ClosedRelay(
+        [
+            _row(101, 1, wallet_uuid, "11.00"),
+            _row(101, 2, uuid4(), "5.00"),
+            _row(102, 3, wallet_uuid, "12.00"),
+        ]
+    )
+    test_app.dependency_overrides[get_event_relay] = lambda: relay
+
+    resp = await client.get(f"/wallets/{wallet_uuid}/events")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert resp.headers["cache-control"] == "no-cache"
+    blocks = [b for b in resp.text.split("\n\n") if b and not b.startswith(":")]
+    assert [b.splitlines()[0] for b in blocks] == ["id: 101-1", "id: 102-3"]
+    assert blocks[0].splitlines()[1] == "event: operation"
+    data = orjson.loads(blocks[1].splitlines()[2].removeprefix("data: "))
+    assert data == {
+        "wallet_uuid": str(wallet_uuid),
+        "operation_id": 3,
+        "operation_type": "DEPOSIT",
+        "amount": "1.00",
+        "balance": "12.00",
+        "created_at": "2026-10-18T00:00:00+00:00",
+    }
+
+
+@pytest.mark.asyncio
+async def test_events_stream_skips_seen_events(client, test_app):
+    """
+    События до Last-Event-ID не повторяются.
+    :param client:
+    :param test_app:
+    :return:
+    """
+    wallet_uuid = uuid4()
+    rows = [_row(101, 1, wallet_uuid, "11.00"), _row(102, 2, wallet_uuid, "12.00")]
+    test_app.dependency_overrides[get_event_relay] = lambda: ClosedRelay(rows)
+
+    resp = await client.get("/wallets:events", headers={"Last-Event-ID": "101-1"})
+    assert resp.status_code == 200
+    assert resp.text.endswith(encode_event(rows[1]).decode())
+    assert "id: 101-1" not in resp.text
+
+
+@pytest.mark.asyncio
+async def test_events_stream_invalid_last_event_id(client, test_app):
+    """
+    Некорректный Last-Event-ID: 422.
+    :param client:
+    :param test_app:
+    :return:
+    """
+    test_app.dependency_overrides[get_event_relay] = lambda: ClosedRelay([])
+
+    resp = await client.get("/wallets:events", headers={"Last-Event-ID": "abc"})
+    assert resp.status_code == 422
@@ -0,0 +1,51 @@
+import pytest
+from api.v1.wallets import views
+from api.v1.wallets.export import ExportFormat
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params, media_type, filename",
+    [
+        ({}, "application/x-ndjson", "balances.ndjson"),
+        ({"format": "csv"}, "text/csv", "balances.csv"),
+        ({"format": "csv", "gzip": "true"}, "application/gzip", "balances.csv.gz"),
+    ],
+)
+async def test_export_balances(client, monkeypatch, params, media_type, filename):
+    """
+    Выгрузка отдается потоком с типом и именем файла по формату.
+    :param client:
+    :param monkeypatch:
+    :param params:
+    :param media_type:
+    :param filename:
+    :return:
+    """
+    calls = []
+
+    async def _stream(session_factory, fmt, compress, chunk_size):
+        calls.append((fmt, compress, chunk_size))
+        yield b"first\n"
+        yield b"second\n"
+
+    monkeypatch.setattr(views, "stream_export", _stream)
+    resp = await client.get("/wallets:export", params={**params, "chunk_size": 5})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith(media_type)
+    assert filename in resp.headers["content-disposition"]
+    assert resp.content == b"first\nsecond\n"
+    assert calls == [
+        (ExportFormat(params.get("format", "ndjson")), "gzip" in params, 5)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_export_rejects_unknown_format(client):
+    """
+    Неизвестный формат и нулевой размер пачки - 422.
+    :param client:
+    :return:
+    """
+    assert (await client.get("/wallets:export?format=xml")).status_code == 422
+    assert (await client.get("/wallets:export?chunk_size=0")).status_code == 422
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+import pytest
+from schemas.operation import OperationTypeSchema
+
+
+@pytest.mark.asyncio
+async def test_balance_encoded_exactly(client, mock_crud, wallet_factory):
+    """
+    Баланс кодируется точной строкой с обоими знаками после запятой,
+    даже если float его исказил бы.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    wallet = wallet_factory(balance=Decimal("9999999999999999.10"))
+    mock_crud.get_by_uuid.return_value = wallet
+    resp = await client.get(f"/wallets/{wallet.uuid}")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.content == b'{"balance":"9999999999999999.10"}'
+
+
+@pytest.mark.asyncio
+async def test_wallet_responses_match_schemas(client, mock_crud, wallet_factory):
+    """
+    Ответы быстрого пути совпадают с тем, что отдавали response_model:
+    uuid строкой, баланс строкой.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    wallet = wallet_factory(balance=Decimal("0.10"))
+    mock_crud.create.return_value = wallet
+    mock_crud.operation.return_value = wallet
+    mock_crud.get_many.return_value = {wallet.uuid: wallet}
+
+    resp = await client.post("/wallets/", json={"balance": "0.10"})
+    assert resp.json() == {"uuid": str(wallet.uuid), "balance": "0.10"}
+
+    resp = await client.post(
+        f"/wallets/{wallet.uuid}/operation",
+        params={"operation_type": OperationTypeSchema.DEPOSIT.value, "amount": "1"},
+    )
+    assert resp.json() == {"balance": "0.10"}
+
+    resp = await client.post("/wallets:lookup", json={"uuids": [str(wallet.uuid)]})
+    assert resp.json() == {
+        "wallets": [{"uuid": str(wallet.uuid), "balance": "0.10"}],
+        "missing": [],
+    }
+
+
+def test_openapi_keeps_response_models(test_app):
+    """
+    response_model по-прежнему описывает ответы в OpenAPI.
+    :param test_app:
+    :return:
+    """
+    paths = test_app.openapi()["paths"]
+    schema = paths["/wallets/{wallet_uuid}"]["get"]["responses"]["200"]["content"][
+        "application/json"
+    ]["schema"]
+    assert schema == {"$ref": "#/components/schemas/WalletReadBalanceSchema"}
@@ -0,0 +1,49 @@
+from uuid import uuid4
+
+import pytest
+from schemas.wallet import LOOKUP_MAX_WALLETS
+
+
+@pytest.mark.asyncio
+async def test_lookup_balances(client, mock_crud, wallet_factory):
+    """
+    Найденные кошельки в порядке запроса, отсутствующие - в missing;
+    повторы uuid запрашиваются один раз.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    first, second = wallet_factory(), wallet_factory()
+    missing = uuid4()
+    mock_crud.get_many.return_value = {first.uuid: first, second.uuid: second}
+    uuids = [second.uuid, missing, first.uuid, second.uuid]
+    resp = await client.post(
+        "/wallets:lookup", json={"uuids": [str(uuid) for uuid in uuids]}
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "wallets": [
+            {"uuid": str(second.uuid), "balance": "100.00"},
+            {"uuid": str(first.uuid), "balance": "100.00"},
+        ],
+        "missing": [str(missing)],
+    }
+    mock_crud.get_many.assert_awaited_once_with([second.uuid, missing, first.uuid])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("count", [0, LOOKUP_MAX_WALLETS + 1])
+async def test_lookup_limits(client, mock_crud, count):
+    """
+    Пустой список и больше LOOKUP_MAX_WALLETS uuid - 422.
+    :param client:
+    :param mock_crud:
+    :param count:
+    :return:
+    """
+    resp = await client.post(
+        "/wallets:lookup", json={"uuids": [str(uuid4()) for _ in range(count)]}
+    )
+    assert resp.status_code == 422
+    mock_crud.get_many.assert_not_awaited()
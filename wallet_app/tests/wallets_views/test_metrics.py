@@ -0,0 +1,118 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+from metrics import MetricsMiddleware, metrics_response
+from prometheus_client import REGISTRY
+from schemas.operation import OperationTypeSchema
+
+ROUTE = "/wallets/{wallet_uuid}"
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest_asyncio.fixture
+async def metrics_client(test_app, client):
+    """
+    Клиент приложения с MetricsMiddleware и /metrics; wallet_crud
+    подменен на мок фикстурой client.
+    :param test_app:
+    :param client:
+    :return:
+    """
+    test_app.add_middleware(MetricsMiddleware)
+    test_app.add_api_route("/metrics", metrics_response, include_in_schema=False)
+    transport = ASGITransport(app=test_app)
+    async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def test_request_metrics(metrics_client, mock_crud, wallet_factory):
+    """
+    Запросы считаются по шаблону маршрута и коду ответа,
+    неизвестные пути - одним рядом unmatched.
+    :param metrics_client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    ok = _sample("wallet_http_requests_total", method="GET", route=ROUTE, status="200")
+    not_found = _sample(
+        "wallet_http_requests_total", method="GET", route=ROUTE, status="404"
+    )
+    latency = _sample(
+        "wallet_http_request_duration_seconds_count", method="GET", route=ROUTE
+    )
+    unmatched = _sample(
+        "wallet_http_requests_total", method="", route="unmatched", status="404"
+    )
+    missing = _sample("wallet_operation_outcomes_total", outcome="wallet_not_found")
+
+    mock_crud.get_by_uuid.return_value = wallet_factory()
+    await metrics_client.get(f"/wallets/{uuid4()}")
+    await metrics_client.get(f"/wallets/{uuid4()}")
+    mock_crud.get_by_uuid.return_value = None
+    await metrics_client.get(f"/wallets/{uuid4()}")
+    await metrics_client.get("/no-such-path")
+
+    assert (
+        _sample("wallet_http_requests_total", method="GET", route=ROUTE, status="200")
+        == ok + 2
+    )
+    assert (
+        _sample("wallet_http_requests_total", method="GET", route=ROUTE, status="404")
+        == not_found + 1
+    )
+    assert (
+        _sample("wallet_http_request_duration_seconds_count", method="GET", route=ROUTE)
+        == latency + 3
+    )
+    assert (
+        _sample(
+            "wallet_http_requests_total",
+            method="",
+            route="unmatched",
+            status="404",
+        )
+        == unmatched + 1
+    )
+    assert (
+        _sample("wallet_operation_outcomes_total", outcome="wallet_not_found")
+        == missing + 1
+    )
+    assert _sample("wallet_http_requests_in_flight") == 0
+
+    resp = await metrics_client.get("/metrics")
+    assert resp.status_code == 200
+    assert "wallet_http_request_db_seconds_bucket" in resp.text
+
+
+@pytest.mark.asyncio
+async def test_operation_outcome_metrics(metrics_client, mock_crud):
+    """
+    Отказ по нехватке средств считается отдельным исходом.
+    :param metrics_client:
+    :param mock_crud:
+    :return:
+    """
+    from exceptions import NotEnoughBalanceError
+
+    before = _sample("wallet_operation_outcomes_total", outcome="not_enough_balance")
+    mock_crud.operation.side_effect = NotEnoughBalanceError("Недостаточно средств")
+    resp = await metrics_client.post(
+        f"/wallets/{uuid4()}/operation",
+        params={
+            "operation_type": OperationTypeSchema.WITHDRAW.value,
+            "amount": str(Decimal("10.00")),
+        },
+    )
+    assert resp.status_code == 404
+    assert (
+        _sample("wallet_operation_outcomes_total", outcome="not_enough_balance")
+        == before + 1
+    )
@@ -0,0 +1,106 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from api.v1.wallets.pagination import decode_cursor, encode_cursor
+from exceptions import WalletNotFound
+from models import WalletOperation
+from schemas.operation import OperationTypeSchema
+
+CREATED_AT = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_operation_history_page(client, mock_crud):
+    """
+    Страница истории с курсором следующей страницы и фильтрами.
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    wallet_uuid = uuid4()
+    mock_crud.history.return_value = (
+        [
+            WalletOperation(
+                id=7,
+                created_at=CREATED_AT,
+                wallet_uuid=wallet_uuid,
+                operation_type=OperationTypeSchema.WITHDRAW,
+                amount=Decimal("5.00"),
+                balance=Decimal("95.00"),
+            )
+        ],
+        (CREATED_AT, 7),
+    )
+    resp = await client.get(
+        f"/wallets/{wallet_uuid}/operations",
+        params={
+            "limit": 1,
+            "cursor": encode_cursor(CREATED_AT, 9),
+            "operation_type": "WITHDRAW",
+            "since": "2026-10-01T00:00:00Z",
+        },
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["items"] == [
+        {
+            "id": 7,
+            "created_at": "2026-10-18T12:00:00Z",
+            "operation_type": "WITHDRAW",
+            "amount": "5.00",
+            "balance": "95.00",
+        }
+    ]
+    assert decode_cursor(body["next_cursor"]) == (CREATED_AT, 7)
+    args, kwargs = mock_crud.history.await_args
+    assert args == (wallet_uuid, 1)
+    assert kwargs["after"] == (CREATED_AT, 9)
+    assert kwargs["operation_type"] == OperationTypeSchema.WITHDRAW
+    assert kwargs["since"] == datetime(2026, 10, 1, tzinfo=timezone.utc)
+    assert kwargs["until"] is None
+
+
+@pytest.mark.asyncio
+async def test_operation_history_last_page(client, mock_crud):
+    """
+    На последней странице next_cursor равен null.
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    mock_crud.history.return_value = ([], None)
+    resp = await client.get(f"/wallets/{uuid4()}/operations")
+    assert resp.status_code == 200
+    assert resp.json() == {"items": [], "next_cursor": None}
+    assert mock_crud.history.await_args.args[1] == 50
+
+
+@pytest.mark.asyncio
+async def test_operation_history_invalid_cursor(client, mock_crud):
+    """
+    Поврежденный курсор отклоняется до обращения к БД.
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    resp = await client.get(
+        f"/wallets/{uuid4()}/operations", params={"cursor": "not-a-cursor"}
+    )
+    assert resp.status_code == 422
+    mock_crud.history.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_operation_history_wallet_not_found(client, mock_crud):
+    """
+    История несуществующего кошелька.
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    mock_crud.history.side_effect = WalletNotFound
+    resp = await client.get(f"/wallets/{uuid4()}/operations")
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Wallet not found"
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_cache_stats_disabled(client):
+    """
+    Кэш балансов по умолчанию выключен.
+    :param client:
+    :return:
+    """
+    resp = await client.get("/wallets:cache")
+    assert resp.status_code == 200
+    assert resp.json()["enabled"] is False
+
+
+@pytest.mark.asyncio
+async def test_pool_stats(client):
+    """
+    Состояние пула соединений primary.
+    :param client:
+    :return:
+    """
+    resp = await client.get("/wallets:pool")
+    assert resp.status_code == 200
+    primary = resp.json()[0]
+    assert primary["name"] == "primary"
+    assert primary["size"] == 5
+    assert "+Inf" in primary["wait_seconds"]
@@ -0,0 +1,90 @@
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from exceptions import NotEnoughBalanceError, WalletNotFound
+
+
+@pytest.mark.asyncio
+async def test_transfer(client, mock_crud, wallet_factory):
+    """
+    Успешный перевод возвращает балансы обоих кошельков.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    source = wallet_factory(balance=Decimal("70.00"))
+    target = wallet_factory(balance=Decimal("30.00"))
+    mock_crud.transfer.return_value = (source, target)
+    resp = await client.post(
+        "/wallets/transfer",
+        json={
+            "from_wallet_uuid": str(source.uuid),
+            "to_wallet_uuid": str(target.uuid),
+            "amount": "30.00",
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "from_wallet": {"uuid": str(source.uuid), "balance": "70.00"},
+        "to_wallet": {"uuid": str(target.uuid), "balance": "30.00"},
+    }
+    mock_crud.transfer.assert_awaited_once_with(
+        source.uuid, target.uuid, Decimal("30.00")
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error, detail",
+    [
+        (WalletNotFound(), "Wallet not found"),
+        (NotEnoughBalanceError(), "Not enough balance"),
+    ],
+)
+async def test_transfer_rejected(client, mock_crud, error, detail):
+    """
+    Отклоненный перевод: нет кошелька или недостаточно средств.
+    :param client:
+    :param mock_crud:
+    :param error:
+    :param detail:
+    :return:
+    """
+    mock_crud.transfer.side_effect = error
+    resp = await client.post(
+        "/wallets/transfer",
+        json={
+            "from_wallet_uuid": str(uuid4()),
+            "to_wallet_uuid": str(uuid4()),
+            "amount": "10.00",
+        },
+    )
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == detail
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("amount", ["0", "-5.00", "1.005"])
+async def test_transfer_invalid(client, mock_crud, amount):
+    """
+    Неположительная сумма, доли копейки и перевод на тот же кошелек
+    не доходят до CRUD.
+    :param client:
+    :param mock_crud:
+    :param amount:
+    :return:
+    """
+    wallet_uuid = str(uuid4())
+    for from_uuid, value in ((str(uuid4()), amount), (wallet_uuid, "1.00")):
+        resp = await client.post(
+            "/wallets/transfer",
+            json={
+                "from_wallet_uuid": from_uuid,
+                "to_wallet_uuid": wallet_uuid,
+                "amount": value,
+            },
+        )
+        assert resp.status_code == 422
+    mock_crud.transfer.assert_not_awaited()
@@ -26,7 +26,11 @@ async def test_wallet_operation_deposit(client, mock_crud, wallet_factory):
     data = resp.json()
     assert data["balance"] == str(wallet.balance)
     mock_crud.operation.assert_awaited_once_with(
-        wallet.uuid, OperationTypeSchema.DEPOSIT, Decimal("50.00")
+        wallet.uuid,
+        OperationTypeSchema.DEPOSIT,
+        Decimal("50.00"),
+        idempotency_key=None,
+        if_match=None,
     )
 
 
@@ -152,3 +156,129 @@ async def test_wallet_operation_parametrized(
         assert resp.status_code in expected_status, f"{resp.status_code=} {resp.text=}"
     else:
         assert resp.status_code == expected_status, f"{resp.status_code=} {resp.text=}"
+
+
+@pytest.mark.asyncio
+async def test_wallet_operation_idempotency_key(client, mock_crud, wallet_factory):
+    """
+    Заголовок Idempotency-Key передается в crud, а ключ, использованный
+    для другой операции, дает 422.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :return:
+    """
+    from exceptions import IdempotencyKeyReused
+
+    wallet = wallet_factory(balance=Decimal("100.00"))
+    mock_crud.operation.return_value = wallet
+    url = f"/wallets/{wallet.uuid}/operation"
+    params = {
+        "operation_type": OperationTypeSchema.DEPOSIT.value,
+        "amount": "50.00",
+    }
+    resp = await client.post(url, params=params, headers={"Idempotency-Key": "k-1"})
+    assert resp.status_code == 200
+    assert mock_crud.operation.await_args.kwargs == {
+        "idempotency_key": "k-1",
+        "if_match": None,
+    }
+
+    mock_crud.operation.side_effect = IdempotencyKeyReused("k-1")
+    resp = await client.post(url, params=params, headers={"Idempotency-Key": "k-1"})
+    assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_wallet_operation_fraction_of_cent(client, mock_crud):
+    """
+    Сумма с долями копейки отклоняется до CRUD.
+    :param client:
+    :param mock_crud:
+    :return:
+    """
+    url = f"/wallets/{uuid4()}/operation"
+    params = {
+        "operation_type": OperationTypeSchema.DEPOSIT.value,
+        "amount": "10.005",
+    }
+    resp = await client.post(url, params=params)
+    assert resp.status_code == 422
+    mock_crud.operation.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("amount", ["-100", "0"])
+async def test_wallet_operation_non_positive_amount(client, mock_crud, amount):
+    """
+    Нулевая и отрицательная сумма отклоняются до CRUD: иначе DEPOSIT
+    с отрицательной суммой уменьшал бы баланс в обход проверки.
+    :param client:
+    :param mock_crud:
+    :param amount:
+    :return:
+    """
+    url = f"/wallets/{uuid4()}/operation"
+    params = {
+        "operation_type": OperationTypeSchema.DEPOSIT.value,
+        "amount": amount,
+    }
+    resp = await client.post(url, params=params)
+    assert resp.status_code == 422
+    assert resp.json()["detail"][0]["loc"] == ["query", "amount"]
+    mock_crud.operation.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_wallet_operation_overloaded(
+    client, mock_crud, wallet_factory, monkeypatch
+):
+    """
+    При перегрузке операция сразу отклоняется с 503 и Retry-After,
+    не дожидаясь CRUD.
+    :param client:
+    :param mock_crud:
+    :param wallet_factory:
+    :param monkeypatch:
+    :return:
+    """
+    import asyncio
+
+    from api.v1.wallets import views
+    from api.v1.wallets.admission import AdmissionController
+
+    admission = AdmissionController(
+        max_concurrency=1, wallet_concurrency=0, max_queue=0, queue_timeout=1
+    )
+    monkeypatch.setattr(views, "operation_admission", admission)
+    wallet = wallet_factory()
+    release = asyncio.Event()
+
+    async def _slow_operation(*args, **kwargs):
+        await release.wait()
+        return wallet
+
+    mock_crud.operation.side_effect = _slow_operation
+    params = {"operation_type": OperationTypeSchema.DEPOSIT.value, "amount": "1"}
+    first = asyncio.create_task(
+        client.post(f"/wallets/{wallet.uuid}/operation", params=params)
+    )
+    while admission.stats()["in_flight"] == 0:
+        await asyncio.sleep(0.001)
+
+    resp = await client.post(f"/wallets/{uuid4()}/operation", params=params)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+    assert mock_crud.operation.await_count == 1
+
+    release.set()
+    assert (await first).status_code == 200
+    resp = await client.get("/wallets:admission")
+    assert resp.json() == {
+        "enabled": True,
+        "in_flight": 0,
+        "queued": 0,
+        "admitted": 1,
+        "rejected_queue_full": 1,
+        "rejected_timeout": 0,
+    }